@@ -0,0 +1,80 @@
+"""
+Compares the time until the topic tables of every model are available on
+page load, using one `/<k>/topics.json` request per model against a single
+`/topics_all.json` request.
+
+Server time is measured in-process. Network latency is modeled: a browser
+opens at most `--connections` requests to a host at once, so the per-model
+requests pay one round trip per wave of requests, while the bulk endpoint
+pays a single round trip::
+
+    python benchmarks/first_paint.py ap.ini --rtt 150
+"""
+from __future__ import division
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import math
+from timeit import default_timer as timer
+
+from webtest import TestApp
+
+import topicexplorer.server
+from topicexplorer.lib.util import is_valid_configfile
+
+
+def clear_caches(app):
+    app.top_words.clear()
+    app._topics_json.clear()
+
+
+def fetch(client, urls):
+    """ Returns the server seconds and response bytes for `urls`. """
+    elapsed, size = 0., 0
+    for url in urls:
+        start = timer()
+        r = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        elapsed += timer() - start
+        size += len(r.body)
+    return elapsed, size
+
+
+def main(args):
+    server_parser = ArgumentParser()
+    topicexplorer.server.populate_parser(server_parser)
+    app = topicexplorer.server.create_app(
+        server_parser.parse_args([args.config_file, '--no-browser']))
+    client = TestApp(app)
+
+    per_model = ['/{}/topics.json'.format(k) for k in app.topic_range]
+    waves = int(math.ceil(len(per_model) / args.connections))
+    cases = [('per-model', per_model, waves), ('topics_all', ['/topics_all.json'], 1)]
+
+    print("{} models, {:.0f} ms RTT, {} connections".format(
+        len(per_model), args.rtt, args.connections))
+    print("endpoint\tcache\trequests\tbytes\tserver (ms)\tfirst paint (ms)")
+    for name, urls, round_trips in cases:
+        for cache in ['cold', 'warm']:
+            total = 0.
+            for _ in range(args.repeat):
+                if cache == 'cold':
+                    clear_caches(app)
+                server, size = fetch(client, urls)
+                total += server
+            server = total / args.repeat * 1000
+            print("{}\t{}\t{}\t{}\t{:.2f}\t{:.2f}".format(
+                name, cache, len(urls), size, server,
+                server + round_trips * args.rtt))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+    parser.add_argument('--rtt', type=float, default=100.,
+                        help="Round trip time in milliseconds [Default: 100]")
+    parser.add_argument('--connections', type=int, default=6,
+                        help="Concurrent browser connections [Default: 6]")
+    parser.add_argument('--repeat', type=int, default=10,
+                        help="Repetitions of each case [Default: 10]")
+    main(parser.parse_args())
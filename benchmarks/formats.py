@@ -0,0 +1,69 @@
+"""
+Compares the throughput and size of JSON and binary responses on the data
+routes, for the long lists and document-topic slices analysis clients pull.
+
+Each route is requested in-process for `--n` documents (or query words) in
+every available format::
+
+    python benchmarks/formats.py ap.ini -n 1000
+"""
+from __future__ import division
+from __future__ import print_function
+
+from argparse import ArgumentParser
+from timeit import default_timer as timer
+
+from webtest import TestApp
+
+import topicexplorer.server
+from topicexplorer.lib import formats
+from topicexplorer.lib.util import is_valid_configfile
+
+
+def routes(app, n):
+    k = app.topic_range[len(app.topic_range) // 2]
+    doc = app.labels[0]
+    word = [w for w in app.c.words if w.isalpha() and w.islower()][0]
+    ids = '&'.join('id={}'.format(label) for label in app.labels[:n])
+    return [
+        ('docs_topics', '/{}/docs_topics/{}.json?n={}'.format(k, doc, n)),
+        ('topics/0', '/{}/topics/0.json?n={}'.format(k, n)),
+        ('word_docs', '/{}/word_docs.json?q={}&n={}'.format(k, word, n)),
+        ('topics.json', '/topics.json?q={}'.format(word)),
+        ('doc_topics', '/doc_topics.json?k=all&{}'.format(ids)),
+    ]
+
+
+def main(args):
+    server_parser = ArgumentParser()
+    topicexplorer.server.populate_parser(server_parser)
+    app = topicexplorer.server.create_app(
+        server_parser.parse_args([args.config_file, '--no-browser']))
+    client = TestApp(app)
+    fmts = [fmt for fmt in formats.MEDIA_TYPES if formats.available(fmt)]
+
+    print("route\tformat\tbytes\tms/request\treq/s\tspeedup")
+    for name, url in routes(app, args.n):
+        baseline = None
+        for fmt in fmts:
+            fmt_url = '{}&format={}'.format(url, fmt)
+            client.get(fmt_url)  # warm up caches and indexes
+            start = timer()
+            for _ in range(args.repeat):
+                size = len(client.get(fmt_url).body)
+            elapsed = (timer() - start) / args.repeat
+            baseline = baseline or elapsed
+            print("{}\t{}\t{}\t{:.2f}\t{:.1f}\t{:.2f}".format(
+                name, fmt, size, elapsed * 1000, 1 / elapsed,
+                baseline / elapsed))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+    parser.add_argument('-n', type=int, default=1000,
+                        help="Documents per response [Default: 1000]")
+    parser.add_argument('--repeat', type=int, default=10,
+                        help="Repetitions of each request [Default: 10]")
+    main(parser.parse_args())
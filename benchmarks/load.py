@@ -0,0 +1,136 @@
+"""
+Load-tests `topicexplorer launch` with 1, 2, 4 and 8 worker processes on a
+CPU-bound route, and reports the throughput and latency for each.
+
+Each case starts a server with ``--workers N`` and runs client processes
+that request ``/<k>/word_docs.json`` for random words of the corpus
+vocabulary for a fixed time. With spare cores, requests per second should grow
+close to linearly with the number of workers::
+
+    python benchmarks/load.py ap.ini --workers 1 2 4 8 --duration 20
+"""
+from __future__ import division
+from __future__ import print_function
+
+from argparse import ArgumentParser
+import ast
+import multiprocessing
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+
+import topicexplorer.config
+from topicexplorer.lib.util import is_valid_configfile
+
+
+def client(urls, deadline, seed, results):
+    rng = np.random.RandomState(seed)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        url = urls[rng.randint(len(urls))]
+        start = time.time()
+        try:
+            urlopen(url, timeout=60).read()
+            latencies.append(time.time() - start)
+        except IOError:
+            errors += 1
+    results.put((latencies, errors))
+
+
+def wait_ready(url, proc, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Server exited with {}".format(proc.returncode))
+        try:
+            urlopen(url, timeout=5).read()
+            return
+        except IOError:
+            time.sleep(0.5)
+    raise RuntimeError("Server did not start")
+
+
+def run_case(args, urls, workers, concurrency):
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'topicexplorer', 'launch', args.config_file,
+         '--no-browser', '-q', '-p', str(args.port),
+         '--workers', str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(urls[0], proc)
+        # warm up every worker
+        for url in urls:
+            urlopen(url, timeout=60).read()
+
+        results = multiprocessing.Queue()
+        deadline = time.time() + args.duration
+        clients = [multiprocessing.Process(target=client,
+                                           args=(urls, deadline, seed, results))
+                   for seed in range(concurrency)]
+        for c in clients:
+            c.start()
+        latencies, errors = [], 0
+        for _ in clients:
+            client_latencies, client_errors = results.get()
+            latencies += client_latencies
+            errors += client_errors
+        for c in clients:
+            c.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+    return np.array(latencies), errors
+
+
+def main(args):
+    from vsm.corpus import Corpus
+
+    config = topicexplorer.config.read(args.config_file)
+    topic_range = ast.literal_eval(config.get('main', 'topics'))
+    corpus = Corpus.load(config.get('main', 'corpus_file'), load_corpus=False)
+
+    # words the default tokenizer keeps as they are
+    words = [w for w in corpus.words if w.isalpha() and w.islower()]
+    rng = np.random.RandomState(37)
+    words = rng.choice(words, min(args.queries, len(words)), replace=False)
+    base = 'http://127.0.0.1:{}'.format(args.port)
+    urls = ['{}/{}/word_docs.json?{}'.format(
+                base, topic_range[i % len(topic_range)],
+                urlencode({'q': w, 'n': 40}))
+            for i, w in enumerate(words)]
+
+    print("{} cores, {} s per case".format(multiprocessing.cpu_count(),
+                                           args.duration))
+    print("workers\tclients\trequests\terrors\treq/s\tspeedup\tp50 (ms)\tp95 (ms)")
+    baseline = None
+    for workers in args.workers:
+        concurrency = args.concurrency or 2 * workers
+        latencies, errors = run_case(args, urls, workers, concurrency)
+        rate = len(latencies) / args.duration
+        baseline = baseline or rate
+        p50, p95 = (np.percentile(latencies, [50, 95]) * 1000
+                    if len(latencies) else (0., 0.))
+        print("{}\t{}\t{}\t{}\t{:.1f}\t{:.2f}\t{:.1f}\t{:.1f}".format(
+            workers, concurrency, len(latencies), errors, rate,
+            rate / baseline, p50, p95))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help="Numbers of workers [Default: 1 2 4 8]")
+    parser.add_argument('--concurrency', type=int,
+                        help="Client processes [Default: twice the workers]")
+    parser.add_argument('--duration', type=float, default=10.,
+                        help="Seconds per case [Default: 10]")
+    parser.add_argument('--queries', type=int, default=200,
+                        help="Distinct query words [Default: 200]")
+    parser.add_argument('-p', '--port', type=int, default=8099,
+                        help="Server port [Default: 8099]")
+    main(parser.parse_args())
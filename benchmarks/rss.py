@@ -0,0 +1,111 @@
+"""
+Measures the memory of 1, 4 and 16 server processes serving the same config,
+with the corpus and models read into each process against memory-mapped from
+the stores written by ``topicexplorer convert``.
+
+Each worker loads the application, requests the topics and the hypershelf of
+a document for every model, runs a word search, and reports its memory from
+``/proc/self/smaps_rollup`` once every worker is loaded. RSS counts shared
+pages in full in every process; PSS divides them among the processes sharing
+them, so the total PSS is the memory the workers actually use together::
+
+    topicexplorer convert ap.ini
+    python benchmarks/rss.py ap.ini --workers 1 4 16
+
+Linux only.
+"""
+from __future__ import division
+from __future__ import print_function
+
+from argparse import ArgumentParser
+from codecs import open
+import multiprocessing
+import os
+import tempfile
+
+import topicexplorer.config
+from topicexplorer.lib.util import is_valid_configfile
+
+
+def memory():
+    """ Returns the RSS, PSS and private memory of this process in bytes. """
+    fields = dict()
+    with open('/proc/self/smaps_rollup') as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return fields['Rss'], fields['Pss'], private
+
+
+def worker(config_file, barrier, results):
+    from argparse import ArgumentParser
+    from webtest import TestApp
+    import topicexplorer.server
+
+    server_parser = ArgumentParser()
+    topicexplorer.server.populate_parser(server_parser)
+    app = topicexplorer.server.create_app(
+        server_parser.parse_args([config_file, '--no-browser']))
+    client = TestApp(app)
+    doc = app.labels[0]
+    for k in app.topic_range:
+        client.get('/{}/topics.json'.format(k))
+        client.get('/{}/docs/{}'.format(k, doc), {'n': 40})
+    client.get('/topics.json', {'q': app.c.words[0]})
+
+    # report once every worker holds its models
+    barrier.wait()
+    results.put(memory())
+    barrier.wait()
+
+
+def measure(config_file, workers):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(config_file, barrier, results))
+             for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    stats = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return stats
+
+
+def main(args):
+    config = topicexplorer.config.read(args.config_file)
+    config_dir = os.path.dirname(os.path.abspath(args.config_file))
+
+    print("mode\tworkers\tRSS/worker (MB)\tprivate/worker (MB)\ttotal PSS (MB)")
+    for mode in args.modes:
+        config.set('www', 'mmap', str(mode == 'mmap'))
+        # relative paths in the config resolve against its directory
+        fd, config_file = tempfile.mkstemp(suffix='.ini', dir=config_dir)
+        os.close(fd)
+        try:
+            with open(config_file, 'w', encoding='utf8') as configfh:
+                config.write(configfh)
+            for workers in args.workers:
+                stats = measure(config_file, workers)
+                rss = sum(s[0] for s in stats) / workers / 2**20
+                private = sum(s[2] for s in stats) / workers / 2**20
+                pss = sum(s[1] for s in stats) / 2**20
+                print("{}\t{}\t{:.1f}\t{:.1f}\t{:.1f}".format(
+                    mode, workers, rss, private, pss))
+        finally:
+            os.remove(config_file)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16],
+                        help="Numbers of workers [Default: 1 4 16]")
+    parser.add_argument('--modes', nargs='+', choices=['npz', 'mmap'],
+                        default=['npz', 'mmap'],
+                        help="Loading modes to compare [Default: npz mmap]")
+    main(parser.parse_args())
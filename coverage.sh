@@ -1,6 +1,6 @@
 #!/bin/bash
 #CMD='coverage run -a --source topicexplorer --omit="topicexplorer/extensions/*.py,topicexplorer/lib/hathitrust.py"'
-CMD="coverage run -a --source topicexplorer.init,topicexplorer.prep,topicexplorer.train,topicexplorer.server,topicexplorer.lib.pdf,topicexplorer.version,topicexplorer.demo,topicexplorer.update,topicexplorer.export,topicexplorer.tezimport"
+CMD="coverage run -a --source topicexplorer.init,topicexplorer.prep,topicexplorer.train,topicexplorer.server,topicexplorer.lib.pdf,topicexplorer.version,topicexplorer.demo,topicexplorer.update,topicexplorer.export,topicexplorer.tezimport,topicexplorer.precompress"
 rm -rf .coverage ap
 coverage debug sys
 
@@ -9,6 +9,8 @@ $CMD -m topicexplorer version
 EXIT=$(($EXIT+$?))
 $CMD -m topicexplorer.demo --no-launch
 EXIT=$(($EXIT+$?))
+$CMD -m topicexplorer.precompress ap.ini
+EXIT=$(($EXIT+$?))
 
 # Special thanks on the `trap` semantics to:
 # http://veithen.github.io/2014/11/16/sigterm-propagation.html
@@ -52,7 +54,15 @@ test_url http://localhost:8000/20/topics/1.json?n=-20 200
 EXIT=$(($EXIT+$?))
 test_url http://localhost:8000/topics.json?q=bush 200
 EXIT=$(($EXIT+$?))
-test_url http://localhost:8000/cluster.csv 200
+# the clusters of the demo are computed in the background on first request
+wait_url () {
+    for i in $(seq 1 60); do
+        test_url $1 $2 && return 0
+        sleep 1
+    done
+    return 1
+}
+wait_url http://localhost:8000/cluster.csv 200
 EXIT=$(($EXIT+$?))
 test_url http://localhost:8000/20/word_docs.json 400
 EXIT=$(($EXIT+$?))
@@ -116,7 +126,28 @@ EXIT=$(($EXIT+$?))
 #EXIT=$(($EXIT+$?))
 
 pip install pytest
-$CMD -m pytest tests/test_prep.py tests/test_topicexplorer_lib_pdf.py
+$CMD -m pytest \
+    tests/test_prep.py \
+    tests/test_topicexplorer_lib_pdf.py \
+    tests/test_server.py \
+    tests/test_topicexplorer_lib_neighbors.py \
+    tests/test_topicexplorer_lib_topicindex.py \
+    tests/test_topicexplorer_lib_labels.py \
+    tests/test_topicexplorer_lib_wordsearch.py \
+    tests/test_topicexplorer_lib_vocab.py \
+    tests/test_topicexplorer_lib_viewers.py \
+    tests/test_topicexplorer_lib_mmapstore.py \
+    tests/test_topicexplorer_lib_prefork.py \
+    tests/test_topicexplorer_lib_formats.py \
+    tests/test_topicexplorer_lib_compression.py \
+    tests/test_topicexplorer_lib_cache.py \
+    tests/test_topicexplorer_lib_metrics.py \
+    tests/test_topicexplorer_lib_fulltext.py \
+    tests/test_topicexplorer_lib_jobs.py \
+    tests/test_topicexplorer_lib_dispatch.py \
+    tests/test_topicexplorer_lib_warmup.py \
+    tests/test_topicexplorer_lib_reload.py \
+    tests/test_topicexplorer_lib_infer.py
 EXIT=$(($EXIT+$?))
 
 coverage report
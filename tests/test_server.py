@@ -0,0 +1,1138 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import sys
+if sys.version_info.major == 2:
+    from mock import Mock, patch, PropertyMock
+elif sys.version_info.major == 3:
+    from unittest.mock import Mock, patch, PropertyMock
+
+from io import BytesIO
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+from webtest import TestApp
+
+from vsm import Corpus
+from vsm.model.lda import LDA
+from vsm.viewer.ldacgsviewer import LdaCgsViewer
+
+from topicexplorer.convert import build_label_table
+import topicexplorer.server
+from topicexplorer.lib import compression
+from topicexplorer.lib.fingerprint import file_digest
+
+tmpdir = None
+app = None
+corpus_file = None
+model_pattern = None
+topic_range = [3, 5]
+
+def setUpModule():
+    global tmpdir, app, corpus_file, model_pattern
+    tmpdir = mkdtemp()
+
+    rng = np.random.RandomState(37)
+    vocab = ['war', 'army', 'battle', 'market', 'stock', 'price',
+             'court', 'judge', 'trial', 'school', 'student', 'teacher']
+    text, idx = [], []
+    for d in range(30):
+        text += list(rng.choice(vocab[(d % 4) * 3:(d % 4) * 3 + 3], 20))
+        idx.append(len(text))
+    ctx_data = [np.array([(i, 'doc%02d' % n) for n, i in enumerate(idx)],
+                         dtype=[('idx', '<i8'), ('document_label', '<U5')])]
+    corpus = Corpus(text, context_data=ctx_data, context_types=['document'])
+    corpus_file = os.path.join(tmpdir, 'corpus.npz')
+    corpus.save(corpus_file)
+
+    model_pattern = os.path.join(tmpdir, 'corpus-LDA-K{0}-document-5.npz')
+    for k in topic_range:
+        m = LDA(corpus, 'document', K=k, seed_or_seeds=37)
+        m.train(n_iterations=5)
+        m.save(model_pattern.format(k))
+
+    app = topicexplorer.server.Application(
+        corpus_file=corpus_file, model_pattern=model_pattern,
+        topic_range=topic_range, context_type='document')
+
+def tearDownModule():
+    shutil.rmtree(tmpdir)
+
+def raw_get(path, application=None, **headers):
+    """ Returns a response without decoding its content encoding. """
+    from webob import Request
+    return Request.blank(path, headers=headers).get_response(
+        application or app)
+
+
+class TestEtags(unittest.TestCase):
+    def test_fingerprints(self):
+        for k in topic_range:
+            self.assertEqual(app.fingerprints[k],
+                file_digest(os.path.join(tmpdir,
+                    'corpus-LDA-K{0}-document-5.npz'.format(k))))
+        self.assertNotEqual(app.fingerprints[3], app.fingerprints[5])
+        self.assertEqual(app.corpus_fingerprint,
+            file_digest(os.path.join(tmpdir, 'corpus.npz')))
+
+    def test_etag_roundtrip(self):
+        client = TestApp(app)
+        r = client.get('/3/topics/0.json')
+        self.assertEqual(r.headers['Etag'], app.fingerprints[3])
+        r = client.get('/3/topics/0.json',
+                       headers={'If-None-Match': app.fingerprints[3]})
+        self.assertEqual(r.status_int, 304)
+
+        r = client.get('/docs.json')
+        self.assertEqual(r.headers['Etag'], app.corpus_fingerprint)
+
+    def test_etag_independent_of_model_size(self):
+        # a conditional GET must never touch the model matrices
+        client = TestApp(app)
+        explode = PropertyMock(side_effect=AssertionError("matrix accessed"))
+        with patch.object(LdaCgsViewer, 'phi', explode), \
+                patch.object(LdaCgsViewer, 'theta', explode):
+            for url in ['/3/topics.json', '/5/topics/1.json',
+                        '/3/docs_topics/doc01.json', '/5/doc_topics/doc01']:
+                k = int(url.split('/')[1])
+                r = client.get(url,
+                    headers={'If-None-Match': app.fingerprints[k]})
+                self.assertEqual(r.status_int, 304)
+
+    def test_invalid_k(self):
+        client = TestApp(app)
+        r = client.get('/4/topics.json', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+
+
+class TestNeighbors(unittest.TestCase):
+    def test_index_matches_exact(self):
+        indexed = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            neighbor_index=True)
+        for k in topic_range:
+            self.assertIn(k, indexed.neighbors)
+            # the corpus is smaller than the candidate budget, so the
+            # approximate results must be exactly the top of the full scan
+            approx = indexed.doc_neighbors(k, 'doc01', 10)
+            full = app.doc_neighbors(k, 'doc01', 10)
+            self.assertIn('doc01', [d for d, p in approx])
+            np.testing.assert_allclose([p for d, p in approx],
+                                       [p for d, p in full])
+
+    def test_farthest(self):
+        data = app.doc_neighbors(3, 'doc01', -5)
+        self.assertEqual(len(data), 5)
+        self.assertTrue(all(np.diff([p for d, p in data]) <= 0))
+
+        client = TestApp(app)
+        r = client.get('/3/docs_topics/doc01.json?n=-5')
+        self.assertEqual(len(r.json), 5)
+
+
+class TestTopicIndex(unittest.TestCase):
+    def test_topic_docs_match_viewer(self):
+        for N in [10, -10]:
+            data = app.topic_docs(5, 2, N)
+            full = app.v[5].dist_top_doc([2])
+            full = full[:N] if N > 0 else full[N:][::-1]
+            np.testing.assert_allclose([p for d, p in data],
+                                       [p for d, p in full], atol=1e-12)
+
+    def test_topic_json(self):
+        client = TestApp(app)
+        r = client.get('/5/topics/2.json?n=-3')
+        self.assertEqual(len(r.json), 3)
+        self.assertIn(5, app.topic_indexes)
+
+
+class TestLabelIndex(unittest.TestCase):
+    def test_no_metadata_scans(self):
+        client = TestApp(app)
+        with patch.object(Corpus, 'meta_int',
+                          side_effect=AssertionError("metadata scanned")):
+            client.get('/3/docs_topics/doc01.json')
+            client.get('/3/topics/1.json')
+            client.get('/3/doc_topics/doc01')
+            client.get('/docs.json?id=doc02')
+
+    def test_missing_document(self):
+        client = TestApp(app)
+        for url in ['/3/docs_topics/nodoc.json', '/3/doc_topics/nodoc',
+                    '/3/docs/nodoc', '/docs.json?id=nodoc']:
+            r = client.get(url, expect_errors=True)
+            self.assertEqual(r.status_int, 404)
+
+    def test_autocomplete(self):
+        client = TestApp(app)
+        r = client.get('/docs.json?q=DOC0')
+        self.assertEqual([d['id'] for d in r.json],
+                         ['doc%02d' % i for i in range(10)])
+        r = client.get('/docs.json?q=c2')
+        self.assertEqual([d['id'] for d in r.json],
+                         ['doc%02d' % i for i in range(20, 30)])
+        r = client.get('/docs.json?q=nodoc')
+        self.assertEqual(r.json, [])
+
+
+class TestTopicWords(unittest.TestCase):
+    def test_matches_full_sort(self):
+        for k in topic_range:
+            idxs, probs = app.topic_words(k, 5)
+            phi = app.v[k].phi.T
+            np.testing.assert_allclose(
+                probs, -np.sort(-phi, axis=1)[:, :5])
+            np.testing.assert_array_equal(
+                probs, phi[np.arange(k)[:, np.newaxis], idxs])
+
+    def test_topics_json(self):
+        client = TestApp(app)
+        r = client.get('/5/topics.json')
+        self.assertEqual(len(r.json), 5)
+        self.assertEqual(len(r.json['0']['words']), 10)
+        self.assertEqual(r.json['4']['label'], 'Topic 4')
+
+        r = client.get('/5/topics.json?n=3')
+        words, probs = app.topic_words(5, 3)
+        self.assertEqual(sorted(r.json['1']['words'].values()),
+                         sorted(probs[1].tolist()))
+
+        r = client.get('/5/topics.json?n=0', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+
+        r = client.get('/5/topics.json?n=101', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+        r = client.get('/topics_all.json?n=101', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+
+    def test_cached(self):
+        client = TestApp(app)
+        first = client.get('/3/topics.json?n=4').body
+        with patch.object(app, 'topic_words',
+                          side_effect=AssertionError("recomputed")):
+            self.assertEqual(client.get('/3/topics.json?n=4').body, first)
+
+    def test_label_file(self):
+        label_file = os.path.join(tmpdir, 'labels.txt')
+        with open(label_file, 'w') as f:
+            f.write('war\nmoney\nlaw\n')
+        labeled = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            label_file=label_file)
+        client = TestApp(labeled)
+        r = client.get('/3/topics.json')
+        self.assertEqual(r.json['1']['label'], 'money')
+        etag = r.headers['Etag']
+
+        with open(label_file, 'w') as f:
+            f.write('war\nfinance\nlaw\n')
+        os.utime(label_file, (0, 0))
+        r = client.get('/3/topics.json', headers={'If-None-Match': etag})
+        self.assertEqual(r.status_int, 200)
+        self.assertEqual(r.json['1']['label'], 'finance')
+
+
+class TestTopicsAll(unittest.TestCase):
+    def test_matches_per_model(self):
+        client = TestApp(app)
+        r = client.get('/topics_all.json?n=4')
+        self.assertEqual(sorted(r.json.keys()), ['3', '5'])
+        for k in topic_range:
+            self.assertEqual(r.json[str(k)],
+                             client.get('/{}/topics.json?n=4'.format(k)).json)
+
+    def test_gzip_and_etag(self):
+        import gzip, json
+        client = TestApp(app)
+        r = raw_get('/topics_all.json', **{'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(r.body).decode('utf-8')),
+                         client.get('/topics_all.json').json)
+
+        r = client.get('/topics_all.json',
+                       headers={'If-None-Match': r.headers['Etag']})
+        self.assertEqual(r.status_int, 304)
+
+
+class TestWordSearch(unittest.TestCase):
+    def test_matches_viewers(self):
+        client = TestApp(app)
+        r = client.get('/topics.json?q=war|market')
+        self.assertEqual(len(r.json), sum(topic_range))
+        for row in r.json:
+            d = app.v[row['k']].dist_word_top(['war', 'market'],
+                                              show_topics=False)
+            expected = dict((int(t), float(v)) for t, v in d)[row['t']]
+            self.assertAlmostEqual(row['distance'], expected, places=5)
+
+        with patch.object(app.word_search, 'rank',
+                          side_effect=AssertionError("recomputed")):
+            cached = client.get('/topics.json?q=market|war|war')
+        self.assertEqual(cached.json, r.json)
+
+    def test_unknown_words(self):
+        client = TestApp(app)
+        r = client.get('/topics.json?q=notaword', expect_errors=True)
+        self.assertEqual(r.status_int, 404)
+        self.assertIn('notaword', r.text)
+
+        with patch.object(app.vocab, 'stopped_words', set(['the'])):
+            r = client.get('/topics.json?q=the', expect_errors=True)
+        self.assertEqual(r.status_int, 410)
+
+        r = client.get('/3/word_docs.json?q=notaword', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+
+    def test_word_docs(self):
+        client = TestApp(app)
+        r = client.get('/5/word_docs.json?q=court|judge&n=5')
+        topics = app.v[5].dist_word_top(['court', 'judge'], show_topics=False)
+        expected = app.v[5].dist_top_doc(
+            topics['i'], weights=(topics['value'].max() - topics['value']))
+        self.assertEqual([d['id'] for d in r.json],
+                         [d for d, p in expected[:5]])
+        np.testing.assert_allclose([d['prob'] for d in r.json],
+                                   [1 - p for d, p in expected[:5]], rtol=1e-5)
+
+        r = client.get('/5/word_docs.json?q=court&n=-4')
+        self.assertEqual(len(r.json), 4)
+
+
+class TestTemplates(unittest.TestCase):
+    def test_pages_cached(self):
+        client = TestApp(app)
+        first = client.get('/').text
+        self.assertIn('<html', first)
+        with patch('topicexplorer.server.open',
+                   side_effect=AssertionError("template read")):
+            self.assertEqual(client.get('/').text, first)
+        # the model pages share a single rendering
+        self.assertEqual(client.get('/3/').text, client.get('/5/').text)
+        self.assertIn(('master.mustache.html', 'bars.mustache.html'), app.pages)
+
+    def test_template_reload(self):
+        page = os.path.join(tmpdir, 'splash.mustache.html')
+        master = os.path.join(tmpdir, 'master.mustache.html')
+        with open(master, 'w') as f:
+            f.write('<html>{{{body}}}</html>')
+        with open(page, 'w') as f:
+            f.write('{{context_type}} v1')
+
+        def resource_path(path):
+            return os.path.join(tmpdir, os.path.basename(path))
+
+        reloading = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            template_reload=True)
+        with patch('topicexplorer.server.get_static_resource_path',
+                   side_effect=resource_path):
+            client = TestApp(reloading)
+            self.assertEqual(client.get('/').text, '<html>document v1</html>')
+            with open(page, 'w') as f:
+                f.write('{{context_type}} v2')
+            os.utime(page, (0, 0))
+            self.assertEqual(client.get('/').text, '<html>document v2</html>')
+
+
+class TestCompression(unittest.TestCase):
+    def test_cached_with_etag(self):
+        import gzip, json
+        client = TestApp(app)
+        r = raw_get('/docs.json', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', r.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(r.body).decode('utf-8')),
+                         client.get('/docs.json').json)
+        with patch('topicexplorer.lib.compression.compress',
+                   side_effect=AssertionError("compressed again")):
+            self.assertEqual(
+                raw_get('/docs.json', **{'Accept-Encoding': 'gzip'}).body,
+                r.body)
+
+        # small responses are not compressed
+        r = raw_get('/docs.json?id=doc00', **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', r.headers)
+
+    @unittest.skipUnless(compression.available('br'), "requires brotli")
+    def test_brotli(self):
+        import brotli, json
+        r = raw_get('/docs.json', **{'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(r.headers['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(brotli.decompress(r.body).decode('utf-8')),
+                         TestApp(app).get('/docs.json').json)
+
+    def test_static_precompressed(self):
+        import gzip
+        plain = raw_get('/topicprint.js')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        r = raw_get('/topicprint.js', **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', r.headers)
+
+        static_cache = os.path.join(tmpdir, 'static')
+        os.mkdir(static_cache)
+        with open(os.path.join(static_cache, 'topicprint.js.gz'), 'wb') as f:
+            f.write(compression.compress(plain.body, 'gzip'))
+        precompressed = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            static_cache=static_cache)
+        r = raw_get('/topicprint.js', precompressed,
+                    **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(r.content_type, plain.content_type)
+        self.assertEqual(gzip.decompress(r.body), plain.body)
+
+        uncompressed = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document', compress=False)
+        r = raw_get('/docs.json', uncompressed, **{'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', r.headers)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_hits(self):
+        client = TestApp(app)
+        first = client.get('/3/docs_topics/doc04.json?n=6')
+        hits = app.response_cache.hits
+        with patch.object(app, 'doc_neighbors',
+                          side_effect=AssertionError("recomputed")):
+            self.assertEqual(
+                client.get('/3/docs_topics/doc04.json?n=6').json, first.json)
+        self.assertEqual(app.response_cache.hits, hits + 1)
+
+        # binary responses are cached with their format
+        r = client.get('/3/docs_topics/doc04.json?n=6&format=npy')
+        self.assertEqual(r.content_type, 'application/x-npy')
+        r = client.get('/3/docs_topics/doc04.json?n=6&format=npy')
+        self.assertEqual(r.content_type, 'application/x-npy')
+        self.assertEqual(len(np.load(BytesIO(r.body))), 6)
+
+    def test_normalized_query(self):
+        client = TestApp(app)
+        first = client.get('/5/word_docs.json?q=war|court')
+        hits = app.response_cache.hits
+        self.assertEqual(client.get('/5/word_docs.json?q=court|war').json,
+                         first.json)
+        self.assertEqual(app.response_cache.hits, hits + 1)
+
+    def test_errors_not_cached(self):
+        client = TestApp(app)
+        for _ in range(2):
+            client.get('/3/docs_topics/nodoc.json', status=404)
+        stats = client.get('/cache.json').json
+        self.assertEqual(stats['backend'], 'memory')
+        self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+        self.assertFalse(any(u'nodoc' in key
+                             for key in app.response_cache._entries))
+
+    def test_sqlite(self):
+        filename = os.path.join(tmpdir, 'responses.sqlite')
+        apps = [topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            response_cache='sqlite', response_cache_file=filename)
+            for _ in range(2)]
+        first = TestApp(apps[0]).get('/5/topics/1.json')
+        self.assertTrue(os.path.exists(filename))
+        self.assertEqual(TestApp(apps[1]).get('/5/topics/1.json').json,
+                         first.json)
+        self.assertEqual(apps[1].response_cache.hits, 1)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_metrics(self):
+        client = TestApp(app)
+        client.get('/3/topics/0.json')
+        client.get('/3/topics/0.json')
+        client.get('/7/topics/0.json', status=400)
+        r = client.get('/metrics')
+        self.assertTrue(r.content_type.startswith('text/plain'))
+        self.assertIn('topicexplorer_requests_total{method="GET",'
+                      'route="/<k:int>/topics/<topic_no:int>.json",'
+                      'status="400"} 1', r.text)
+        self.assertIn('topicexplorer_request_duration_seconds_bucket{'
+                      'le="+Inf",route="/<k:int>/topics/<topic_no:int>.json"}',
+                      r.text)
+        self.assertIn('topicexplorer_model_load_seconds{k="5"}', r.text)
+        self.assertIn('topicexplorer_response_cache_hits_total{'
+                      'backend="memory"}', r.text)
+        # the scrape itself is in flight
+        self.assertIn('topicexplorer_requests_in_flight 1', r.text)
+
+
+class TestFulltext(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus_path = os.path.join(tmpdir, 'raw')
+        os.mkdir(cls.corpus_path)
+        for n in range(3):
+            with open(os.path.join(cls.corpus_path, 'doc%02d.txt' % n), 'w') as f:
+                f.write(''.join(chr(ord('a') + i % 26) for i in range(1000)))
+        cls.app = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            fulltext=True, corpus_path=cls.corpus_path)
+
+    def test_file(self):
+        client = TestApp(self.app)
+        r = client.get('/fulltext/doc01')
+        self.assertEqual(r.content_type, 'text/plain')
+        self.assertEqual(len(r.body), 1000)
+        self.assertIn('max-age', r.headers['Cache-Control'])
+        self.assertEqual(r.headers['Accept-Ranges'], 'bytes')
+        client.get('/fulltext/doc99', status=404)
+
+        r = client.get('/fulltext/doc01.txt',
+                       headers={'If-None-Match': r.headers['ETag']})
+        self.assertEqual(r.status_int, 304)
+
+    def test_range(self):
+        client = TestApp(self.app)
+        r = client.get('/fulltext/raw/doc02.txt',
+                       headers={'Range': 'bytes=26-51'})
+        self.assertEqual(r.status_int, 206)
+        self.assertEqual(r.body, b'abcdefghijklmnopqrstuvwxyz')
+        self.assertEqual(r.headers['Content-Range'], 'bytes 26-51/1000')
+
+        r = client.get('/fulltext/doc02.txt', headers={'Range': 'bytes=-3'})
+        self.assertEqual(r.body, b'jkl')
+
+        # a stale If-Range sends the whole file
+        r = client.get('/fulltext/doc02.txt',
+                       headers={'Range': 'bytes=0-9', 'If-Range': 'old'})
+        self.assertEqual(r.status_int, 200)
+        self.assertEqual(len(r.body), 1000)
+
+        r = client.get('/fulltext/doc02.txt',
+                       headers={'Range': 'bytes=2000-'}, status=416)
+        self.assertEqual(r.headers['Content-Range'], 'bytes */1000')
+
+
+class TestClusterJob(unittest.TestCase):
+    def setUp(self):
+        self.app = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document')
+        self.cluster_file = os.path.join(tmpdir, 'corpus-cluster.csv')
+
+    def tearDown(self):
+        if os.path.exists(self.cluster_file):
+            os.remove(self.cluster_file)
+
+    def test_background_job(self):
+        import threading
+        release = threading.Event()
+        calls = []
+
+        def cluster(n_clusters, config_file, viewers=None):
+            calls.append(list(viewers))
+            release.wait(10)
+            with open(self.cluster_file, 'w') as f:
+                f.write('k,topic,orig_x,orig_y,cluster\n3,0,0.1,0.2,1\n')
+            return self.cluster_file
+
+        client = TestApp(self.app)
+        with patch('topicexplorer.train.cluster', side_effect=cluster):
+            for _ in range(3):
+                r = client.get('/cluster.csv')
+                self.assertEqual(r.status_int, 202)
+            self.assertEqual(r.json['status'], 'running')
+            self.assertEqual(r.headers['Location'], 'jobs/cluster.json')
+            self.assertEqual(client.get('/jobs/cluster.json').json['status'],
+                             'running')
+
+            release.set()
+            self.app.jobs.get('cluster').wait(10)
+            r = client.get('/cluster.csv')
+            self.assertEqual(r.status_int, 200)
+            self.assertTrue(r.text.startswith('k,topic'))
+            self.assertEqual(client.get('/jobs/cluster.json').json['status'],
+                             'done')
+        # one job, on the loaded viewers
+        self.assertEqual(calls, [topic_range])
+
+    def test_failed_job(self):
+        client = TestApp(self.app)
+        with patch('topicexplorer.train.cluster',
+                   side_effect=ValueError("too few topics")):
+            client.get('/cluster.csv', status=202)
+            self.app.jobs.get('cluster').wait(10)
+            r = client.get('/cluster.csv', status=500)
+            self.assertIn('too few topics', r.text)
+            client.get('/cluster.csv', status=202)
+        client.get('/jobs/missing.json', status=404)
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        self.cluster_file = os.path.join(tmpdir, 'warm-cluster.csv')
+        with open(self.cluster_file, 'w') as f:
+            f.write('k,topic,orig_x,orig_y,cluster\n3,0,0.1,0.2,1\n')
+        self.app = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            cluster_path=self.cluster_file)
+
+    def tearDown(self):
+        os.remove(self.cluster_file)
+
+    def test_warm_up(self):
+        client = TestApp(self.app)
+        self.assertEqual(client.get('/healthz').json['status'], 'ok')
+        self.assertIsNone(client.get('/readyz').json['warm_up'])
+
+        self.app.warm_up()
+        readiness = client.get('/readyz').json
+        self.assertTrue(readiness['ready'])
+        self.assertEqual(readiness['models'],
+                         {'loaded': 2, 'total': 2, 'version': 1})
+        self.assertEqual(readiness['warm_up']['errors'], [])
+        self.assertEqual(readiness['warm_up']['done'],
+                         readiness['warm_up']['total'])
+
+        # indexes and caches are built, and the requests are not counted
+        self.assertEqual(sorted(self.app.topic_indexes), topic_range)
+        self.assertEqual(sorted(self.app.top_words), topic_range)
+        self.assertGreater(self.app.response_cache.stats()['entries'], 0)
+        self.assertNotIn('route="/<k:int>/topics.json"',
+                         client.get('/metrics').text)
+
+    def test_not_ready(self):
+        from topicexplorer.lib.warmup import WarmUp
+        self.app.warmup = WarmUp(['/'])
+        r = TestApp(self.app).get('/readyz', status=503)
+        self.assertFalse(r.json['ready'])
+        self.assertEqual(r.json['warm_up']['done'], 0)
+
+
+class TestReload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # models trained for more iterations, as by `train --continue`
+        corpus = Corpus.load(corpus_file)
+        cls.retrained = os.path.join(tmpdir, 'corpus-LDA-K{0}-document-10.npz')
+        for k in topic_range:
+            m = LDA(corpus, 'document', K=k, seed_or_seeds=41)
+            m.train(n_iterations=10)
+            m.save(cls.retrained.format(k))
+
+    def create_app(self, **kwargs):
+        return topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document', **kwargs)
+
+    def test_reload(self):
+        reloading = self.create_app()
+        client = TestApp(reloading)
+        etag = client.get('/3/topics.json').headers['ETag']
+        client.get('/3/topics/0.json')
+        old = reloading.v[3]
+        self.assertFalse(reloading.reload())
+
+        # requests in flight keep the models they started with
+        with reloading.pinned():
+            self.assertTrue(reloading.reload(self.retrained))
+            self.assertIs(reloading.v[3], old)
+            self.assertIn(3, reloading.topic_indexes)
+        self.assertIsNot(reloading.v[3], old)
+        self.assertEqual(reloading.fingerprints[3],
+                         file_digest(self.retrained.format(3)))
+        self.assertEqual(reloading.topic_indexes, dict())
+
+        r = client.get('/3/topics.json', headers={'If-None-Match': etag})
+        self.assertEqual(r.status_int, 200)
+        self.assertNotEqual(r.headers['ETag'], etag)
+        self.assertEqual(client.get('/readyz').json['models']['version'], 2)
+        self.assertFalse(reloading.reload(self.retrained))
+
+    def test_topic_range(self):
+        reloading = self.create_app()
+        client = TestApp(reloading)
+        self.assertIn('var ks = [3, 5, ]', client.get('/3/').text)
+        reloading.reload(self.retrained, [3])
+        self.assertEqual(reloading.topic_range, [3])
+        self.assertIn('var ks = [3, ]', client.get('/3/').text)
+        client.get('/5/topics.json', status=400)
+        self.assertEqual(len(client.get('/topics_all.json').json), 1)
+
+    def test_lazy_models(self):
+        reloading = self.create_app(lazy_models=True)
+        reloading.reload(self.retrained)
+        self.assertEqual(reloading.v.loaded(), [])
+        retrained = LDA.load(self.retrained.format(5))
+        np.testing.assert_allclose(reloading.v[5].model.top_doc,
+                                   retrained.top_doc)
+
+    def test_watch(self):
+        config_file = os.path.join(tmpdir, 'reload.ini')
+
+        def write_config(pattern):
+            with open(config_file, 'w') as f:
+                f.write('[main]\nmodel_pattern = {0}\ntopics = {1}\n'.format(
+                    pattern, topic_range))
+
+        write_config(model_pattern)
+        reloading = self.create_app(config_file=config_file)
+        reloading.watch(3600)
+        try:
+            write_config(self.retrained)
+            stat = os.stat(config_file)
+            os.utime(config_file, (stat.st_atime, stat.st_mtime + 10))
+            reloading.watcher.poll()
+            self.assertTrue(reloading.watcher.poll())
+            self.assertEqual(reloading.model_pattern, self.retrained)
+            self.assertEqual(reloading.models.version, 2)
+            self.assertFalse(reloading.watcher.poll())
+        finally:
+            reloading.watcher.stop()
+            os.remove(config_file)
+
+    def test_watch_on_change(self):
+        changes = []
+        reloading = self.create_app()
+        reloading.watch(3600, lambda: changes.append(1))
+        try:
+            path = model_pattern.format(topic_range[0])
+            stat = os.stat(path)
+            os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+            reloading.watcher.poll()
+            self.assertTrue(reloading.watcher.poll())
+            self.assertEqual(changes, [1])
+            self.assertEqual(reloading.models.version, 1)
+        finally:
+            reloading.watcher.stop()
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+
+    def test_watcher_released(self):
+        import gc
+        import weakref
+        reloading = self.create_app()
+        reloading.watch(3600)
+        watcher, ref = reloading.watcher, weakref.ref(reloading)
+        del reloading
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertTrue(watcher._stop.is_set())
+
+
+class TestInfer(unittest.TestCase):
+    def test_python_api(self):
+        text = 'The army marched to war; the battle was won.'
+        theta, lengths = app.infer(3, [text, 'stock price market'])
+        self.assertEqual(theta.shape, (2, 3))
+        np.testing.assert_allclose(theta.sum(axis=1), 1)
+        self.assertEqual(lengths, [3, 3])
+
+        # a text of the words of doc00, doc04, ... is nearest to them
+        theta, _ = app.infer(5, ['war army battle ' * 7])
+        similar = [doc for doc, _ in app.nearest_docs(5, theta[0], 5)]
+        self.assertEqual([int(doc[3:]) % 4 for doc in similar], [0] * 5)
+
+        # the neighbor index finds documents as near in a small corpus
+        indexed = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            neighbor_index=True)
+        np.testing.assert_allclose(
+            [dist for _, dist in indexed.nearest_docs(5, theta[0], 5)],
+            [dist for _, dist in app.nearest_docs(5, theta[0], 5)])
+
+    def test_route(self):
+        client = TestApp(app)
+        r = client.post('/3/infer', 'war army battle war',
+                        content_type='text/plain')
+        self.assertEqual(len(r.json), 1)
+        self.assertEqual(sorted(r.json[0]['topics']), ['0', '1', '2'])
+        self.assertEqual(r.json[0]['tokens'], 4)
+        self.assertEqual(len(r.json[0]['similar']), 10)
+        self.assertEqual(sorted(r.json[0]['similar'][0]),
+                         ['id', 'label', 'metadata', 'prob', 'topics'])
+
+        r = client.post_json('/5/infer?n=0',
+                             {'texts': ['court judge', 'school', 'nothing']})
+        self.assertEqual([d['tokens'] for d in r.json], [2, 1, 0])
+        self.assertNotIn('similar', r.json[0])
+        r = client.post_json('/5/infer?n=3', {'text': 'stock market'})
+        self.assertEqual(len(r.json[0]['similar']), 3)
+
+    def test_errors(self):
+        client = TestApp(app)
+        client.post('/4/infer', 'war', content_type='text/plain', status=400)
+        for body in [[], {'texts': []}, {'texts': 'war'}, {'text': 3}]:
+            client.post_json('/3/infer', body, status=400)
+        client.post('/3/infer', '{', content_type='application/json',
+                    status=400)
+        client.post_json(
+            '/3/infer',
+            {'texts': ['war'] * (topicexplorer.server.INFER_MAX_TEXTS + 1)},
+            status=413)
+        for n in [-1, topicexplorer.server.INFER_MAX_SIMILAR + 1]:
+            client.post('/3/infer?n={}'.format(n), 'war',
+                        content_type='text/plain', status=400)
+
+
+class TestLazyModels(unittest.TestCase):
+    def test_lazy_loading(self):
+        lazy = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            lazy_models=True, model_memory=1)
+        self.assertEqual(lazy.v.loaded(), [])
+        self.assertEqual(lazy.fingerprints, app.fingerprints)
+
+        client = TestApp(lazy)
+        r = client.get('/3/topics.json')
+        self.assertEqual(r.json, client.get('/3/topics.json').json)
+        self.assertEqual(lazy.v.loaded(), [3])
+
+        # the budget only fits one model at a time
+        client.get('/5/topics/1.json')
+        self.assertEqual(lazy.v.loaded(), [5])
+        self.assertNotIn(3, lazy.topic_indexes)
+        self.assertEqual(lazy.v.evictions, 1)
+
+        # word searches rank the models in memory without loading others
+        r = client.get('/topics.json?q=war')
+        self.assertEqual(set(row['k'] for row in r.json), set([5]))
+        self.assertEqual(lazy.v.loaded(), [5])
+        self.assertEqual(lazy.v.loads, 2)
+
+        client.get('/3/topics/1.json')
+        r = client.get('/topics.json?q=war')
+        self.assertEqual(set(row['k'] for row in r.json), set([3]))
+
+        r = client.get('/5/word_docs.json?q=war')
+        self.assertEqual(r.json, client.get('/5/word_docs.json?q=war').json)
+        self.assertEqual(lazy.v.loaded(), [5])
+
+    def test_evicted_topic_index(self):
+        lazy = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            lazy_models=True)
+        expected = lazy.topic_docs(3, 1, 5)
+
+        class Evicted(dict):
+            """ Indexes dropped as soon as they are checked for. """
+            def __contains__(self, k):
+                return True
+
+            def __getitem__(self, k):
+                raise KeyError(k)
+
+            def get(self, k, default=None):
+                return default
+
+        lazy.models.topic_indexes = Evicted()
+        self.assertEqual(lazy.topic_docs(3, 1, 5), expected)
+
+
+class TestSharedCorpus(unittest.TestCase):
+    def test_shared_corpus(self):
+        import gc
+        from topicexplorer.lib.dispatch import memory_usage
+
+        other = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document')
+        self.assertIs(other.c, app.c)
+        self.assertIs(other.label_index, app.label_index)
+        self.assertIs(other.vocab, app.vocab)
+        self.assertIsNot(other.v[3], app.v[3])
+
+        # the corpus is counted once
+        self.assertGreater(memory_usage([app, other]), memory_usage([app]))
+        self.assertLess(memory_usage([app, other]), 2 * memory_usage([app]))
+
+        key = ('corpus', app.corpus_fingerprint)
+        del other
+        gc.collect()
+        self.assertIn(key, topicexplorer.server.shared_objects)
+
+
+class TestLabelTable(unittest.TestCase):
+    def setUp(self):
+        import types
+        self.calls = []
+        module = types.ModuleType('test_label_module')
+        module.init = lambda app, config_file: None
+        module.label_files = []
+
+        def label(doc):
+            self.calls.append(doc)
+            return 'Document ' + doc[3:]
+        module.label = label
+        sys.modules['test_label_module'] = module
+        self.module = module
+
+    def tearDown(self):
+        del sys.modules['test_label_module']
+        for filename in os.listdir(tmpdir):
+            if '-labels-' in filename:
+                os.remove(os.path.join(tmpdir, filename))
+
+    def create_app(self, **kwargs):
+        return topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            label_module='test_label_module', **kwargs)
+
+    def test_labels(self):
+        labeled = self.create_app()
+        self.assertEqual(len(self.calls), 30)
+        self.assertTrue(any('-labels-test_label_module-document-' in filename
+                            for filename in os.listdir(tmpdir)))
+
+        client = TestApp(labeled)
+        r = client.get('/docs.json')
+        self.assertEqual([d['label'] for d in r.json],
+                         ['Document %02d' % i for i in range(30)])
+        r = client.get('/docs.json?q=document 1')
+        self.assertEqual(len(r.json), 10)
+        self.assertEqual(labeled.label('doc05'), 'Document 05')
+        self.assertEqual(len(self.calls), 30)
+
+        # read from the saved table
+        del labeled
+        import gc
+        gc.collect()
+        self.create_app()
+        self.assertEqual(len(self.calls), 30)
+
+    def test_batch(self):
+        # labels read from a file, which is part of the table key
+        label_file = os.path.join(tmpdir, 'titles.txt')
+        with open(label_file, 'w') as f:
+            f.write('upper')
+        self.module.label_files = [label_file]
+        self.module.labels = lambda docs: [doc.upper() for doc in docs]
+        labeled = self.create_app()
+        self.assertEqual(self.calls, [])
+        r = TestApp(labeled).get('/docs.json?id=doc03')
+        self.assertEqual(r.json[0]['label'], 'DOC03')
+        os.remove(label_file)
+
+    def test_convert(self):
+        label_file = os.path.join(tmpdir, 'convert.txt')
+        with open(label_file, 'w') as f:
+            f.write('convert')
+        self.module.label_files = [label_file]
+        batches = []
+        self.module.labels = lambda docs: batches.append(docs) or \
+            ['Document ' + doc[3:] for doc in docs]
+
+        table = build_label_table(corpus_file, 'document',
+                                  'test_label_module', None)
+        self.assertEqual(table, ['Document %02d' % i for i in range(30)])
+        # the server reads the table built by convert
+        labeled = self.create_app()
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(labeled.label('doc05'), 'Document 05')
+        os.remove(label_file)
+
+    def test_response_cache(self):
+        # responses cached without the label module are not served with it
+        filename = os.path.join(tmpdir, 'labels.responses.sqlite')
+        unlabeled = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document',
+            response_cache='sqlite', response_cache_file=filename)
+        r = TestApp(unlabeled).get('/5/topics/1.json')
+        self.assertTrue(r.json[0]['label'].startswith('doc'))
+
+        labeled = self.create_app(response_cache='sqlite',
+                                  response_cache_file=filename)
+        r = TestApp(labeled).get('/5/topics/1.json')
+        self.assertTrue(r.json[0]['label'].startswith('Document '))
+        self.assertEqual(labeled.response_cache.hits, 0)
+        os.remove(filename)
+
+    def test_failed_labels(self):
+        # labels read from a file that cannot be read for one document
+        label_file = os.path.join(tmpdir, 'partial.txt')
+        with open(label_file, 'w') as f:
+            f.write('partial')
+        self.module.label_files = [label_file]
+
+        def label(doc):
+            if doc == 'doc05':
+                raise IOError(doc)
+            return 'Document ' + doc[3:]
+        self.module.label = label
+        labeled = self.create_app()
+        self.assertEqual(labeled.label('doc05'), 'doc05')
+        self.assertEqual(labeled.label('doc06'), 'Document 06')
+        # labeled again on the next launch
+        self.assertFalse(any('-labels-' in filename
+                             for filename in os.listdir(tmpdir)))
+        os.remove(label_file)
+
+
+class TestDocTopicsBatch(unittest.TestCase):
+    def test_matrix(self):
+        client = TestApp(app)
+        ids = ['doc04', 'doc01', 'doc04']
+        r = client.get('/doc_topics.json', {'id': ids, 'k': 'all'})
+        self.assertEqual(r.json['ids'], ids)
+        self.assertEqual(r.json['k'], topic_range)
+        self.assertEqual(r.json['offsets'], {'3': 0, '5': 3})
+
+        topics = np.array(r.json['topics'])
+        self.assertEqual(topics.shape, (3, 8))
+        for row, doc in zip(topics, ids):
+            mixture = dict(app.v[5].doc_topics(app.label_index[doc]))
+            np.testing.assert_allclose(row[3:], [mixture[t] for t in range(5)])
+
+        r = client.post_json('/doc_topics.json', {'id': ids, 'k': [5, 3]})
+        np.testing.assert_allclose(np.array(r.json['topics']),
+                                   np.hstack([topics[:, 3:], topics[:, :3]]))
+
+    def test_npy(self):
+        client = TestApp(app)
+        r = client.get('/doc_topics.json?id=doc02&id=doc03&k=5&format=npy')
+        self.assertEqual(r.content_type, 'application/x-npy')
+        self.assertEqual(r.headers['X-Topic-Range'], '5')
+        matrix = np.load(BytesIO(r.body))
+        np.testing.assert_array_equal(
+            matrix, app.doc_topics_matrix(['doc02', 'doc03'], [5]))
+
+        etag = r.headers['Etag']
+        r = client.get('/doc_topics.json?id=doc02&k=5&format=npy',
+                       headers={'If-None-Match': etag})
+        self.assertEqual(r.status_int, 304)
+        r = client.get('/doc_topics.json?id=doc02&k=5',
+                       headers={'If-None-Match': etag})
+        self.assertEqual(r.status_int, 200)
+
+    def test_errors(self):
+        client = TestApp(app)
+        r = client.get('/doc_topics.json?id=doc01&id=nodoc', expect_errors=True)
+        self.assertEqual(r.status_int, 404)
+        self.assertIn('nodoc', r.text)
+        r = client.get('/doc_topics.json?id=doc01&k=4', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+        r = client.post('/doc_topics.json', '["doc01"]',
+                        content_type='application/json', expect_errors=True)
+        self.assertEqual(r.status_int, 400)
+
+
+class TestBinaryFormats(unittest.TestCase):
+    def test_doc_tables(self):
+        client = TestApp(app)
+        for url in ['/3/docs_topics/doc01.json?n=5', '/3/topics/1.json?n=5',
+                    '/3/word_docs.json?q=war&n=5']:
+            js = client.get(url).json
+            r = client.get(url + '&format=npy')
+            self.assertEqual(r.content_type, 'application/x-npy')
+            self.assertIn('Accept', r.headers.getall('Vary'))
+            table = np.load(BytesIO(r.body))
+            self.assertEqual(table['doc'].tolist(), [doc['id'] for doc in js])
+            np.testing.assert_allclose(table['prob'],
+                                       [doc['prob'] for doc in js])
+            for row, doc in zip(table['topics'], js):
+                np.testing.assert_allclose(
+                    row, [doc['topics'][str(t)] for t in range(3)])
+
+    def test_word_topics(self):
+        client = TestApp(app)
+        js = client.get('/topics.json?q=war').json
+        r = client.get('/topics.json?q=war',
+                       headers={'Accept': 'application/x-npy'})
+        table = np.load(BytesIO(r.body))
+        self.assertEqual(table['k'].tolist(), [row['k'] for row in js])
+        self.assertEqual(table['t'].tolist(), [row['t'] for row in js])
+
+    def test_doc_topics(self):
+        client = TestApp(app)
+        csv_body = client.get('/3/doc_topics/doc01')
+        self.assertTrue(csv_body.content_type.startswith('text/csv'))
+        rows = [line.split(',') for line in csv_body.text.split()[1:]]
+
+        r = client.get('/3/doc_topics/doc01?format=npy')
+        self.assertEqual(r.content_type, 'application/x-npy')
+        self.assertIn('Accept', r.headers.getall('Vary'))
+        table = np.load(BytesIO(r.body))
+        self.assertEqual(table['topic'].tolist(), [int(t) for t, _ in rows])
+        np.testing.assert_allclose(table['prob'], [float(p) for _, p in rows],
+                                   atol=1e-6)
+
+        js = client.get('/3/doc_topics/doc01?format=json').json
+        self.assertEqual(sorted(js), ['0', '1', '2'])
+        self.assertEqual(client.get('/3/doc_topics/doc01?format=csv').body,
+                         csv_body.body)
+
+    def test_topics(self):
+        client = TestApp(app)
+        js = client.get('/5/topics.json?n=4').json
+        r = client.get('/5/topics.json?n=4',
+                       headers={'Accept': 'application/x-npy'})
+        self.assertEqual(r.content_type, 'application/x-npy')
+        self.assertIn('Accept', r.headers.getall('Vary'))
+        table = np.load(BytesIO(r.body))
+        self.assertEqual(table['topic'].tolist(), list(range(5)))
+        self.assertEqual(table['label'].tolist(),
+                         [js[str(t)]['label'] for t in range(5)])
+        for t in range(5):
+            self.assertEqual(dict(zip(table['words'][t].tolist(),
+                                      table['probs'][t].tolist())),
+                             js[str(t)]['words'])
+
+    def test_etags(self):
+        client = TestApp(app)
+        for url in ['/3/topics/1.json', '/3/doc_topics/doc01',
+                    '/3/topics.json']:
+            etag = client.get(url).headers['Etag']
+            r = client.get(url + '?format=npy')
+            self.assertNotEqual(r.headers['Etag'], etag)
+            r = client.get(url + '?format=npy',
+                           headers={'If-None-Match': etag})
+            self.assertEqual(r.status_int, 200)
+
+    def test_unknown_format(self):
+        for url in ['/3/topics/1.json', '/3/doc_topics/doc01',
+                    '/3/topics.json']:
+            r = TestApp(app).get(url + '?format=xml', expect_errors=True)
+            self.assertEqual(r.status_int, 406)
+
+
+class TestMmap(unittest.TestCase):
+    def test_mmap_responses(self):
+        from topicexplorer.lib import mmapstore
+        mmapstore.convert_corpus(corpus_file, file_digest(corpus_file))
+        for k in topic_range:
+            mmapstore.convert_model(model_pattern.format(k),
+                                    app.fingerprints[k])
+        mapped = topicexplorer.server.Application(
+            corpus_file=corpus_file, model_pattern=model_pattern,
+            topic_range=topic_range, context_type='document', mmap=True)
+        self.assertIsInstance(mapped.v[3].theta, np.memmap)
+        self.assertIsInstance(mapped.c.context_data[0], np.memmap)
+
+        client, mapped_client = TestApp(app), TestApp(mapped)
+        for url in ['/3/topics.json', '/5/docs/doc04?n=10', '/3/doc_topics/doc01',
+                    '/3/docs_topics/doc01.json', '/docs.json?q=doc1',
+                    '/topics.json?q=war', '/5/word_docs.json?q=court']:
+            self.assertEqual(client.get(url).body, mapped_client.get(url).body)
+
+    def test_mmap_missing_store(self):
+        # models without a store are loaded from their files
+        with patch('topicexplorer.lib.mmapstore.load_viewer',
+                   return_value=None):
+            mapped = topicexplorer.server.Application(
+                corpus_file=corpus_file, model_pattern=model_pattern,
+                topic_range=topic_range, context_type='document', mmap=True)
+        self.assertNotIsInstance(mapped.v[3].theta, np.memmap)
+        self.assertEqual(TestApp(mapped).get('/3/topics.json').body,
+                         TestApp(app).get('/3/topics.json').body)
+
+
+if __name__ == '__main__':
+    unittest.main()
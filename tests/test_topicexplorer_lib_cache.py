@@ -0,0 +1,95 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+from topicexplorer.lib import cache
+
+
+class TestMakeKey(unittest.TestCase):
+    def test_normalized(self):
+        self.assertEqual(cache.make_key('topic', 3, {'n': 5, 'topic': 1}, 'f'),
+                         cache.make_key('topic', 3, {'topic': 1, 'n': 5}, 'f'))
+        self.assertNotEqual(cache.make_key('topic', 3, {'n': 5}, 'f'),
+                            cache.make_key('topic', 3, {'n': 5}, 'g'))
+
+
+class CacheTests(object):
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.set('a', b'x' * 40)
+        self.assertEqual(self.cache.get('a'), b'x' * 40)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual((stats['entries'], stats['bytes']), (1, 40))
+
+    def test_lru_eviction(self):
+        for key in 'abc':
+            self.cache.set(key, b'x' * 40)
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertIsNone(self.cache.get('a'))
+
+        # a hit makes an entry the most recent
+        self.cache.get('b')
+        self.cache.set('d', b'x' * 40)
+        self.assertEqual(self.cache.get('b'), b'x' * 40)
+        self.assertIsNone(self.cache.get('c'))
+        self.assertLessEqual(self.cache.stats()['bytes'], 100)
+
+        # entries larger than the cache are not kept
+        self.cache.set('e', b'x' * 200)
+        self.assertIsNone(self.cache.get('e'))
+
+
+class TestMemoryCache(CacheTests, unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.MemoryCache(100)
+
+
+class TestSQLiteCache(CacheTests, unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'responses.sqlite')
+        self.cache = cache.SQLiteCache(self.filename, 100)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shared(self):
+        self.cache.set('a', b'shared')
+        other = cache.SQLiteCache(self.filename, 100)
+        self.assertEqual(other.get('a'), b'shared')
+
+    def test_usage(self):
+        self.cache.set('a', b'x' * 40)
+        self.cache.set('a', b'x' * 20)
+        for key in 'bcd':
+            self.cache.set(key, b'x' * 30)
+        db = self.cache._connect()
+        self.assertEqual(self.cache.usage(), tuple(db.execute(
+            'SELECT COUNT(*), SUM(size) FROM responses').fetchone()))
+        self.assertEqual(self.cache.usage(), (3, 90))
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            cache.ResponseCache(100)
+
+
+class TestOpenCache(unittest.TestCase):
+    def test_backends(self):
+        self.assertIsInstance(cache.open_cache('memory', 100),
+                              cache.MemoryCache)
+        self.assertIsNone(cache.open_cache('none', 100))
+        with self.assertRaises(ValueError):
+            cache.open_cache('redis', 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import gzip
+import os
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+from topicexplorer.lib import compression
+
+
+class TestNegotiate(unittest.TestCase):
+    def test_accept_encoding(self):
+        self.assertIsNone(compression.negotiate(None))
+        self.assertIsNone(compression.negotiate('identity'))
+        self.assertEqual(compression.negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.negotiate('gzip;q=0.5, deflate'), 'gzip')
+        self.assertIsNone(compression.negotiate('gzip;q=0'))
+        self.assertEqual(compression.negotiate('br;q=0, *'), 'gzip')
+
+    @unittest.skipUnless(compression.available('br'), "requires brotli")
+    def test_brotli_preferred(self):
+        self.assertEqual(compression.negotiate('gzip, deflate, br'), 'br')
+        self.assertEqual(compression.negotiate('gzip, br;q=0.5'), 'gzip')
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.root = mkdtemp()
+        self.cache = mkdtemp()
+        os.mkdir(os.path.join(self.root, 'lib'))
+        self.script = os.path.join(self.root, 'lib', 'app.js')
+        with open(self.script, 'w') as f:
+            f.write('var topics = [];\n' * 200)
+        with open(os.path.join(self.root, 'small.css'), 'w') as f:
+            f.write('body {}')
+        with open(os.path.join(self.root, 'image.png'), 'wb') as f:
+            f.write(b'\0' * 4096)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.cache)
+
+    def test_precompress(self):
+        encodings = [e for e in compression.ENCODINGS
+                     if compression.available(e)]
+        self.assertEqual(compression.precompress(self.root, self.cache),
+                         len(encodings))
+        path = compression.compressed_path(self.script, 'gzip', self.root,
+                                           self.cache)
+        self.assertEqual(path, os.path.join(self.cache, 'lib', 'app.js.gz'))
+        with open(self.script, 'rb') as f, gzip.open(path) as compressed:
+            self.assertEqual(compressed.read(), f.read())
+        self.assertFalse(os.path.exists(
+            os.path.join(self.cache, 'small.css.gz')))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.cache, 'image.png.gz')))
+
+        # nothing is written next to the files
+        self.assertEqual(sorted(os.listdir(self.root)),
+                         ['image.png', 'lib', 'small.css'])
+        self.assertEqual(os.listdir(os.path.join(self.root, 'lib')),
+                         ['app.js'])
+
+        # copies are only rewritten when the file changes
+        self.assertEqual(compression.precompress(self.root, self.cache), 0)
+        os.utime(path, (0, 0))
+        self.assertIsNone(compression.compressed_path(
+            self.script, 'gzip', self.root, self.cache))
+        self.assertEqual(compression.precompress(self.root, self.cache), 1)
+
+if __name__ == '__main__':
+    unittest.main()
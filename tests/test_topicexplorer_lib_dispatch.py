@@ -0,0 +1,184 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import gc
+import threading
+import time
+
+from webtest import TestApp
+
+from topicexplorer.lib.dispatch import Dispatcher, SharedObjects
+
+
+class Owner(object):
+    pass
+
+
+def echo_app(name):
+    """ Returns a WSGI app answering with its name and the request paths. """
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [u'{0} {1} {2}'.format(name, environ['SCRIPT_NAME'],
+                                      environ['PATH_INFO']).encode('utf-8')]
+    return app
+
+
+class TestSharedObjects(unittest.TestCase):
+    def test_shared_until_owners_collected(self):
+        shared = SharedObjects()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return [1, 2, 3]
+
+        first, second = Owner(), Owner()
+        obj = shared.get('corpus', load, first)
+        self.assertIs(shared.get('corpus', load, second), obj)
+        self.assertEqual(len(loads), 1)
+        self.assertEqual((shared.loads, shared.shares), (1, 1))
+
+        del first
+        gc.collect()
+        self.assertIn('corpus', shared)
+        del second
+        gc.collect()
+        self.assertNotIn('corpus', shared)
+
+        owner = Owner()
+        self.assertIsNot(shared.get('corpus', load, owner), obj)
+        self.assertEqual(len(loads), 2)
+
+    def test_single_load(self):
+        shared = SharedObjects()
+        loads, owners, results = [], [Owner() for _ in range(4)], []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.05)
+            return object()
+
+        threads = [threading.Thread(
+                       target=lambda o=o: results.append(
+                           shared.get('key', load, o)))
+                   for o in owners]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(len(set(id(r) for r in results)), 1)
+
+    def test_failed_load(self):
+        shared = SharedObjects()
+        owner = Owner()
+
+        def fail():
+            raise IOError('missing')
+
+        with self.assertRaises(IOError):
+            shared.get('key', fail, owner)
+        self.assertNotIn('key', shared)
+        self.assertEqual(shared.get('key', lambda: 'loaded', owner), 'loaded')
+
+    def test_none_not_kept(self):
+        shared = SharedObjects()
+        owner = Owner()
+        self.assertIsNone(shared.get('key', lambda: None, owner))
+        self.assertNotIn('key', shared)
+        self.assertEqual(shared.get('key', lambda: 'loaded', owner), 'loaded')
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+
+        def factory(name):
+            def create():
+                self.created.append(name)
+                return echo_app(name)
+            return create
+
+        self.factories = dict((name, factory(name)) for name in 'abc')
+
+    def test_lazy_mount(self):
+        dispatcher = Dispatcher(self.factories, echo_app('static'))
+        client = TestApp(dispatcher)
+        self.assertEqual(self.created, [])
+
+        self.assertEqual(client.get('/a/docs.json').text, 'a /a /docs.json')
+        self.assertEqual(client.get('/a/').text, 'a /a /')
+        self.assertEqual(self.created, ['a'])
+        self.assertEqual(dispatcher.mounted(), ['a'])
+
+        # paths outside of a mounted prefix go to the default app
+        self.assertEqual(client.get('/a').text, 'static  /a')
+        self.assertEqual(client.get('/d/x').text, 'static  /d/x')
+        self.assertEqual(client.get('/').text, 'static  /')
+        self.assertEqual(self.created, ['a'])
+
+    def test_budget(self):
+        # each mounted app is worth one byte
+        dispatcher = Dispatcher(self.factories, echo_app('static'), budget=2,
+                                measure=len)
+        client = TestApp(dispatcher)
+        for name in 'abab':
+            client.get('/{0}/'.format(name))
+        self.assertEqual(dispatcher.mounted(), ['a', 'b'])
+        self.assertEqual(self.created, ['a', 'b'])
+
+        # the least recently requested app is unmounted
+        client.get('/c/')
+        self.assertEqual(dispatcher.mounted(), ['b', 'c'])
+        self.assertEqual(dispatcher.unmounts, 1)
+        client.get('/a/')
+        self.assertEqual(dispatcher.mounted(), ['c', 'a'])
+        self.assertEqual(self.created, ['a', 'b', 'c', 'a'])
+
+    def test_budget_keeps_requested_app(self):
+        dispatcher = Dispatcher(self.factories, echo_app('static'), budget=0,
+                                measure=len)
+        client = TestApp(dispatcher)
+        self.assertEqual(client.get('/a/').text, 'a /a /')
+        self.assertEqual(client.get('/b/').text, 'b /b /')
+        self.assertEqual(dispatcher.mounted(), ['b'])
+
+    def test_failed_mount(self):
+        failures = [ValueError('bad config')]
+
+        def create():
+            if failures:
+                raise failures.pop()
+            return echo_app('a')
+
+        dispatcher = Dispatcher(dict(a=create), echo_app('static'))
+        client = TestApp(dispatcher)
+        r = client.get('/a/', status=500)
+        self.assertIn('Could not load a', r.text)
+        self.assertEqual(dispatcher.mounted(), [])
+
+        # loaded again on the next request
+        self.assertEqual(client.get('/a/').text, 'a /a /')
+
+    def test_single_mount(self):
+        def create():
+            self.created.append('a')
+            time.sleep(0.05)
+            return echo_app('a')
+
+        dispatcher = Dispatcher(dict(a=create), echo_app('static'))
+        threads = [threading.Thread(target=dispatcher.mount, args=('a',))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.created, ['a'])
+        self.assertEqual(dispatcher.mounts, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+
+from topicexplorer.lib import formats
+
+
+def table():
+    return OrderedDict([('doc', np.array(['doc1', 'doc22'], dtype=object)),
+                        ('prob', np.array([.9, .5])),
+                        ('topics', np.arange(6.).reshape(2, 3))])
+
+
+class TestNegotiate(unittest.TestCase):
+    def test_format_parameter(self):
+        self.assertEqual(formats.negotiate('npy'), 'npy')
+        self.assertEqual(formats.negotiate('NPY', 'application/json'), 'npy')
+        with self.assertRaises(ValueError):
+            formats.negotiate('xml')
+
+    def test_accept(self):
+        self.assertEqual(formats.negotiate(None, None), 'json')
+        self.assertEqual(formats.negotiate(
+            None, 'application/json, text/javascript, */*; q=0.01'), 'json')
+        self.assertEqual(formats.negotiate(
+            None, 'text/html,application/xhtml+xml,*/*;q=0.8'), 'json')
+        self.assertEqual(formats.negotiate(
+            None, 'application/json;q=0.5, application/x-npy'), 'npy')
+        self.assertEqual(formats.negotiate(
+            None, 'application/x-npy;q=0, application/json'), 'json')
+
+
+class TestEncode(unittest.TestCase):
+    def test_npy(self):
+        array = np.load(BytesIO(formats.to_npy(table())))
+        self.assertEqual(array.dtype.names, ('doc', 'prob', 'topics'))
+        self.assertEqual(array['doc'].tolist(), ['doc1', 'doc22'])
+        np.testing.assert_array_equal(array['topics'], table()['topics'])
+
+    def test_npy_empty(self):
+        empty = OrderedDict([('k', []), ('t', []), ('distance', [])])
+        self.assertEqual(len(np.load(BytesIO(formats.to_npy(empty)))), 0)
+
+    @unittest.skipUnless(formats.available('msgpack'), "requires msgpack")
+    def test_msgpack(self):
+        import msgpack
+        columns = msgpack.unpackb(formats.to_msgpack(table()), raw=False)
+        self.assertEqual(list(columns), ['doc', 'prob', 'topics'])
+        topics = columns['topics']
+        array = np.frombuffer(topics[b'data'], dtype=topics[b'type'])
+        np.testing.assert_array_equal(array.reshape(topics[b'shape']),
+                                      table()['topics'])
+
+    @unittest.skipUnless(formats.available('arrow'), "requires pyarrow")
+    def test_arrow(self):
+        import pyarrow as pa
+        data = pa.ipc.open_stream(formats.to_arrow(table())).read_all()
+        self.assertEqual(data.column_names, ['doc', 'prob', 'topics'])
+        self.assertEqual(data.to_pydict()['topics'][1], [3., 4., 5.])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+from io import BytesIO
+import os
+import os.path
+import shutil
+import sys
+from tempfile import mkdtemp
+if sys.version_info.major == 2:
+    from mock import patch
+elif sys.version_info.major == 3:
+    from unittest.mock import patch
+
+from topicexplorer.lib.fulltext import Manifest, RangeFile
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'corpus')
+        os.makedirs(os.path.join(self.root, 'sub'))
+        for name in ['a.txt', 'b.txt', 'b.pdf', 'c', 'sub/d.txt']:
+            with open(os.path.join(self.root, name), 'w') as f:
+                f.write(name)
+        with open(os.path.join(self.tmpdir, 'secret.txt'), 'w') as f:
+            f.write('secret')
+        self.manifest = Manifest(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def resolve(self, doc_id):
+        path = self.manifest.resolve(doc_id)
+        return path and os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def test_resolve(self):
+        self.assertEqual(self.resolve('a.txt'), 'a.txt')
+        self.assertEqual(self.resolve('a'), 'a.txt')
+        self.assertEqual(self.resolve('b.txt'), 'b.pdf')
+        self.assertEqual(self.resolve('c'), 'c')
+        self.assertEqual(self.resolve('sub/d'), 'sub/d.txt')
+        self.assertEqual(self.resolve('corpus/sub/d.txt'), 'sub/d.txt')
+        self.assertIsNone(self.resolve('e.txt'))
+        self.assertIsNone(self.resolve('../secret.txt'))
+        self.assertEqual(len(self.manifest.files), 5)
+
+    def test_no_stat(self):
+        self.manifest.files
+        with patch('os.path.isfile') as isfile, patch('os.stat') as stat:
+            for doc_id in ['a', 'a.txt', 'b.txt', 'sub/d', 'e', 'e']:
+                self.resolve(doc_id)
+        self.assertFalse(isfile.called or stat.called)
+
+    def test_new_files(self):
+        self.manifest.files
+        with open(os.path.join(self.root, 'e.txt'), 'w') as f:
+            f.write('new')
+        # listed again at most once per interval
+        self.assertIsNone(self.resolve('e'))
+        self.manifest.rebuild_interval = 0
+        self.assertIsNone(self.resolve('e'))
+        self.assertEqual(self.resolve('e.txt'), 'e.txt')
+        self.assertEqual(self.resolve('e'), 'e.txt')
+
+
+class TestRangeFile(unittest.TestCase):
+    def test_read(self):
+        f = RangeFile(BytesIO(b'0123456789'), 2, 6)
+        self.assertEqual(f.tell(), 2)
+        self.assertEqual(f.read(3), b'234')
+        self.assertEqual(f.read(), b'5')
+        self.assertEqual(f.read(), b'')
+
+        # servers may read ahead and seek back
+        f.seek(2)
+        self.assertEqual(f.read(100), b'2345')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import numpy as np
+
+from topicexplorer.lib.infer import fold_in, infer, term_counts
+from topicexplorer.lib.vocab import Vocabulary
+
+
+class TestFoldIn(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        self.W, self.K = 500, 6
+        self.phi = rng.dirichlet(np.full(self.W, 0.05), self.K).T
+        self.alpha = np.full((self.K, 1), 0.1)
+        self.rng = rng
+
+    def sample(self, theta, length=400):
+        topics = self.rng.choice(self.K, length, p=theta)
+        return [self.rng.choice(self.W, p=self.phi[:, t]) for t in topics]
+
+    def test_term_counts(self):
+        doc_ids, words, counts = term_counts([[3, 1, 3], [], [2]])
+        self.assertEqual(doc_ids.tolist(), [0, 0, 2])
+        self.assertEqual(words.tolist(), [1, 3, 2])
+        self.assertEqual(counts.tolist(), [1, 2, 1])
+
+    def test_recovers_mixtures(self):
+        true = self.rng.dirichlet(np.full(self.K, 0.2), 10)
+        theta = fold_in(self.phi, self.alpha, [self.sample(t) for t in true])
+        self.assertEqual(theta.shape, (self.K, 10))
+        np.testing.assert_allclose(theta.sum(axis=0), 1)
+        self.assertLess(np.abs(theta.T - true).sum(axis=1).mean(), 0.2)
+
+    def test_batch(self):
+        docs = [self.sample(np.full(self.K, 1. / self.K), n)
+                for n in [5, 50, 500]]
+        batch = fold_in(self.phi, self.alpha, docs)
+        # within the tolerance, as a batch runs until all of it converges
+        for i, doc in enumerate(docs):
+            np.testing.assert_allclose(
+                batch[:, i], fold_in(self.phi, self.alpha, [doc])[:, 0],
+                atol=1e-4)
+
+    def test_empty(self):
+        theta = fold_in(self.phi, np.arange(1, self.K + 1), [[], [1, 2]])
+        np.testing.assert_allclose(theta[:, 0],
+                                   np.arange(1, self.K + 1) / 21.)
+        self.assertEqual(fold_in(self.phi, self.alpha, []).shape, (self.K, 0))
+
+
+class TestInfer(unittest.TestCase):
+    def test_vocabulary(self):
+        class Model(object):
+            alpha = np.full(2, 0.01)
+
+        class Viewer(object):
+            model = Model()
+            phi = np.array([[0.5, 0.1], [0.4, 0.1], [0.1, 0.8]])
+
+        vocab = Vocabulary(['war', 'army', 'market'], stopped_words=['the'])
+        theta, lengths = infer(Viewer(), vocab, lambda text: text.split(),
+                               ['the war army unknown', 'market market', ''])
+        self.assertEqual(lengths, [2, 2, 0])
+        self.assertGreater(theta[0, 0], 0.9)
+        self.assertGreater(theta[1, 1], 0.9)
+        np.testing.assert_allclose(theta[:, 2], [0.5, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
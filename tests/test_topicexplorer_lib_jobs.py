@@ -0,0 +1,50 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import threading
+
+from topicexplorer.lib import jobs
+
+
+class TestJobRunner(unittest.TestCase):
+    def test_single_job(self):
+        runner = jobs.JobRunner()
+        release = threading.Event()
+        calls = []
+
+        def target():
+            calls.append(1)
+            release.wait(10)
+            return 'result'
+
+        job = runner.submit('cluster', target)
+        self.assertIs(runner.submit('cluster', target), job)
+        self.assertEqual(job.status, jobs.RUNNING)
+        release.set()
+        self.assertTrue(job.wait(10))
+        self.assertEqual((job.status, job.result), (jobs.DONE, 'result'))
+        self.assertIs(runner.submit('cluster', target), job)
+        self.assertEqual(len(calls), 1)
+
+    def test_failure(self):
+        runner = jobs.JobRunner()
+
+        def target():
+            raise ValueError("no models")
+
+        job = runner.submit('cluster', target)
+        job.wait(10)
+        self.assertEqual(job.status, jobs.FAILED)
+        self.assertEqual(job.to_dict()['error'], 'ValueError: no models')
+
+        # failed jobs are started again
+        self.assertIsNot(runner.submit('cluster', target), job)
+        runner.remove(job)
+        self.assertIsNotNone(runner.get('cluster'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+
+from topicexplorer.lib.labels import (LabelIndex, LabelSearch, build_labels,
+                                      load_or_build_labels, table_filename)
+
+
+def upper(doc):
+    if doc == 'bad':
+        raise ValueError(doc)
+    return doc.upper()
+
+
+class TestLabelIndex(unittest.TestCase):
+    def setUp(self):
+        self.labels = np.array(['b.txt', 'a.txt', 'd.txt', 'c.txt'])
+        self.index = LabelIndex(self.labels)
+
+    def test_getitem(self):
+        for i, label in enumerate(self.labels):
+            self.assertEqual(self.index[label], i)
+        self.assertIn('c.txt', self.index)
+        self.assertNotIn('e.txt', self.index)
+        self.assertNotIn('c.txt.pdf', self.index)
+
+    def test_resolve(self):
+        np.testing.assert_array_equal(
+            self.index.resolve(['c.txt', 'b.txt', 'c.txt']), [3, 0, 3])
+        self.assertEqual(len(self.index.resolve([])), 0)
+        with self.assertRaises(KeyError):
+            self.index.resolve(['a.txt', 'zzz'])
+
+    def test_bytes_labels(self):
+        index = LabelIndex(np.array([b'x', u'é'.encode('utf-8')]))
+        np.testing.assert_array_equal(index.resolve([u'é', 'x']), [1, 0])
+
+
+class TestLabelSearch(unittest.TestCase):
+    def setUp(self):
+        self.labels = ['The Republic', 'Republic of Letters', 'Politics',
+                       'A Letter', 'Ethics', 'Ra']
+        self.search = LabelSearch(self.labels)
+
+    def brute_force(self, query):
+        found = [(label.lower().find(query.lower()), i)
+                 for i, label in enumerate(self.labels)]
+        return [i for pos, i in sorted(found) if pos >= 0]
+
+    def test_ranked_by_position(self):
+        self.assertEqual(list(self.search.search('republic')), [1, 0])
+        self.assertEqual(list(self.search.search('LETTER')), [3, 1])
+        self.assertEqual(list(self.search.search('ics')), [4, 2])
+
+    def test_matches_scan(self):
+        for query in ['r', 'ra', 're', 'a', 'ic', 's', 'e', 'tic', 'the r',
+                      'of letters', 'x', 'publics', '']:
+            self.assertEqual(list(self.search.search(query)),
+                             self.brute_force(query), query)
+
+    def test_limit(self):
+        self.assertEqual(list(self.search.search('e', 2)),
+                         self.brute_force('e')[:2])
+        self.assertEqual(len(self.search.search('', 3)), 3)
+
+
+class TestBuildLabels(unittest.TestCase):
+    def test_serial(self):
+        self.assertEqual(build_labels(['a', 'bad', 'c'], upper),
+                         (['A', 'bad', 'C'], 1))
+
+    def test_parallel(self):
+        docs = ['doc%04d' % i for i in range(2500)] + ['bad']
+        self.assertEqual(build_labels(docs, upper, processes=2),
+                         ([upper(doc) for doc in docs[:-1]] + ['bad'], 1))
+
+    def test_parallel_state(self):
+        # the label function goes to the workers, not through module state
+        # shared by concurrent builds
+        from topicexplorer.lib import labels
+        sentinel = lambda doc: 'sentinel'
+        labels._label_fn = sentinel
+        try:
+            docs = ['doc%04d' % i for i in range(2500)]
+            self.assertEqual(build_labels(docs, upper, processes=2),
+                             ([upper(doc) for doc in docs], 0))
+            self.assertIs(labels._label_fn, sentinel)
+        finally:
+            labels._label_fn = None
+
+    def test_batch(self):
+        calls = []
+
+        def batch(docs):
+            calls.append(docs)
+            return [doc * 2 for doc in docs]
+
+        self.assertEqual(build_labels(['a', 'b'], upper, batch),
+                         (['aa', 'bb'], 0))
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_batch(self):
+        def fail(docs):
+            raise KeyError(docs[0])
+
+        self.assertEqual(build_labels(['a', 'b'], upper, fail),
+                         (['A', 'B'], 0))
+        self.assertEqual(build_labels(['a', 'b'], upper, lambda docs: ['x']),
+                         (['A', 'B'], 0))
+
+
+class TestLoadOrBuildLabels(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.corpus_file = os.path.join(self.tmpdir, 'corpus.npz')
+        self.builds = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def build(self):
+        self.builds += 1
+        return [u'T\xedtulo', u'Title'], 0
+
+    def test_saved(self):
+        labels = load_or_build_labels(self.corpus_file, 'title', 'a' * 40, 2,
+                                      self.build)
+        self.assertEqual(labels, [u'T\xedtulo', u'Title'])
+        filename = table_filename(self.corpus_file, 'title', 'a' * 40)
+        self.assertTrue(os.path.exists(filename))
+
+        self.assertEqual(load_or_build_labels(self.corpus_file, 'title',
+                                              'a' * 40, 2, self.build), labels)
+        self.assertEqual(self.builds, 1)
+
+    def test_stale(self):
+        load_or_build_labels(self.corpus_file, 'title', 'a' * 40, 2,
+                             self.build)
+        load_or_build_labels(self.corpus_file, 'title', 'b' * 40, 2,
+                             self.build)
+        self.assertEqual(self.builds, 2)
+        self.assertFalse(os.path.exists(
+            table_filename(self.corpus_file, 'title', 'a' * 40)))
+
+        # a table of the wrong length is built again
+        load_or_build_labels(self.corpus_file, 'title', 'b' * 40, 3,
+                             self.build)
+        self.assertEqual(self.builds, 3)
+
+    def test_failed(self):
+        # tables with documents labeled by their id are not saved
+        build = lambda: ([u'Title', u'doc1'], 1)
+        self.assertEqual(load_or_build_labels(self.corpus_file, 'title',
+                                              'a' * 40, 2, build),
+                         [u'Title', u'doc1'])
+        self.assertFalse(os.path.exists(
+            table_filename(self.corpus_file, 'title', 'a' * 40)))
+        load_or_build_labels(self.corpus_file, 'title', 'a' * 40, 2,
+                             self.build)
+        self.assertEqual(self.builds, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+from bottle import Bottle, abort
+from webtest import TestApp
+
+from topicexplorer.lib.metrics import Histogram, Metrics, MetricsPlugin
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantile(self):
+        hist = Histogram([1., 2., 4.])
+        self.assertIsNone(hist.quantile(.5))
+        for value in [.5, 1.5, 1.5, 3.]:
+            hist.observe(value)
+        self.assertEqual(hist.cumulative(),
+                         [(1., 1), (2., 3), (4., 4), (float('inf'), 4)])
+        self.assertEqual(hist.quantile(.5), 1.5)
+        self.assertEqual(hist.quantile(1.), 4.)
+        self.assertEqual(hist.sum, 6.5)
+
+
+class TestMetricsPlugin(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(buckets=(.1, 1.))
+        app = Bottle()
+
+        @app.route('/<name>.json')
+        def hello(name):
+            if name == 'missing':
+                abort(404, "Not found")
+            return '{}'
+
+        app.install(MetricsPlugin(self.metrics))
+        self.client = TestApp(app)
+
+    def test_export(self):
+        self.client.get('/a.json')
+        self.client.get('/b.json')
+        self.client.get('/missing.json', status=404)
+        self.assertEqual(self.metrics.in_flight, 0)
+        self.assertEqual(self.metrics.latency['/<name>.json'].count, 3)
+
+        text = self.metrics.export()
+        self.assertIn('# TYPE topicexplorer_requests_total counter', text)
+        self.assertIn('topicexplorer_requests_total{method="GET",'
+                      'route="/<name>.json",status="200"} 2', text)
+        self.assertIn('topicexplorer_requests_total{method="GET",'
+                      'route="/<name>.json",status="404"} 1', text)
+        self.assertIn('topicexplorer_request_duration_seconds_bucket{'
+                      'le="+Inf",route="/<name>.json"} 3', text)
+        self.assertIn('topicexplorer_request_duration_seconds_count{'
+                      'route="/<name>.json"} 3', text)
+        self.assertIn('topicexplorer_requests_in_flight 0', text)
+
+    def test_collectors(self):
+        self.metrics.add_collector(lambda: [
+            ('topicexplorer_things', 'gauge', 'Things.',
+             [('', {'kind': 'a "b"'}, 2)])])
+        self.assertIn('topicexplorer_things{kind="a \\"b\\""} 2',
+                      self.metrics.export())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+
+from topicexplorer.lib import mmapstore
+
+
+class TestMmapStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.dirname = os.path.join(self.tmpdir, 'model.mmap')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_store_dirname(self):
+        self.assertEqual(mmapstore.store_dirname('/a/corpus.npz'),
+                         '/a/corpus.mmap')
+
+    def test_fixed_width(self):
+        words = mmapstore.fixed_width(np.array(['war', 'army'], dtype=object))
+        self.assertEqual(words.dtype, np.dtype('<U4'))
+
+        labels = np.array([(3, 'doc0'), (8, 'doc10')],
+                          dtype=[('idx', '<i8'), ('label', 'O')])
+        labels = mmapstore.fixed_width(labels)
+        self.assertEqual(labels.dtype['label'], np.dtype('<U5'))
+        self.assertEqual(labels['idx'].tolist(), [3, 8])
+
+        mixed = np.array([1, 'a'], dtype=object)
+        self.assertEqual(mmapstore.fixed_width(mixed).dtype, object)
+
+    def test_round_trip(self):
+        arrays = {'phi': np.arange(12.).reshape(4, 3),
+                  'words': np.array(['war', 'army'], dtype=object),
+                  'meta': np.array([{'a': 1}], dtype=object)}
+        mmapstore.save_arrays(self.dirname, arrays, 'abc')
+        self.assertFalse(os.path.exists(self.dirname + '.tmp'))
+
+        loaded = mmapstore.open_arrays(self.dirname, 'abc')
+        self.assertIsInstance(loaded['phi'], np.memmap)
+        self.assertIsInstance(loaded['words'], np.memmap)
+        np.testing.assert_array_equal(loaded['phi'], arrays['phi'])
+        self.assertEqual(loaded['words'].tolist(), ['war', 'army'])
+        self.assertEqual(loaded['meta'][0], {'a': 1})
+
+    def test_stale(self):
+        mmapstore.save_arrays(self.dirname, {'a': np.ones(3)}, 'abc')
+        self.assertIsNone(mmapstore.open_arrays(self.dirname, 'def'))
+        self.assertIsNone(mmapstore.open_arrays(self.dirname + 'x', 'abc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+
+from topicexplorer.lib.neighbors import (NeighborIndex, exact, benchmark,
+    index_filename, load_or_build)
+
+def clustered_theta(K=20, D=2000, n_clusters=40, seed=37):
+    rng = np.random.RandomState(seed)
+    centers = rng.dirichlet(np.ones(K) * 0.1, size=n_clusters)
+    assignments = rng.randint(n_clusters, size=D)
+    theta = np.array([rng.dirichlet(100 * centers[c] + 0.01)
+                      for c in assignments])
+    return theta.T
+
+
+class TestNeighborIndex(unittest.TestCase):
+    def setUp(self):
+        self.theta = clustered_theta()
+        self.index = NeighborIndex(self.theta, seed=37)
+
+    def test_query_includes_self(self):
+        idxs, dists = self.index.query(5, 10)
+        self.assertEqual(idxs[0], 5)
+        self.assertAlmostEqual(dists[0], 0.)
+        self.assertTrue(all(np.diff(dists) >= 0))
+
+    def test_distances_match_exact(self):
+        idxs, dists = self.index.query(7, 20)
+        true_idxs, true_dists = exact(self.theta, 7, self.theta.shape[1])
+        lookup = dict(zip(true_idxs, true_dists))
+        for i, d in zip(idxs, dists):
+            self.assertAlmostEqual(d, lookup[i])
+
+    def test_recall(self):
+        recall, exact_time, index_time = benchmark(
+            self.theta, self.index, n=20, n_queries=20, seed=37)
+        self.assertGreater(recall, 0.9)
+
+    def test_small_corpus(self):
+        theta = clustered_theta(D=10)
+        index = NeighborIndex(theta, seed=37)
+        idxs, dists = index.query(0, 40)
+        self.assertEqual(sorted(idxs), list(range(10)))
+
+
+class TestSidecar(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.model_file = os.path.join(self.tmpdir, 'model-K20.npz')
+        self.theta = clustered_theta(D=500)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_load(self):
+        index = load_or_build(self.model_file, self.theta, 'abc', seed=37)
+        self.assertTrue(os.path.exists(index_filename(self.model_file)))
+
+        loaded = load_or_build(self.model_file, self.theta, 'abc')
+        self.assertEqual(loaded.fingerprint, 'abc')
+        np.testing.assert_array_equal(loaded.leaf_items, index.leaf_items)
+        np.testing.assert_array_equal(loaded.query(3, 10)[0],
+                                      index.query(3, 10)[0])
+
+    def test_rebuild_on_new_fingerprint(self):
+        load_or_build(self.model_file, self.theta, 'abc', seed=37)
+        index = load_or_build(self.model_file, self.theta, 'def', seed=37)
+        self.assertEqual(index.fingerprint, 'def')
+
+
+if __name__ == '__main__':
+    unittest.main()
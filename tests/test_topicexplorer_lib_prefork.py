@@ -0,0 +1,113 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import os
+import signal
+import socket
+import threading
+import time
+from tempfile import mkstemp
+from urllib.request import urlopen
+
+from topicexplorer.lib.prefork import Prefork
+
+
+def app(environ, start_response):
+    if environ['PATH_INFO'] == '/slow':
+        time.sleep(1)
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode('ascii')]
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "requires os.fork")
+class TestPrefork(unittest.TestCase):
+    options = dict()
+
+    def setUp(self):
+        self.port = free_port()
+        self.url = 'http://127.0.0.1:{0}'.format(self.port)
+        self.pid = os.fork()
+        if self.pid == 0:  # pragma: no cover
+            try:
+                Prefork(app, '127.0.0.1', self.port, workers=2,
+                        graceful_timeout=5, **self.options).run()
+            finally:
+                os._exit(0)
+
+        for _ in range(100):
+            try:
+                self.get('/')
+                break
+            except IOError:
+                time.sleep(0.1)
+
+    def tearDown(self):
+        os.kill(self.pid, signal.SIGTERM)
+        os.waitpid(self.pid, 0)
+
+    def get(self, path):
+        return int(urlopen(self.url + path, timeout=10).read())
+
+    def test_workers(self):
+        pids = set(self.get('/') for _ in range(50))
+        self.assertTrue(pids)
+        self.assertNotIn(os.getpid(), pids)
+        self.assertNotIn(self.pid, pids)
+
+    def test_graceful_restart(self):
+        before = set(self.get('/') for _ in range(20))
+        slow = []
+        request = threading.Thread(target=lambda: slow.append(self.get('/slow')))
+        request.start()
+        time.sleep(0.3)
+
+        # the request in progress completes on its old worker
+        os.kill(self.pid, signal.SIGHUP)
+        request.join()
+        self.assertEqual(len(slow), 1)
+        self.assertIn(slow[0], before)
+
+        time.sleep(1.5)
+        after = set(self.get('/') for _ in range(20))
+        self.assertFalse(before & after)
+
+
+class TestPreforkHooks(TestPrefork):
+    def setUp(self):
+        fd, self.started = mkstemp()
+        os.close(fd)
+        os.remove(self.started)
+        self.options = dict(on_start=lambda: open(self.started, 'w').close(),
+                            on_hup=lambda: False)
+        super(TestPreforkHooks, self).setUp()
+
+    def tearDown(self):
+        super(TestPreforkHooks, self).tearDown()
+        if os.path.exists(self.started):
+            os.remove(self.started)
+
+    def test_on_start(self):
+        self.assertTrue(os.path.exists(self.started))
+
+    def test_graceful_restart(self):
+        # the workers are kept when on_hup returns False
+        before = set(self.get('/') for _ in range(20))
+        os.kill(self.pid, signal.SIGHUP)
+        time.sleep(1.5)
+        after = set(self.get('/') for _ in range(20))
+        self.assertTrue(before & after)
+
+
+if __name__ == '__main__':
+    unittest.main()
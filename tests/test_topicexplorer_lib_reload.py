@@ -0,0 +1,98 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import os
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+from topicexplorer.lib.reload import Watcher, signature
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.files = [os.path.join(self.tmpdir, name)
+                      for name in ['config.ini', 'model.npz']]
+        for filename in self.files:
+            self.write(filename, 'v1')
+        self.changes = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, filename, content):
+        with open(filename, 'w') as f:
+            f.write(content)
+        # mtimes can be coarser than the time between writes
+        stat = os.stat(filename)
+        os.utime(filename, (stat.st_atime, stat.st_mtime + len(content)))
+
+    def test_signature(self):
+        missing = os.path.join(self.tmpdir, 'missing')
+        stats = signature([self.files[0], missing])
+        self.assertEqual(stats[0][2], 2)
+        self.assertEqual(stats[1], (missing, None, None))
+
+    def test_settled_change(self):
+        watcher = Watcher(lambda: self.files,
+                          lambda: self.changes.append(1))
+        self.assertFalse(watcher.poll())
+
+        self.write(self.files[1], 'v22')
+        self.assertFalse(watcher.poll())
+        # still being written
+        self.write(self.files[1], 'v333')
+        self.assertFalse(watcher.poll())
+        self.assertEqual(self.changes, [])
+
+        self.assertTrue(watcher.poll())
+        self.assertEqual(self.changes, [1])
+        self.assertFalse(watcher.poll())
+        self.assertEqual(watcher.changes, 1)
+
+    def test_failed_change(self):
+        def fail():
+            raise IOError('truncated model')
+
+        watcher = Watcher(lambda: self.files, fail)
+        self.write(self.files[0], 'v22')
+        watcher.poll()
+        self.assertTrue(watcher.poll())
+        # not retried until the files change again
+        self.assertFalse(watcher.poll())
+
+    def test_new_paths(self):
+        paths = list(self.files)
+        new_model = os.path.join(self.tmpdir, 'model-2.npz')
+        self.write(new_model, 'v2')
+
+        def on_change():
+            paths[1] = new_model
+            self.changes.append(1)
+
+        watcher = Watcher(lambda: paths, on_change)
+        self.write(self.files[0], 'v22')
+        watcher.poll()
+        self.assertTrue(watcher.poll())
+        self.assertFalse(watcher.poll())
+        self.assertFalse(watcher.poll())
+        self.assertEqual(self.changes, [1])
+
+    def test_thread(self):
+        import threading
+        changed = threading.Event()
+        watcher = Watcher(lambda: self.files, changed.set, interval=0.01)
+        watcher.start()
+        try:
+            self.write(self.files[1], 'v22')
+            self.assertTrue(changed.wait(10))
+        finally:
+            watcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+from glob import glob
+import os.path
+import shutil
+from tempfile import mkdtemp
+
+import numpy as np
+from vsm.spatial import JS_dist
+
+from topicexplorer.lib.topicindex import (TopicIndex, topic_dist,
+    index_filename, load_or_build)
+
+
+class TestTopicIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(37)
+        self.theta = rng.dirichlet(np.ones(8) * 0.3, size=200).T
+        self.tmpdir = mkdtemp()
+        self.model_file = os.path.join(self.tmpdir, 'model-K8.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_topic_dist(self):
+        for t in range(8):
+            e = np.zeros(8)
+            e[t] = 1.
+            np.testing.assert_allclose(topic_dist(self.theta[t]),
+                                       JS_dist(e, self.theta), atol=1e-12)
+        self.assertAlmostEqual(topic_dist(1.), 0.)
+        self.assertAlmostEqual(topic_dist(0.), 1.)
+
+    def test_top_docs(self):
+        index = TopicIndex.build(self.theta)
+        idxs, dists = index.top_docs(3, 10)
+        e = np.zeros(8)
+        e[3] = 1.
+        exact = np.sort(JS_dist(e, self.theta))
+        np.testing.assert_allclose(dists, exact[:10])
+
+        idxs, dists = index.top_docs(3, -10)
+        np.testing.assert_allclose(dists, exact[::-1][:10])
+
+    def test_sidecar(self):
+        index = load_or_build(self.model_file, self.theta, 'abc')
+        self.assertTrue(os.path.exists(index_filename(self.model_file, 'abc')))
+        self.assertIsInstance(index.ranks, np.memmap)
+
+        reloaded = load_or_build(self.model_file, self.theta, 'abc')
+        np.testing.assert_array_equal(reloaded.ranks, index.ranks)
+
+        load_or_build(self.model_file, self.theta, 'def')
+        self.assertEqual(glob(os.path.join(self.tmpdir, '*.npy')),
+                         [index_filename(self.model_file, 'def')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import sys
+if sys.version_info.major == 2:
+    from mock import Mock
+elif sys.version_info.major == 3:
+    from unittest.mock import Mock
+
+import threading
+import time
+
+import numpy as np
+
+from topicexplorer.lib.viewers import ViewerCache, viewer_nbytes
+
+
+def fake_viewer(k, V=100, D=50):
+    model = Mock(spec=[])
+    model.word_top = np.ones((V, k))
+    model.top_doc = np.ones((k, D))
+    return Mock(model=model, k=k)
+
+
+class TestViewerCache(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+
+        def load(k):
+            self.loaded.append(k)
+            return fake_viewer(k)
+
+        self.load = load
+        self.evicted = []
+
+    def test_lazy(self):
+        cache = ViewerCache([10, 20], self.load)
+        self.assertEqual(self.loaded, [])
+        self.assertIn(20, cache)
+        self.assertNotIn(30, cache)
+        self.assertEqual(sorted(cache), [10, 20])
+
+        self.assertEqual(cache[20].k, 20)
+        cache[20]
+        self.assertEqual(self.loaded, [20])
+        self.assertEqual(cache.loads, 1)
+        with self.assertRaises(KeyError):
+            cache[30]
+
+    def test_budget(self):
+        size = viewer_nbytes(fake_viewer(10))
+        cache = ViewerCache([10, 20, 30], self.load, budget=3 * size,
+                            on_evict=self.evicted.append)
+        cache[10]
+        cache[20]   # twice the size of model 10
+        self.assertEqual(cache.loaded(), [10, 20])
+        cache[10]
+        cache[30]   # must evict the least recently used model
+        self.assertEqual(self.evicted, [20, 10])
+        self.assertEqual(cache.loaded(), [30])
+        self.assertEqual(cache.evictions, 2)
+
+        cache[20]
+        self.assertEqual(self.loaded, [10, 20, 30, 20])
+        self.assertLessEqual(cache.nbytes, 3 * size)
+
+    def test_oversized_model_kept(self):
+        cache = ViewerCache([10], self.load, budget=1)
+        cache[10]
+        self.assertEqual(cache.loaded(), [10])
+
+    def test_single_load(self):
+        def slow_load(k):
+            time.sleep(0.1)
+            return self.load(k)
+
+        cache = ViewerCache([10], slow_load)
+        threads = [threading.Thread(target=cache.__getitem__, args=(10,))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.loaded, [10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import numpy as np
+
+from topicexplorer.lib.vocab import Vocabulary
+
+
+class TestVocabulary(unittest.TestCase):
+    def test_lookup(self):
+        vocab = Vocabulary(np.array(['war', 'peace', u'caf\xe9']))
+        self.assertEqual(vocab['peace'], 1)
+        self.assertEqual(vocab[u'caf\xe9'], 2)
+        self.assertIn('war', vocab)
+        self.assertNotIn('wa', vocab)
+        self.assertEqual(len(vocab), 3)
+
+    def test_bytes_vocabulary(self):
+        vocab = Vocabulary(np.array([b'war', b'peace']), set([b'the']))
+        self.assertEqual(vocab['peace'], 1)
+        self.assertEqual(vocab[b'war'], 0)
+        self.assertEqual(vocab.resolve(['the']), ([], ['the'], []))
+
+    def test_resolve(self):
+        vocab = Vocabulary(['war', 'peace'], ['the', 'a'])
+        self.assertEqual(vocab.resolve(['peace', 'the', 'foo', 'war']),
+                         ([1, 0], ['the'], ['foo']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import sys
+if sys.version_info.major == 2:
+    from mock import patch
+elif sys.version_info.major == 3:
+    from unittest.mock import patch
+
+from topicexplorer.lib.warmup import WarmUp, wsgi_get
+
+
+def make_app(statuses):
+    """
+    Returns a WSGI app answering each path with the next status in
+    `statuses[path]`, and the list of the paths it was asked for.
+    """
+    requested = []
+
+    def app(environ, start_response):
+        path = environ['PATH_INFO']
+        requested.append((path, environ['QUERY_STRING'],
+                          environ.get('HTTP_ACCEPT_ENCODING')))
+        status = statuses[path].pop(0) if statuses.get(path) else '200 OK'
+        start_response(status, [('Content-Type', 'text/plain'),
+                                ('Retry-After', '1')])
+        return [path.encode('latin-1')]
+    return app, requested
+
+
+class TestWsgiGet(unittest.TestCase):
+    def test_request(self):
+        app, requested = make_app({})
+        status, headers, body = wsgi_get(app, '/5/docs_topics/a%2Fb.json?n=3',
+                                         {'Accept-Encoding': 'gzip'})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Type'], 'text/plain')
+        self.assertEqual(body, b'/5/docs_topics/a/b.json')
+        self.assertEqual(requested,
+                         [('/5/docs_topics/a/b.json', 'n=3', 'gzip')])
+
+
+class TestWarmUp(unittest.TestCase):
+    def test_progress(self):
+        app, requested = make_app({'/missing': ['404 Not Found']})
+        warmup = WarmUp(['/', '/missing', '/3/topics.json'])
+        self.assertFalse(warmup.complete)
+        self.assertEqual(warmup.to_dict()['done'], 0)
+
+        warmup.run(app)
+        self.assertTrue(warmup.complete)
+        self.assertEqual([r[0] for r in requested],
+                         ['/', '/missing', '/3/topics.json'])
+        self.assertEqual(warmup.to_dict()['done'], 3)
+        self.assertEqual(warmup.to_dict()['total'], 3)
+        self.assertEqual(warmup.errors, ['/missing: 404'])
+
+    def test_accepted(self):
+        # a background job answers 202 until it is done
+        app, requested = make_app({'/cluster.csv': ['202 Accepted'] * 2})
+        warmup = WarmUp(['/cluster.csv'])
+        with patch('topicexplorer.lib.warmup.time.sleep') as sleep:
+            warmup.run(app)
+        self.assertEqual(len(requested), 3)
+        sleep.assert_called_with(1.)
+        self.assertEqual(warmup.errors, [])
+
+    def test_exception(self):
+        def app(environ, start_response):
+            raise ValueError("broken")
+
+        warmup = WarmUp(['/'])
+        warmup.run(app)
+        self.assertEqual(warmup.errors, ['/: ValueError: broken'])
+        self.assertTrue(warmup.complete)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import unittest
+
+import sys
+if sys.version_info.major == 2:
+    from mock import Mock
+elif sys.version_info.major == 3:
+    from unittest.mock import Mock
+
+import numpy as np
+from vsm.spatial import JS_dist
+
+from topicexplorer.lib.wordsearch import WordSearch, word_dist
+
+
+def random_phi(V, K, rng):
+    return rng.dirichlet(np.ones(V) * 0.1, size=K).T
+
+
+class TestWordSearch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(37)
+        self.viewers = dict((k, Mock(phi=random_phi(200, k, rng)))
+                            for k in [10, 3, 5])
+        self.search = WordSearch(self.viewers)
+
+    def test_word_dist(self):
+        phi = self.viewers[10].phi
+        for words in [[0], [4, 17], [1, 2, 3, 100]]:
+            top = np.zeros(phi.shape[0])
+            top[words] = 1
+            np.testing.assert_allclose(word_dist(phi[words]),
+                                       JS_dist(top, phi), atol=1e-12)
+
+    def test_stacked(self):
+        self.assertEqual(self.search.phi.shape, (200, 18))
+        self.assertEqual(list(self.search.k[:3]), [3, 3, 3])
+        self.assertEqual(list(self.search.topics[-2:]), [8, 9])
+
+    def test_rank(self):
+        words = [7, 42, 42]
+        ks, topics, dists = self.search.rank(words)
+        self.assertEqual(len(dists), 18)
+        self.assertTrue(all(np.diff(dists) >= 0))
+
+        top = np.zeros(200)
+        top[words] = 1
+        for k, t, d in zip(ks, topics, dists):
+            self.assertAlmostEqual(
+                d, JS_dist(top, self.viewers[k].phi[:, t]), places=5)
+
+    def test_unstacked(self):
+        search = WordSearch(self.viewers, stack=False)
+        self.assertIsNone(search.phi)
+        for k in [None, 5]:
+            np.testing.assert_array_equal(
+                search.distances([9, 3, 9], k=k),
+                self.search.distances([9, 3, 9], k=k))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,7 +29,8 @@ import platform
 import warnings
 
 from topicexplorer import (init, prep, train, server, notebook,
-    demo, update, metadata, export, tezimport, export_html)
+    demo, update, metadata, export, tezimport, export_html, convert,
+    precompress)
 
 from topicexplorer.lib.util import is_valid_filepath
 
@@ -162,6 +163,19 @@ def main():
     tezimport.populate_parser(parser_import)
     parser_import.set_defaults(func="import")
 
+    # Convert Parser
+    parser_convert = parsers.add_parser('convert',
+        help="Convert the corpus and models for memory-mapped serving, "
+             "and build the label table")
+    convert.populate_parser(parser_convert)
+    parser_convert.set_defaults(func="convert")
+
+    # Precompress Parser
+    parser_precompress = parsers.add_parser('precompress',
+        help="Compress the static files of the server ahead of time")
+    precompress.populate_parser(parser_precompress)
+    parser_precompress.set_defaults(func="precompress")
+
     # fancy arg validation for manually injecting tempfile to profile arg 
     try:
         try:
@@ -275,6 +289,12 @@ def main():
     elif args.func == 'import':
         benchmark(tezimport.main)(args)
 
+    elif args.func == 'convert':
+        benchmark(convert.main)(args)
+
+    elif args.func == 'precompress':
+        benchmark(precompress.main)(args)
+
     if args.profile:
         try:
             import snakeviz.cli
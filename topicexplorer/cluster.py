@@ -28,13 +28,22 @@ from vsm.viewer.wrappers import doc_label_name
 
 
 class dimensionReduce(object):
-    def __init__(self,config_name):
+    def __init__(self,config_name,model_v=None):
+        """
+        Loads the corpus and models of `config_name`, unless viewers already
+        loaded are given in `model_v`, a mapping from numbers of topics to
+        viewers in the order of the topic range.
+        """
         self.config_file = config_name        
-        self.model = moduleLoad(self.config_file)
-        self.model.load_corpus()
-        self.model.create_model_pattern()
-        self.topic_range = self.model.topic_range
-        self.model_v = self.get_model_v()
+        if model_v is None:
+            self.model = moduleLoad(self.config_file)
+            self.model.load_corpus()
+            self.model.create_model_pattern()
+            self.topic_range = self.model.topic_range
+            self.model_v = self.get_model_v()
+        else:
+            self.topic_range = list(model_v.keys())
+            self.model_v = model_v
         self.merge_word_topic = self.combine()
         self.isomap = None
         self.kmeans = None
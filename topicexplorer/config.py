@@ -31,7 +31,20 @@ def read(filename):
         'home_link' : '/',
         'lang' : None, 
         'tokenizer': 'default',
-        'label_file' : None
+        'label_file' : None,
+        'neighbor_index': False,
+        'template_reload': False,
+        'lazy_models': False,
+        'model_memory': 0,
+        'mmap': False,
+        'compress': True,
+        'static_cache': None,
+        'response_cache': 'memory',
+        'response_cache_size': 64,
+        'response_cache_file': None,
+        'metrics': True,
+        'warm_up': False,
+        'reload_interval': 0
     }, allow_no_value=True)
 
     with open(filename, encoding='utf8') as configfile:
@@ -0,0 +1,99 @@
+"""
+Converts the corpus and models of a config file into memory-mapped stores,
+which `topicexplorer launch` uses when ``mmap = True`` is set in the ``[www]``
+section. See :mod:`topicexplorer.lib.mmapstore`.
+
+With a ``label_module``, also builds the table of document labels in worker
+processes, so that the server reads it at launch instead of labeling every
+document itself. See :mod:`topicexplorer.lib.labels`.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import ast
+from configparser import NoOptionError
+from functools import partial
+from importlib import import_module
+
+from bottle import Bottle
+from vsm.corpus import Corpus
+
+import topicexplorer.config
+from topicexplorer.lib.fingerprint import file_digest
+from topicexplorer.lib import labels
+from topicexplorer.lib import mmapstore
+from topicexplorer.lib.util import is_valid_configfile
+
+
+def build_label_table(corpus_file, context_type, label_module, config_file,
+                      processes=None):
+    """
+    Builds and saves the label table of `label_module` for `corpus_file`, as
+    the server would read it at launch, labeling the documents in
+    `processes` worker processes.
+    """
+    try:
+        module = import_module(label_module)
+    except ImportError:
+        print("Could not import label module", label_module)
+        return
+    try:
+        # routes added by the label module are not served here
+        module.init(Bottle(), config_file)
+    except (NoOptionError, AttributeError):
+        pass
+    if not hasattr(module, 'label'):
+        print("No label function in", label_module)
+        return
+
+    docs = Corpus.load(corpus_file, load_corpus=False).view_metadata(
+        context_type)[context_type + '_label']
+    name = labels.table_name(module, context_type)
+    key = labels.table_key(file_digest(corpus_file), name,
+                           getattr(module, 'label_files', []))
+    build = partial(labels.build_labels, docs, module.label,
+                    getattr(module, 'labels', None), processes)
+    return labels.load_or_build_labels(corpus_file, name, key, len(docs),
+                                       build)
+
+
+def main(args):
+    config = topicexplorer.config.read(args.config_file)
+    corpus_file = config.get('main', 'corpus_file')
+    model_pattern = config.get('main', 'model_pattern')
+    topic_range = args.k or ast.literal_eval(config.get('main', 'topics'))
+
+    print("Converting corpus", corpus_file)
+    mmapstore.convert_corpus(corpus_file, file_digest(corpus_file))
+
+    for k in topic_range:
+        model_file = model_pattern.format(k)
+        print("Converting model", model_file)
+        mmapstore.convert_model(model_file, file_digest(model_file))
+
+    label_module = config.get('main', 'label_module')
+    if label_module:
+        print("Building label table with", label_module)
+        build_label_table(corpus_file, config.get('main', 'context_type'),
+                          label_module, args.config_file)
+
+    if not config.getboolean('www', 'mmap'):
+        print("Set `mmap = True` in the [www] section of {0} to serve the "
+              "converted files.".format(args.config_file))
+
+
+def populate_parser(parser):
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+    parser.add_argument('-k', nargs='+', type=int,
+                        help="K values to convert [Default: all]")
+
+
+if __name__ == '__main__':  # pragma: no cover
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    populate_parser(parser)
+    args = parser.parse_args()
+
+    main(args)
@@ -5,6 +5,7 @@ from multiprocessing import Process
 import os
 import os.path
 import shutil
+import time
 import sys
 if sys.version_info[0] == 2:
     import backports.tempfile
@@ -38,8 +39,13 @@ def main(args):
         files.append(output)
 
         output = os.path.join(OUTPUT_DIR, 'cluster.csv')
+        response = app.get('/cluster.csv')
+        while response.status_int == 202:
+            # the clusters are computed in the background
+            time.sleep(1)
+            response = app.get('/cluster.csv')
         with open(output, 'w') as outfile:
-            outfile.write(app.get('/cluster.csv').text)
+            outfile.write(response.text)
         files.append(output)
 
         output = os.path.join(OUTPUT_DIR, 'topics.json')
@@ -13,6 +13,7 @@ from vsm.viewer.wrappers import doc_label_name, def_label_fn
 
 app = None
 metadata = None
+label_files = []
 
 
 class keydefaultdict(defaultdict):
@@ -31,7 +32,7 @@ ctx_md = keydefaultdict(lambda ctx: app.c.view_metadata(ctx))
 
 def init(_app, config_file):
     #viewer, config, args):
-    global app, metadata
+    global app, metadata, label_files
     app = _app
 
     config = topicexplorer.config.read(config_file)
@@ -48,32 +49,64 @@ def init(_app, config_file):
     print("Loading HTRC metadata from", filename)
     with open(filename) as f:
         metadata = json.load(f)
+    # the label table is computed again when the metadata changes
+    label_files = [filename]
+
+
+def volume(book_label):
+    """ Returns the volume of a book from its MARC record, or None. """
+    try:
+        xml = parse_marc(metadata[book_label]['fullrecord'].encode('utf8'))
+        return get_volume_from_marc(xml[0])
+    except:
+        return None
+
+
+def page_label(doc, page_file, book_label, vol):
+    page_no = page_file.split('/')[-1]
+    page_no = page_no.replace('.txt', '')
+    page_no = int(page_no)
+
+    md = metadata[book_label]
+    if vol:
+        return "p%s of %s of %s" % (page_no, vol, md['titles'][0])
+    try:
+        return "p%s of %s" % (page_no, md['titles'][0])
+    except:
+        return doc
+
+
+def labels(docs):
+    """
+    Returns the label of each of `docs`, resolving the pages with one lookup
+    and parsing the MARC record of each book once.
+    """
+    if app.context_type != 'page':
+        return [label(doc) for doc in docs]
+
+    context_md = ctx_md['page']
+    rows = app.label_index.resolve(docs)
+    volumes = dict()
+    result = []
+    for doc, page_file, book_label in zip(docs, context_md['file'][rows],
+                                          context_md['book_label'][rows]):
+        if book_label not in volumes:
+            volumes[book_label] = volume(book_label)
+        try:
+            result.append(page_label(doc, page_file, book_label,
+                                     volumes[book_label]))
+        except Exception:
+            result.append(doc)
+    return result
 
 
 def label(doc):
     if app.context_type == 'page':
         context_md = ctx_md['page']
         where = np.squeeze(np.where(np.in1d(context_md['page_label'], [doc])))
-        page_no = context_md['file'][where]
-        page_no = page_no.split('/')[-1]
-        page_no = page_no.replace('.txt', '')
-        page_no = int(page_no)
-
         book_label = context_md['book_label'][where]
-        md = metadata[book_label]
-        try:
-            xml = parse_marc(md['fullrecord'].encode('utf8'))
-            vol = get_volume_from_marc(xml[0])
-            if vol:
-                return "p%s of %s of %s" % (page_no, vol, md['titles'][0])
-            else:
-                raise ValueError("No Volume")
-        except:
-            pass
-        try:
-            return "p%s of %s" % (page_no, md['titles'][0])
-        except:
-            return doc
+        return page_label(doc, context_md['file'][where], book_label,
+                          volume(book_label))
     else: # app.context_type == 'book':
         try:
             md = metadata[doc]
@@ -3,6 +3,7 @@ import json
 import os.path
 import numpy as np
 
+from topicexplorer.lib.labels import LabelIndex
 from vsm.viewer.wrappers import doc_label_name, def_label_fn
 
 app = None
@@ -24,6 +25,13 @@ def init(_app, config_file):
     global app
     app = _app
 
+def labels(docs):
+    """ Returns the title of each of `docs`, found with one lookup. """
+    context_md = ctx_md['page']
+    rows = LabelIndex(context_md['page_label']).resolve(
+        [str(doc) for doc in docs])
+    return [str(title) for title in context_md['title'][rows]]
+
 def label(doc):
     global ctx_md
 
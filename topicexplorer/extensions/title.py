@@ -4,6 +4,7 @@ from collections import defaultdict
 import numpy as np
 
 import topicexplorer.config
+from topicexplorer.lib.labels import LabelIndex
 from vsm.viewer.wrappers import doc_label_name, def_label_fn
 
 app = None
@@ -28,6 +29,12 @@ def init(_app, config_file):
 
     model_path = config.get('main', 'path')
 
+def labels(docs):
+    """ Returns the title of each of `docs`, found with one lookup. """
+    context_md = app.c.view_metadata(app.context_type)
+    rows = LabelIndex(context_md['article_label']).resolve(docs)
+    return context_md['title'][rows].tolist()
+
 def label(doc):
     context_md = app.c.view_metadata(app.context_type)
     where = np.squeeze(np.where(np.in1d(context_md['article_label'], [doc])))
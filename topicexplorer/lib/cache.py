@@ -0,0 +1,231 @@
+"""
+topicexplorer.lib.cache contains byte-bounded caches for serialized
+responses, so that identical requests are computed once.
+
+Responses are keyed with `make_key` by route, number of topics, normalized
+parameters and the fingerprints of the files the response depends on, so an
+entry is never served for a model that has changed; stale entries age out.
+
+`MemoryCache`
+    A least recently used cache in the memory of one process. The default.
+`SQLiteCache`
+    A least recently used cache in a SQLite database, shared by every process
+    that opens the same file, e.g. the workers of ``--workers``.
+
+Other caches subclass `ResponseCache`, whose abstract `get`, `set` and
+`usage` methods they implement. Each cache counts its hits, misses and
+evictions.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from future.utils import with_metaclass
+
+
+def make_key(route, k, params, fingerprint):
+    """
+    Returns the cache key of a response of `route` for the model with `k`
+    topics, with the parameters in the dictionary `params` and the
+    fingerprint of the model files.
+    """
+    params = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return u'{0}|{1}|{2}|{3}'.format(route, k, params, fingerprint)
+
+
+class ResponseCache(with_metaclass(ABCMeta, object)):
+    """ Base class of the response caches, which keeps their counters. """
+    backend = None
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key):
+        """ Returns the bytes cached for `key`, or None. """
+
+    @abstractmethod
+    def set(self, key, value):
+        """ Caches the bytes `value` for `key`. """
+
+    @abstractmethod
+    def usage(self):
+        """ Returns the number of entries and bytes in the cache. """
+
+    def stats(self):
+        """ Returns the counters and the size of the cache. """
+        entries, nbytes = self.usage()
+        return OrderedDict([('backend', self.backend),
+                            ('hits', self.hits),
+                            ('misses', self.misses),
+                            ('evictions', self.evictions),
+                            ('entries', entries),
+                            ('bytes', nbytes),
+                            ('max_bytes', self.max_bytes)])
+
+
+class MemoryCache(ResponseCache):
+    """ Least recently used cache of at most `max_bytes` in memory. """
+    backend = 'memory'
+
+    def __init__(self, max_bytes):
+        super(MemoryCache, self).__init__(max_bytes)
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= len(old)
+            self._entries[key] = value
+            self._nbytes += len(value)
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= len(evicted)
+                self.evictions += 1
+
+    def usage(self):
+        with self._lock:
+            return len(self._entries), self._nbytes
+
+
+class SQLiteCache(ResponseCache):
+    """
+    Least recently used cache of at most `max_bytes` in the SQLite database
+    `filename`. Each process opens its own connection; the counters are kept
+    per process. The number of entries and bytes are kept in a row of their
+    own, updated with every write, so that writes do not scan the cache.
+    """
+    backend = 'sqlite'
+
+    def __init__(self, filename, max_bytes):
+        super(SQLiteCache, self).__init__(max_bytes)
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._pid = None
+        self._db = None
+
+    def _connect(self):
+        """ Returns the connection of this process, opened on first use. """
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.filename, timeout=30,
+                                       check_same_thread=False,
+                                       isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS responses '
+                             '(key TEXT PRIMARY KEY, value BLOB, '
+                             'size INTEGER, atime REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_atime '
+                             'ON responses (atime)')
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute('CREATE TABLE IF NOT EXISTS usage '
+                                 '(id INTEGER PRIMARY KEY CHECK (id = 0), '
+                                 'entries INTEGER, nbytes INTEGER)')
+                # counted once, for databases written without the usage row
+                self._db.execute('INSERT OR IGNORE INTO usage SELECT 0, '
+                                 'COUNT(*), COALESCE(SUM(size), 0) '
+                                 'FROM responses')
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._pid = os.getpid()
+        return self._db
+
+    def get(self, key):
+        with self._lock:
+            db = self._connect()
+            row = db.execute('SELECT value FROM responses WHERE key = ?',
+                             (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute('UPDATE responses SET atime = ? WHERE key = ?',
+                       (time.time(), key))
+            self.hits += 1
+            return bytes(row[0])
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            db = self._connect()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                old = db.execute('SELECT size FROM responses WHERE key = ?',
+                                 (key,)).fetchone()
+                db.execute('INSERT OR REPLACE INTO responses VALUES '
+                           '(?, ?, ?, ?)', (key, sqlite3.Binary(value),
+                                            len(value), time.time()))
+                entries, nbytes = db.execute(
+                    'SELECT entries, nbytes FROM usage').fetchone()
+                if old is None:
+                    entries += 1
+                nbytes += len(value) - (old[0] if old else 0)
+
+                evicted = []
+                if nbytes > self.max_bytes:
+                    rows = db.execute('SELECT key, size FROM responses '
+                                      'ORDER BY atime')
+                    for old_key, size in rows:
+                        if nbytes <= self.max_bytes:
+                            break
+                        evicted.append((old_key,))
+                        entries -= 1
+                        nbytes -= size
+                    rows.close()
+                    db.executemany('DELETE FROM responses WHERE key = ?',
+                                   evicted)
+                db.execute('UPDATE usage SET entries = ?, nbytes = ?',
+                           (entries, nbytes))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            self.evictions += len(evicted)
+
+    def usage(self):
+        with self._lock:
+            return tuple(self._connect().execute(
+                'SELECT entries, nbytes FROM usage').fetchone())
+
+
+def open_cache(backend, max_bytes, filename=None):
+    """
+    Returns the response cache for `backend`: ``memory``, ``sqlite`` with
+    the database `filename`, or ``none`` for no cache.
+    """
+    if backend == 'memory':
+        return MemoryCache(max_bytes)
+    elif backend == 'sqlite':
+        return SQLiteCache(filename, max_bytes)
+    elif backend in ('none', None):
+        return None
+    raise ValueError("Unknown response cache: {0}. Caches: memory, sqlite, "
+                     "none".format(backend))
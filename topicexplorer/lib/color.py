@@ -37,11 +37,14 @@ def rgb2hex(rgb):
     return a
 
 def get_topic_colors(v):
+    return topic_colors(v.model.K)
+
+def topic_colors(K):
     ncolors = 8
     bmap = brewer.get_map('Dark2', 'Qualitative', ncolors)
 
     topic_colors = [(n, bmap.mpl_colormap((n % ncolors) / (ncolors - 1)))
-                    for n in range(v.model.K)]
+                    for n in range(K)]
 
     topic_colors.sort(key=lambda x: x[0])
     return topic_colors
@@ -0,0 +1,164 @@
+"""
+topicexplorer.lib.compression contains the content encodings the server uses
+to compress responses, the negotiation of the encoding from an
+`Accept-Encoding` header, and the precompression of static files.
+
+``br``
+    Brotli, preferred when the `brotli` package is installed.
+``gzip``
+    Always available.
+
+Static files are compressed ahead of time, by ``topicexplorer precompress``,
+into a separate cache directory that mirrors their tree, as ``<file>.gz`` and
+``<file>.br``. A copy is only served while it is newer than its file, so that
+serving a compressed file costs no more than serving the original. Responses
+smaller than `MIN_SIZE` bytes are sent as they are.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from collections import OrderedDict
+import gzip
+import os
+import os.path
+
+# encodings in order of preference, with their file suffixes
+ENCODINGS = OrderedDict([('br', '.br'), ('gzip', '.gz')])
+
+# modules needed by each encoding
+REQUIRES = {'br': 'brotli'}
+
+# smallest response worth compressing, in bytes
+MIN_SIZE = 1024
+
+# compression levels for responses, and for files compressed once
+LEVELS = {'br': 5, 'gzip': 6}
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+
+# media types of compressible responses and extensions of compressible files
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript',
+                      'image/svg+xml')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg', '.map',
+                           '.md', '.txt', '.csv', '.ttf', '.eot')
+
+
+def available(encoding):
+    """ True if the modules needed for `encoding` are installed. """
+    if encoding not in ENCODINGS:
+        return False
+    try:
+        if encoding in REQUIRES:
+            __import__(REQUIRES[encoding])
+    except ImportError:
+        return False
+    return True
+
+
+def _qualities(accept_encoding):
+    """ Returns the quality of each coding in an `Accept-Encoding` header. """
+    qualities = dict()
+    for item in accept_encoding.split(','):
+        params = item.strip().split(';')
+        quality = 1.
+        for param in params[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.
+        if params[0].strip():
+            qualities[params[0].strip().lower()] = quality
+    return qualities
+
+
+def negotiate(accept_encoding):
+    """
+    Returns the available encoding with the highest quality in the
+    `Accept-Encoding` header `accept_encoding`, or None to send the response
+    uncompressed. Encodings of equal quality are ranked by `ENCODINGS`.
+    """
+    qualities = _qualities(accept_encoding or '')
+    best, best_quality = None, 0.
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, qualities.get('*', 0.))
+        if quality > best_quality and available(encoding):
+            best, best_quality = encoding, quality
+    return best
+
+
+def compressible(content_type):
+    """ True if responses of the media type `content_type` compress well. """
+    return (content_type or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding, level=None):
+    """ Returns the bytes `data` compressed with `encoding`. """
+    level = LEVELS[encoding] if level is None else level
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compressed_path(filename, encoding, root, cache_dir):
+    """
+    Returns the path of the precompressed copy of `filename`, a file under
+    `root`, in `cache_dir` for `encoding`, or None if there is no copy as
+    recent as the file.
+    """
+    path = _cached_path(filename, encoding, root, cache_dir)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(filename):
+            return path
+    except OSError:
+        pass
+    return None
+
+
+def precompress(root, cache_dir):
+    """
+    Writes compressed copies of the compressible files under `root` into
+    `cache_dir` for each available encoding, skipping copies that are up to
+    date. Returns the number of copies written. Directories that cannot be
+    written are skipped.
+    """
+    encodings = [encoding for encoding in ENCODINGS if available(encoding)]
+    written = 0
+    for dirpath, _, filenames in os.walk(root):
+        try:
+            for name in filenames:
+                filename = os.path.join(dirpath, name)
+                if (not name.endswith(COMPRESSIBLE_EXTENSIONS) or
+                        os.path.getsize(filename) < MIN_SIZE):
+                    continue
+                for encoding in encodings:
+                    if not compressed_path(filename, encoding, root,
+                                           cache_dir):
+                        _write_compressed(filename, _cached_path(
+                            filename, encoding, root, cache_dir), encoding)
+                        written += 1
+        except (IOError, OSError):
+            print("Cannot write compressed files for {0} in {1}".format(
+                dirpath, cache_dir))
+    return written
+
+
+def _cached_path(filename, encoding, root, cache_dir):
+    """ Returns the path of the copy of `filename` in `cache_dir`. """
+    return os.path.join(cache_dir, os.path.relpath(filename, root) +
+                        ENCODINGS[encoding])
+
+
+def _write_compressed(filename, path, encoding):
+    """ Writes the copy of `filename` compressed with `encoding` to `path`. """
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(filename, 'rb') as infile:
+        data = compress(infile.read(), encoding, STATIC_LEVELS[encoding])
+    with open(path + '.tmp', 'wb') as outfile:
+        outfile.write(data)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
@@ -0,0 +1,247 @@
+"""
+topicexplorer.lib.dispatch contains the WSGI dispatcher that serves many
+corpora from one process, as ``app.wsgi`` does, and the pool through which
+their applications share the corpus files they have in common.
+
+`Dispatcher` mounts the application of a corpus on the first request for its
+URL prefix instead of loading every corpus at launch. When the estimated
+memory of the mounted applications exceeds the budget, the least recently
+requested ones are unmounted and mounted again on their next request.
+Requests in flight keep a reference to their application, so an unmounted
+application is freed once they finish.
+
+`SharedObjects` keeps loaded objects by key for as long as an application
+that asked for them is alive, so that applications whose configurations name
+the same corpus file use one copy of it while any of them is mounted.
+"""
+from __future__ import division
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from collections import OrderedDict
+from functools import partial
+import gc
+import threading
+import traceback
+from timeit import default_timer as timer
+import weakref
+
+from bottle import path_shift
+import numpy as np
+
+from topicexplorer.lib.cache import MemoryCache
+from topicexplorer.lib.viewers import ViewerCache, viewer_nbytes
+
+
+class SharedObjects(object):
+    """
+    Objects loaded once per key and shared by the owners that asked for
+    them, until every one of those owners has been garbage collected.
+    Concurrent first requests for the same key wait for a single load.
+    """
+
+    def __init__(self):
+        # key -> (object, weak references to its owners)
+        self._objects = dict()
+        # reentrant: owners may be collected, and released, at any allocation
+        self._lock = threading.RLock()
+        self._load_locks = dict()
+        self.loads = 0
+        self.shares = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._objects)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._objects
+
+    def get(self, key, load, owner):
+        """
+        Returns the object for `key`, calling `load()` if there is none, and
+        keeps it for as long as `owner` is alive. A `None` returned by `load`
+        is not kept.
+        """
+        ref = weakref.ref(owner, partial(self._release, key))
+        with self._lock:
+            lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            with self._lock:
+                if key in self._objects:
+                    obj, owners = self._objects[key]
+                    owners.add(ref)
+                    self.shares += 1
+                    return obj
+
+            obj = load()
+            if obj is None:
+                return None
+            with self._lock:
+                self._objects[key] = (obj, set([ref]))
+                self.loads += 1
+            return obj
+
+    def _release(self, key, ref):
+        """ Drops the object for `key` once its last owner is collected. """
+        with self._lock:
+            if key not in self._objects:
+                return
+            owners = self._objects[key][1]
+            owners.discard(ref)
+            if not owners:
+                del self._objects[key]
+
+
+def corpus_nbytes(corpus):
+    """
+    Estimates the memory used by a corpus: its token and vocabulary arrays
+    and its metadata. Memory-mapped arrays are not counted.
+    """
+    arrays = [getattr(corpus, 'corpus', None), getattr(corpus, 'words', None)]
+    arrays.extend(getattr(corpus, 'context_data', None) or [])
+    return sum(array.nbytes for array in arrays
+               if isinstance(array, np.ndarray)
+               and not isinstance(array, np.memmap))
+
+
+def memory_usage(apps):
+    """
+    Estimates the memory used by the topic explorer applications `apps`:
+    their loaded models, their in-memory caches and their corpora, counting
+    a corpus shared by several applications once.
+    """
+    corpora = dict()
+    nbytes = 0
+    for app in apps:
+        corpus = getattr(app, 'c', None)
+        if corpus is not None:
+            corpora[id(corpus)] = corpus
+        viewers = getattr(app, 'v', None) or dict()
+        if isinstance(viewers, ViewerCache):
+            nbytes += viewers.nbytes
+        else:
+            nbytes += sum(viewer_nbytes(viewer) for viewer in viewers.values())
+        if isinstance(getattr(app, 'response_cache', None), MemoryCache):
+            nbytes += app.response_cache.usage()[1]
+        nbytes += getattr(app, '_compressed_bytes', 0)
+    return nbytes + sum(corpus_nbytes(corpus) for corpus in corpora.values())
+
+
+class Dispatcher(object):
+    """
+    WSGI application sending each request to the application mounted at the
+    first segment of its path, or to `default` if there is none.
+
+    `factories` maps each prefix to a function returning its application.
+    `budget` is the memory budget in bytes of the mounted applications, as
+    estimated by `measure(apps)`; if it is `None` applications are never
+    unmounted. An application that fails to load is reported with a 500 and
+    loaded again on the next request for its prefix.
+    """
+
+    def __init__(self, factories, default, budget=None, measure=memory_usage):
+        self.factories = dict(factories)
+        self.default = default
+        self.budget = budget
+        self.measure = measure
+
+        self._apps = OrderedDict()
+        self._lock = threading.Lock()
+        self._mount_locks = dict((prefix, threading.Lock())
+                                 for prefix in self.factories)
+
+        self.mounts = 0
+        self.unmounts = 0
+        self.mount_time = 0.
+
+    def __contains__(self, prefix):
+        return prefix in self.factories
+
+    def mounted(self):
+        """ Returns the mounted prefixes, least recently requested first. """
+        with self._lock:
+            return list(self._apps)
+
+    def mount(self, prefix):
+        """ Returns the application for `prefix`, mounting it if needed. """
+        with self._lock:
+            if prefix in self._apps:
+                self._apps[prefix] = self._apps.pop(prefix)
+                return self._apps[prefix]
+
+        # one mount per prefix; other requests for it wait here
+        with self._mount_locks[prefix]:
+            with self._lock:
+                if prefix in self._apps:
+                    self._apps[prefix] = self._apps.pop(prefix)
+                    return self._apps[prefix]
+
+            start = timer()
+            app = self.factories[prefix]()
+            elapsed = timer() - start
+
+            with self._lock:
+                self._apps[prefix] = app
+                self.mounts += 1
+                self.mount_time += elapsed
+            print("Mounted /{0}/ in {1:.2f}s ({2} mounts)".format(
+                prefix, elapsed, self.mounts))
+
+        self._unmount(keep=prefix)
+        return app
+
+    def _unmount(self, keep):
+        """
+        Unmounts the least recently requested applications until within the
+        budget.
+        """
+        if self.budget is None:
+            return
+
+        while True:
+            with self._lock:
+                apps = list(self._apps.values())
+                older = [prefix for prefix in self._apps if prefix != keep]
+            nbytes = self.measure(apps)
+            if nbytes <= self.budget or not older:
+                return
+
+            with self._lock:
+                if self._apps.pop(older[0], None) is None:
+                    continue
+                self.unmounts += 1
+
+            # applications hold reference cycles through their routes
+            start = timer()
+            del apps
+            gc.collect()
+            print("Unmounted /{0}/ in {1:.2f}s ({2:.1f} MB over a budget of "
+                  "{3:.1f} MB, {4} unmounts)".format(
+                      older[0], timer() - start, nbytes / 2**20,
+                      self.budget / 2**20, self.unmounts))
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '') or '/'
+        prefix = path.split('/')[1]
+        if prefix not in self.factories or not path.startswith(
+                '/' + prefix + '/'):
+            return self.default(environ, start_response)
+
+        try:
+            app = self.mount(prefix)
+        except Exception:
+            print("Could not load", prefix)
+            traceback.print_exc()
+            start_response('500 Internal Server Error',
+                           [('Content-Type', 'text/plain; charset=UTF-8')])
+            return [u'Could not load {0}'.format(prefix).encode('utf-8')]
+
+        # models loaded lazily since the last request count too
+        self._unmount(keep=prefix)
+
+        environ['SCRIPT_NAME'], environ['PATH_INFO'] = path_shift(
+            environ.get('SCRIPT_NAME', '/'), path, 1)
+        return app(environ, start_response)
@@ -0,0 +1,17 @@
+"""
+topicexplorer.lib.fingerprint contains helper functions for computing stable
+digests of corpus and model files, used for ETags and sidecar invalidation.
+"""
+import hashlib
+
+
+def file_digest(filename, blocksize=2 ** 20):
+    """
+    Returns the SHA-1 hex digest of the bytes of `filename`. The file is read
+    in `blocksize` chunks so that large models are never held in memory twice.
+    """
+    x = hashlib.sha1(usedforsecurity=False)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            x.update(block)
+    return x.hexdigest()
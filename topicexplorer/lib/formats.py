@@ -0,0 +1,178 @@
+"""
+topicexplorer.lib.formats contains the binary encodings the server can use
+instead of JSON for data routes, and the negotiation of the encoding from a
+`?format=` parameter or an `Accept` header.
+
+Binary responses are tables: ordered mappings from column names to numpy
+arrays with one row per record. A column may be two-dimensional, e.g. the
+topic mixture of each document. Tables are encoded straight from the arrays,
+without building a Python object per element:
+
+``npy`` (``application/x-npy``)
+    A NumPy structured array, one field per column, read with `numpy.load`.
+``msgpack`` (``application/msgpack``)
+    A map from column names to arrays in the layout of `msgpack-numpy`, so
+    `msgpack.unpackb(data, object_hook=msgpack_numpy.decode)` returns the
+    arrays. Requires `msgpack`.
+``arrow`` (``application/vnd.apache.arrow.stream``)
+    An Arrow IPC stream holding a single record batch. Two-dimensional columns
+    are fixed-size lists. Requires `pyarrow`.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+from builtins import str as text
+
+from collections import OrderedDict
+from io import BytesIO
+
+import numpy as np
+
+MEDIA_TYPES = OrderedDict([
+    ('json', 'application/json'),
+    ('npy', 'application/x-npy'),
+    ('msgpack', 'application/msgpack'),
+    ('arrow', 'application/vnd.apache.arrow.stream'),
+])
+
+# media types accepted in `Accept` headers, besides those above
+ALIASES = {
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+    'application/octet-stream': 'npy',
+}
+
+# modules needed by each format
+REQUIRES = {'msgpack': 'msgpack', 'arrow': 'pyarrow'}
+
+
+def available(fmt):
+    """ True if the modules needed to encode `fmt` are installed. """
+    if fmt not in MEDIA_TYPES:
+        return False
+    try:
+        if fmt in REQUIRES:
+            __import__(REQUIRES[fmt])
+    except ImportError:
+        return False
+    return True
+
+
+def _accepted(accept):
+    """
+    Returns the media types in an `Accept` header, most preferred first.
+    Types with a quality of 0 are left out.
+    """
+    types = []
+    for i, item in enumerate(accept.split(',')):
+        params = item.strip().split(';')
+        quality = 1.
+        for param in params[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.
+        if params[0] and quality > 0:
+            types.append((-quality, i, params[0].strip().lower()))
+    return [media_type for _, _, media_type in sorted(types)]
+
+
+def negotiate(fmt=None, accept=None, default='json'):
+    """
+    Returns the format named by `fmt`, or else the format preferred in the
+    `Accept` header `accept`, or else `default`. Raises a `ValueError` if
+    `fmt` is not a format that can be produced. Media types in `accept` that
+    cannot be produced are skipped, so browsers get the `default`.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in MEDIA_TYPES:
+            raise ValueError("Unknown format: {0}. Formats: {1}".format(
+                fmt, ', '.join(MEDIA_TYPES)))
+        elif not available(fmt):
+            raise ValueError("Format {0} requires the {1} package".format(
+                fmt, REQUIRES[fmt]))
+        return fmt
+
+    for media_type in _accepted(accept or ''):
+        if media_type in ('*/*', 'application/*'):
+            return default
+        name = ALIASES.get(media_type)
+        for candidate, candidate_type in MEDIA_TYPES.items():
+            if media_type == candidate_type:
+                name = candidate
+        if name is not None and available(name):
+            return name
+    return default
+
+
+def _column(values):
+    """ Returns `values` as an array of numbers or fixed-width strings. """
+    values = np.asarray(values)
+    if values.dtype.kind == 'S':
+        values = np.char.decode(values, 'utf-8')
+    elif values.dtype == object:
+        values = np.array([value.decode('utf-8') if isinstance(value, bytes)
+                           else text(value) for value in values.flat],
+                          dtype=text).reshape(values.shape)
+    return values
+
+
+def to_npy(table):
+    """ Encodes a table as a `.npy` structured array. """
+    columns = [(name, _column(values)) for name, values in table.items()]
+    rows = len(columns[0][1]) if columns else 0
+    array = np.empty(rows, dtype=[(name, values.dtype, values.shape[1:])
+                                  for name, values in columns])
+    for name, values in columns:
+        array[name] = values
+
+    output = BytesIO()
+    np.save(output, array, allow_pickle=False)
+    return output.getvalue()
+
+
+def to_msgpack(table):
+    """ Encodes a table as a msgpack map of `msgpack-numpy` arrays. """
+    import msgpack
+
+    columns = OrderedDict()
+    for name, values in table.items():
+        values = np.ascontiguousarray(_column(values))
+        columns[name] = {b'nd': True,
+                         b'type': values.dtype.str,
+                         b'kind': b'',
+                         b'shape': list(values.shape),
+                         b'data': values.tobytes()}
+    return msgpack.packb(columns, use_bin_type=True)
+
+
+def to_arrow(table):
+    """ Encodes a table as an Arrow IPC stream. """
+    import pyarrow as pa
+
+    arrays = []
+    for values in table.values():
+        values = _column(values)
+        if values.ndim == 2:
+            arrays.append(pa.FixedSizeListArray.from_arrays(
+                pa.array(values.ravel()), values.shape[1]))
+        else:
+            arrays.append(pa.array(values))
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(table))
+
+    sink = pa.BufferOutputStream()
+    writer = pa.ipc.new_stream(sink, batch.schema)
+    writer.write_batch(batch)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS = {'npy': to_npy, 'msgpack': to_msgpack, 'arrow': to_arrow}
+
+
+def encode(fmt, table):
+    """ Encodes the table `table` in the binary format `fmt`. """
+    return ENCODERS[fmt](table)
@@ -0,0 +1,142 @@
+"""
+topicexplorer.lib.fulltext contains the index of the raw corpus files that
+the server sends from ``/fulltext/<doc_id>``, and the file object used to
+send a byte range of a file.
+
+A document id names a file relative to the raw corpus directory, optionally
+starting with the name of the directory itself. The file sent is, in order of
+preference, the PDF of a ``txt`` id, the id with ``.txt`` appended, or the id
+itself. `Manifest` lists the files once, on the first request, and resolves
+ids from the listing alone, without touching the file system. An id that is
+not in the listing, such as a file added later, lists the files again, at
+most once every `REBUILD_INTERVAL` seconds; ids still missing afterwards are
+remembered until the next listing.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import os
+import os.path
+import re
+import threading
+from timeit import default_timer as timer
+
+# fewest seconds between two listings of the files for unknown ids
+REBUILD_INTERVAL = 60.
+
+# most unknown ids remembered between two listings
+MAX_MISSING = 10000
+
+
+class Manifest(object):
+    """
+    Index of the files under the directory `root`, built on first use and
+    rebuilt for unknown ids at most once every `rebuild_interval` seconds.
+    """
+
+    def __init__(self, root, rebuild_interval=REBUILD_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.rebuild_interval = rebuild_interval
+        self._files = None
+        self._missing = set()
+        self._built = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        """ Lists the files under the root. """
+        start = timer()
+        self._built = start
+        files = set()
+        for dirpath, _, filenames in os.walk(self.root):
+            relpath = os.path.relpath(dirpath, self.root)
+            for name in filenames:
+                path = name if relpath == '.' else os.path.join(relpath, name)
+                files.add(path.replace(os.sep, '/'))
+        self._files = files
+        self._missing = set()
+        print("Indexed {0} files of {1} in {2:.2f}s".format(
+            len(files), self.root, timer() - start))
+
+    @property
+    def files(self):
+        with self._lock:
+            if self._files is None:
+                self.build()
+        return self._files
+
+    def _lookup(self, name):
+        """
+        Returns the name of the file to send for `name` in the listing, or
+        None if no variant of it is listed.
+        """
+        files = self.files
+        pdf = re.sub('txt$', 'pdf', name)
+        if pdf != name and pdf in files:
+            name = pdf
+        if name + '.txt' in files:
+            name = name + '.txt'
+        return name if name in files else None
+
+    def path(self, name):
+        """ Returns the absolute path of the file `name` in the manifest. """
+        return os.path.join(self.root, *name.split('/'))
+
+    def resolve(self, doc_id):
+        """
+        Returns the absolute path of the file to send for `doc_id`, or None
+        if there is none or it is outside of the root.
+        """
+        name = doc_id.strip('/')
+        prefix = os.path.basename(self.root) + '/'
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+        if '..' in name.split('/'):
+            return None
+
+        found = self._lookup(name)
+        if found is None and name not in self._missing:
+            # the file may have been added since the files were listed
+            with self._lock:
+                if timer() - self._built >= self.rebuild_interval:
+                    self.build()
+            found = self._lookup(name)
+            if found is None:
+                if len(self._missing) >= MAX_MISSING:
+                    self._missing = set()
+                self._missing.add(name)
+        if found is None:
+            return None
+        return self.path(found)
+
+
+class RangeFile(object):
+    """
+    Read-only view of the bytes `start` to `end` of the open file `fileobj`,
+    positioned at `start`. Servers with a `wsgi.file_wrapper` send it from
+    the current position for the `Content-Length` of the response, using
+    `fileno` where they can send files without copying.
+    """
+
+    def __init__(self, fileobj, start, end):
+        self.file = fileobj
+        self.end = end
+        self.file.seek(start)
+
+    def read(self, size=-1):
+        remaining = max(self.end - self.file.tell(), 0)
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,93 @@
+"""
+topicexplorer.lib.infer contains the inference of the topics of new
+documents with a trained model, without training it again.
+
+`fold_in` estimates the topic distribution of each new document with the
+topics of the model held fixed. It alternates between the responsibilities
+of the topics for each distinct word of a document, given the current
+estimate, and the estimate given the responsibilities, smoothed by the
+Dirichlet prior of the model. The estimate has the form of the model's own
+theta, ``(topic counts + alpha) / (length + sum(alpha))``, so inferred
+mixtures can be compared with those of the corpus. Every document of a
+batch is updated at once, as one array operation per iteration over the
+rows of phi for the words of the batch.
+
+`infer` tokenizes texts and maps their tokens through the vocabulary of the
+corpus before folding them in.
+"""
+from __future__ import division
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import numpy as np
+
+# most iterations of the fold-in
+ITERATIONS = 100
+
+# the fold-in stops when no topic probability changes by more than this
+TOLERANCE = 1e-5
+
+
+def term_counts(docs):
+    """
+    Returns the document index, word index and count of every distinct word
+    of `docs`, lists of word indices, as three arrays sorted by document.
+    """
+    doc_ids, words, counts = [], [], []
+    for i, doc in enumerate(docs):
+        doc_words, doc_counts = np.unique(np.asarray(doc, dtype=np.int64),
+                                          return_counts=True)
+        doc_ids.append(np.full(len(doc_words), i, dtype=np.int64))
+        words.append(doc_words)
+        counts.append(doc_counts)
+    if not docs:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0))
+    return (np.concatenate(doc_ids), np.concatenate(words),
+            np.concatenate(counts).astype(np.float64))
+
+
+def fold_in(phi, alpha, docs, iterations=ITERATIONS, tol=TOLERANCE):
+    """
+    Returns the topic distributions of `docs`, lists of indices of words in
+    the rows of the ``W x K`` matrix `phi` of a model, as a
+    ``K x len(docs)`` matrix whose columns are distributions, like
+    `LdaCgsViewer.theta`. `alpha` is the Dirichlet prior of the model on the
+    topics of a document. Documents without words get the prior.
+    """
+    K = phi.shape[1]
+    alpha = np.broadcast_to(np.ravel(alpha).astype(np.float64), (K,))
+    prior = np.tile(alpha, (len(docs), 1))
+    theta = prior / prior.sum(axis=1)[:, np.newaxis]
+
+    doc_ids, words, counts = term_counts(docs)
+    if not len(words):
+        return theta.T
+
+    rows = np.asarray(phi[words], dtype=np.float64)
+    present, starts = np.unique(doc_ids, return_index=True)
+    for _ in range(iterations):
+        resp = theta[doc_ids] * rows
+        resp *= (counts / resp.sum(axis=1))[:, np.newaxis]
+
+        gamma = prior.copy()
+        gamma[present] += np.add.reduceat(resp, starts, axis=0)
+        updated = gamma / gamma.sum(axis=1)[:, np.newaxis]
+        delta = np.abs(updated - theta).max()
+        theta = updated
+        if delta < tol:
+            break
+
+    return theta.T
+
+
+def infer(viewer, vocab, tokenizer, texts, **kwargs):
+    """
+    Returns the topic distributions of `texts` in the model of `viewer`, as
+    a ``K x len(texts)`` matrix, and the number of tokens of each text that
+    are in the `vocab` of the corpus. `kwargs` are passed to `fold_in`.
+    """
+    docs = [vocab.resolve(tokenizer(text))[0] for text in texts]
+    theta = fold_in(viewer.phi, viewer.model.alpha, docs, **kwargs)
+    return theta, [len(doc) for doc in docs]
@@ -0,0 +1,104 @@
+"""
+topicexplorer.lib.jobs contains a runner for slow computations that the
+server starts on a request but runs outside of the request thread.
+
+Each job has a name. Submitting a job while one with the same name is running
+or has succeeded returns that job, so concurrent requests for the same result
+wait on a single computation. A job that failed is started again on its next
+submission, or can be removed with `JobRunner.remove` once its error has been
+reported.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from collections import OrderedDict
+import threading
+import time
+import traceback
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job(object):
+    """ A call of `target` in a background thread. """
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    def start(self):
+        self.status = RUNNING
+        self.started = time.time()
+        thread = threading.Thread(target=self._run,
+                                  name='job-{0}'.format(self.name))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        try:
+            self.result = self.target()
+            self.status = DONE
+        except Exception as e:
+            traceback.print_exc()
+            self.error = u'{0}: {1}'.format(type(e).__name__, e)
+            self.status = FAILED
+        finally:
+            self.finished = time.time()
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """ Waits for the job to finish. Returns True if it has. """
+        return self._done.wait(timeout)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self):
+        return OrderedDict([('name', self.name),
+                            ('status', self.status),
+                            ('elapsed', round(self.elapsed, 3)),
+                            ('error', self.error)])
+
+
+class JobRunner(object):
+    """ Runs at most one job of each name at a time. """
+
+    def __init__(self):
+        self.jobs = dict()
+        self._lock = threading.Lock()
+
+    def submit(self, name, target):
+        """
+        Starts a job calling `target`, unless a job named `name` is running
+        or has succeeded. Returns the job.
+        """
+        with self._lock:
+            job = self.jobs.get(name)
+            if job is None or job.status == FAILED:
+                job = self.jobs[name] = Job(name, target)
+                job.start()
+            return job
+
+    def get(self, name):
+        """ Returns the last job named `name`, or None. """
+        with self._lock:
+            return self.jobs.get(name)
+
+    def remove(self, job):
+        """ Forgets `job`, if it is still the last job of its name. """
+        with self._lock:
+            if self.jobs.get(job.name) is job:
+                del self.jobs[job.name]
@@ -0,0 +1,361 @@
+"""
+topicexplorer.lib.labels contains indexes over the document labels of a
+corpus, used to resolve document ids to metadata rows without scanning the
+metadata array and to search the display labels for the autocomplete, and
+the table of display labels computed once for every document.
+
+The display labels come from the label module of a corpus. A label module
+with a `labels(docs)` function produces the labels of many documents at once;
+otherwise its `label(doc)` function is called on every document, in forked
+worker processes when asked to. The table is saved in a JSON file next to
+the corpus file, named by a key derived from the corpus fingerprint, so it
+is computed again only when the corpus or the label module inputs change.
+Tables in which some documents could not be labeled are not saved.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+from builtins import str as text_type
+
+from codecs import open
+from glob import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import os.path
+import traceback
+from timeit import default_timer as timer
+
+import numpy as np
+
+from topicexplorer.lib.fingerprint import file_digest
+
+# documents labeled by each task of a worker process
+LABEL_CHUNKSIZE = 1000
+
+
+class LabelIndex(object):
+    """
+    Maps document labels to their row in the context metadata.
+
+    Rather than a dictionary of Python strings, the index keeps a sorted copy
+    of the label array and the permutation that sorts it. Lookups are binary
+    searches, and many labels can be resolved in a single vectorised call.
+    """
+
+    def __init__(self, labels):
+        self.labels = np.asarray(labels)
+        self._order = np.argsort(self.labels, kind='mergesort')
+        self._sorted = self.labels[self._order]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        try:
+            self[label]
+            return True
+        except KeyError:
+            return False
+
+    def __getitem__(self, label):
+        return self.resolve([label])[0]
+
+    def _as_labels(self, labels):
+        labels = np.asarray(labels)
+        if self.labels.dtype.kind == 'S' and labels.dtype.kind == 'U':
+            labels = np.char.encode(labels, 'utf-8')
+        elif self.labels.dtype.kind == 'U' and labels.dtype.kind == 'S':
+            labels = np.char.decode(labels, 'utf-8')
+        return labels
+
+    def resolve(self, labels):
+        """
+        Returns an array with the metadata row of each label in `labels`.
+        Raises a `KeyError` naming the first label that is not in the corpus.
+        """
+        labels = self._as_labels(labels)
+        if not labels.size:
+            return np.zeros(0, dtype=np.int64)
+        elif not len(self._sorted):
+            raise KeyError(labels[0])
+
+        pos = np.searchsorted(self._sorted, labels)
+        pos[pos == len(self._sorted)] = 0
+        found = self._sorted[pos] == labels
+        if not found.all():
+            raise KeyError(labels[~found][0])
+
+        return self._order[pos]
+
+
+class LabelSearch(object):
+    """
+    Case-insensitive substring search over the display labels of a corpus,
+    used by the document autocomplete.
+
+    Every lowercased label is split into overlapping trigrams of code points,
+    packed into a single integer key, and each key keeps a posting list of the
+    documents it occurs in, together with the offset of its first occurrence.
+    Labels are padded at the end so that every substring of one or two
+    characters is also the prefix of some trigram. Results are ranked by the
+    position of the first match, then by corpus order, so prefix matches
+    always come first.
+    """
+    n = 3
+    bits = 21  # enough for any unicode code point
+
+    def __init__(self, labels):
+        self.labels = [text_type(label).lower() for label in labels]
+        lengths = np.array([len(label) for label in self.labels],
+                           dtype=np.int64) + self.n - 1
+        pad = u'\x00' * (self.n - 1)
+        chars = np.frombuffer(
+            u''.join(label + pad for label in self.labels).encode('utf-32-le'),
+            dtype='<u4').astype(np.int64)
+
+        # one trigram starts at every character that is not padding
+        starts = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        docs = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)
+        pos = np.arange(len(chars)) - np.repeat(starts, lengths)
+        at = np.flatnonzero(pos < np.repeat(lengths - self.n + 1, lengths))
+        keys = self._pack(chars[at + i] for i in range(self.n))
+        docs, pos = docs[at], pos[at].astype(np.int32)
+
+        # group by key; the stable sort keeps each group in (doc, pos) order
+        order = np.argsort(keys, kind='mergesort')
+        keys, docs, pos = keys[order], docs[order], pos[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (docs[1:] != docs[:-1])
+        keys, self._docs, self._pos = keys[first], docs[first], pos[first]
+
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        self._keys = keys[np.r_[0, bounds]] if len(keys) else keys
+        self._offsets = np.r_[0, bounds, len(keys)].astype(np.int64)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def _pack(cls, chars):
+        key = 0
+        for c in chars:
+            key = (key << cls.bits) | c
+        return key
+
+    def _postings(self, key, prefix=None):
+        """
+        Returns the postings for `key`, or for all keys that share its first
+        `prefix` characters.
+        """
+        if prefix is None:
+            lo = np.searchsorted(self._keys, key)
+            hi = np.searchsorted(self._keys, key, side='right')
+        else:
+            span = 1 << (self.bits * (self.n - prefix))
+            lo = np.searchsorted(self._keys, key)
+            hi = np.searchsorted(self._keys, key + span)
+        start, end = self._offsets[lo], self._offsets[hi]
+        return self._docs[start:end], self._pos[start:end]
+
+    def _matches(self, query):
+        """
+        Returns the documents containing `query` and the position of the
+        match. Documents may be repeated with different positions.
+        """
+        codes = [ord(c) for c in query]
+        if len(codes) < self.n:
+            key = self._pack(codes + [0] * (self.n - len(codes)))
+            return self._postings(key, prefix=len(codes))
+
+        postings = [self._postings(self._pack(codes[i:i + self.n]))
+                    for i in range(len(codes) - self.n + 1)]
+        if len(postings) == 1:
+            return postings[0]
+
+        postings.sort(key=lambda p: len(p[0]))
+        docs = postings[0][0]
+        for other, _ in postings[1:]:
+            docs = np.intersect1d(docs, other, assume_unique=True)
+
+        # trigram co-occurrence is necessary, but not sufficient
+        pos = np.array([self.labels[doc].find(query) for doc in docs],
+                       dtype=np.int32)
+        found = pos >= 0
+        return docs[found], pos[found]
+
+    def search(self, query, n=None):
+        """
+        Returns the indices of the documents whose label contains `query`,
+        ordered by the position of the match. At most `n` are returned.
+        """
+        query = text_type(query).lower()
+        if not query:
+            return np.arange(len(self.labels))[:n]
+
+        docs, pos = self._matches(query)
+        if not len(docs):
+            return np.zeros(0, dtype=np.int64)
+
+        # collect matches one position at a time, stopping once n are found
+        seen = np.zeros(len(self.labels), dtype=bool)
+        found, total = [], 0
+        for p in range(pos.min(), pos.max() + 1):
+            at = np.unique(docs[pos == p])
+            at = at[~seen[at]]
+            seen[at] = True
+            found.append(at)
+            total += len(at)
+            if n is not None and total >= n:
+                break
+
+        return np.concatenate(found)[:n].astype(np.int64)
+
+
+def _safe_label(label, doc):
+    """ Returns `label(doc)` as text, or None if it fails. """
+    try:
+        return text_type(label(doc))
+    except Exception:
+        return None
+
+
+# label function of a worker process, set by `_init_worker`
+_label_fn = None
+
+
+def _init_worker(label):
+    global _label_fn
+    _label_fn = label
+
+
+def _label_chunk(docs):
+    return [_safe_label(_label_fn, doc) for doc in docs]
+
+
+def _fork_pool(processes, label):
+    """
+    Returns a pool of forked processes that label documents with `label`, or
+    None if fork is unavailable.
+    """
+    if not hasattr(os, 'fork'):
+        return None
+    try:
+        context = multiprocessing.get_context('fork')
+    except AttributeError:
+        # Python 2 always forks
+        context = multiprocessing
+    return context.Pool(processes, _init_worker, (label,))
+
+
+def build_labels(docs, label, batch=None, processes=1):
+    """
+    Returns the display label of each of `docs`, and the number of documents
+    that could not be labeled and are labeled by their id instead. Calls
+    `batch(docs)` if given, or else `label(doc)` on every document, in
+    `processes` forked worker processes (`None` for one per CPU) which
+    inherit the state of the label module. Forking is only safe in a process
+    without other threads, such as a command line tool.
+    """
+    if batch is not None:
+        try:
+            labels = [text_type(doc_label) for doc_label in batch(docs)]
+            if len(labels) == len(docs):
+                return labels, 0
+            print("Label function returned {0} labels for {1} documents, "
+                  "labeling them one at a time".format(len(labels), len(docs)))
+        except Exception:
+            traceback.print_exc()
+            print("Could not label documents in a batch, labeling them one "
+                  "at a time")
+
+    processes = processes or multiprocessing.cpu_count()
+    pool = None
+    if processes > 1 and len(docs) > LABEL_CHUNKSIZE:
+        pool = _fork_pool(processes, label)
+    if pool is None:
+        labels = [_safe_label(label, doc) for doc in docs]
+    else:
+        try:
+            chunks = pool.map(_label_chunk,
+                              [docs[i:i + LABEL_CHUNKSIZE]
+                               for i in range(0, len(docs), LABEL_CHUNKSIZE)])
+        finally:
+            pool.terminate()
+            pool.join()
+        labels = [doc_label for chunk in chunks for doc_label in chunk]
+
+    failed = sum(doc_label is None for doc_label in labels)
+    return [text_type(doc) if doc_label is None else doc_label
+            for doc, doc_label in zip(docs, labels)], failed
+
+
+def table_name(label_module, context_type):
+    """ Returns the name of the label table of `label_module`. """
+    return '{0}-{1}'.format(label_module.__name__.split('.')[-1], context_type)
+
+
+def table_key(corpus_fingerprint, name, label_files=()):
+    """
+    Returns the key of the label table `name` of the corpus with
+    `corpus_fingerprint`, which changes with the contents of the files in
+    `label_files` that the labels are read from.
+    """
+    return hashlib.sha1(u'|'.join(
+        [corpus_fingerprint, name] +
+        [file_digest(filename) for filename in label_files]).encode('utf8')
+    ).hexdigest()
+
+
+def table_filename(corpus_file, name, key):
+    """
+    Returns the sidecar filename of the label table `name` of `corpus_file`
+    for `key`.
+    """
+    return '{0}-labels-{1}-{2}.json'.format(corpus_file.replace('.npz', ''),
+                                            name, key[:16])
+
+
+def load_or_build_labels(corpus_file, name, key, n, build):
+    """
+    Returns the label table `name` of `corpus_file` for `key`, read from its
+    sidecar file, or computed with `build()` if there is no table of `n`
+    labels. `build` returns the labels and the number of documents that
+    could not be labeled, as `build_labels` does; the table is only saved if
+    every document was labeled. Tables saved for other keys are removed.
+    """
+    filename = table_filename(corpus_file, name, key)
+    if os.path.exists(filename):
+        try:
+            with open(filename, encoding='utf-8') as table_file:
+                labels = json.load(table_file)
+            if isinstance(labels, list) and len(labels) == n:
+                return labels
+        except ValueError:
+            pass
+
+    for stale in glob(table_filename(corpus_file, name, '*')):
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+    start = timer()
+    labels, failed = build()
+    print("Built label table {0} for {1} in {2:.2f}s".format(
+        name, corpus_file, timer() - start))
+    if failed:
+        # a failure may be transient, so try again on the next launch
+        print("Not saving label table {0}: {1} documents labeled by their "
+              "id".format(name, failed))
+        return labels
+    try:
+        with open(filename + '.tmp', 'w', encoding='utf-8') as table_file:
+            json.dump(labels, table_file, ensure_ascii=False)
+        os.rename(filename + '.tmp', filename)
+    except (IOError, OSError):
+        print("Could not save label table to", filename)
+    return labels
@@ -0,0 +1,214 @@
+"""
+topicexplorer.lib.metrics contains the request metrics of the server and
+their export in the Prometheus text format.
+
+`MetricsPlugin` is a Bottle plugin that times every route of an application
+and records into a `Metrics` registry:
+
+``topicexplorer_requests_total``
+    Counter of requests by route, method and status.
+``topicexplorer_request_duration_seconds``
+    Histogram of the latency of each route, from which Prometheus computes
+    quantiles with `histogram_quantile`. `Histogram.quantile` gives the same
+    estimate in process.
+``topicexplorer_requests_in_flight``
+    Gauge of the requests being handled.
+
+Routes are labeled by their rule, e.g. ``/<k:int>/topics.json``, so the
+number of series does not grow with the URLs requested. Other samples, such
+as cache counters, are added at scrape time by collectors registered with
+`Metrics.add_collector`. Each server process keeps its own metrics.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from bisect import bisect_left
+from collections import defaultdict
+import threading
+from timeit import default_timer as timer
+
+from bottle import HTTPResponse, request, response
+
+PREFIX = 'topicexplorer_'
+
+# upper bounds of the latency buckets, in seconds
+BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram(object):
+    """ Counts of observations in cumulative buckets with upper `bounds`. """
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """ Returns (upper bound, cumulative count) pairs, ending at +Inf. """
+        total, buckets = 0, []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+    def quantile(self, q):
+        """
+        Estimates the `q`-quantile by linear interpolation within its bucket,
+        like Prometheus `histogram_quantile`. Returns None without
+        observations.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, below = 0., 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float('inf'):
+                    return lower
+                inside = total - below
+                return lower + (bound - lower) * (rank - below) / inside
+            lower, below = bound, total
+        return lower
+
+
+def _labels(labels):
+    """ Formats a dictionary of labels as a Prometheus label set. """
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in sorted(labels.items()):
+        value = u'{0}'.format(value).replace('\\', '\\\\')
+        value = value.replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(u'{0}="{1}"'.format(name, value))
+    return u'{' + u','.join(escaped) + u'}'
+
+
+def _value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_family(name, kind, help, samples):
+    """
+    Returns the Prometheus text of the metric `name` of type `kind`, with
+    the (suffix, labels, value) triples in `samples`.
+    """
+    lines = [u'# HELP {0} {1}'.format(name, help),
+             u'# TYPE {0} {1}'.format(name, kind)]
+    for suffix, labels, value in samples:
+        lines.append(u'{0}{1}{2} {3}'.format(name, suffix, _labels(labels),
+                                             _value(value)))
+    return u'\n'.join(lines) + u'\n'
+
+
+class Metrics(object):
+    """ Registry of the request metrics of one server process. """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.requests = defaultdict(int)
+        self.latency = dict()
+        self.in_flight = 0
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, route, method, status, seconds):
+        """ Records a request to `route` that took `seconds`. """
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(route, method, status)] += 1
+            if route not in self.latency:
+                self.latency[route] = Histogram(self.buckets)
+            self.latency[route].observe(seconds)
+
+    def reset(self):
+        """ Forgets the requests recorded so far. """
+        with self._lock:
+            self.requests.clear()
+            self.latency.clear()
+
+    def add_collector(self, collect):
+        """
+        Registers `collect`, a function returning (name, type, help,
+        samples) tuples in the form of `format_family`, called on every
+        export.
+        """
+        self.collectors.append(collect)
+
+    def export(self):
+        """ Returns every metric in the Prometheus text format. """
+        with self._lock:
+            requests = sorted(self.requests.items())
+            latency = [sample for route, hist in sorted(self.latency.items())
+                       for sample in _histogram_samples({'route': route}, hist)]
+            in_flight = self.in_flight
+
+        families = [
+            (PREFIX + 'requests_total', 'counter',
+             'Requests by route, method and status.',
+             [('', {'route': route, 'method': method, 'status': status}, n)
+              for (route, method, status), n in requests]),
+            (PREFIX + 'request_duration_seconds', 'histogram',
+             'Time to handle a request, by route.', latency),
+            (PREFIX + 'requests_in_flight', 'gauge',
+             'Requests being handled.', [('', {}, in_flight)]),
+        ]
+        for collect in self.collectors:
+            families.extend(collect())
+        return u''.join(format_family(*family) for family in families)
+
+
+def _histogram_samples(labels, hist):
+    """ Returns the bucket, sum and count samples of a histogram. """
+    samples = []
+    for bound, total in hist.cumulative():
+        samples.append(('_bucket', dict(labels, le=_value(bound)), total))
+    samples.append(('_sum', labels, hist.sum))
+    samples.append(('_count', labels, hist.count))
+    return samples
+
+
+class MetricsPlugin(object):
+    """ Bottle plugin recording the requests to every route in `metrics`. """
+    name = 'metrics'
+    api = 2
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def apply(self, callback, route):
+        metrics = self.metrics
+        rule = route.rule
+
+        def timed(*args, **kwargs):
+            start = timer()
+            metrics.started()
+            status = 500
+            try:
+                body = callback(*args, **kwargs)
+                if isinstance(body, HTTPResponse):
+                    status = body.status_code
+                else:
+                    status = response.status_code
+                return body
+            except HTTPResponse as e:
+                status = e.status_code
+                raise
+            finally:
+                metrics.finished(rule, request.method, status,
+                                 timer() - start)
+        return timed
@@ -0,0 +1,190 @@
+"""
+topicexplorer.lib.mmapstore stores corpus and model files as directories of
+uncompressed `.npy` arrays that the server opens with `mmap_mode='r'`.
+
+Arrays inside an `.npz` archive have to be read into the private memory of
+every process that loads them. A memory-mapped array is backed by the file
+itself, so any number of server processes serving the same corpus share one
+copy in the page cache, and pages that are never used are never read.
+
+The store for `corpus.npz` is the directory `corpus.mmap` next to it. Besides
+the vocabulary, labels and metadata of the corpus, the store of a model holds
+the normalized `phi` and `theta` matrices the viewers compute, so that they
+are shared as well. Each store records the digest of the file it was
+converted from, and is ignored once that file changes.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+from builtins import str as text
+
+from codecs import open
+import os
+import os.path
+import shutil
+
+import numpy as np
+
+FINGERPRINT_FILE = 'fingerprint.txt'
+
+
+def store_dirname(filename):
+    """ Returns the directory of the memory-mapped store of `filename`. """
+    return filename.replace('.npz', '') + '.mmap'
+
+
+def fixed_width(array):
+    """
+    Returns `array` with its arrays of strings, and fields of strings, stored
+    as fixed-width unicode so that they can be memory-mapped. Other object
+    arrays are returned as they are.
+    """
+    array = np.asarray(array)
+    if array.dtype.names:
+        fields = [fixed_width(array[name]) for name in array.dtype.names]
+        converted = np.empty(array.shape, dtype=[
+            (name, field.dtype) for name, field in zip(array.dtype.names, fields)])
+        for name, field in zip(array.dtype.names, fields):
+            converted[name] = field
+        return converted
+    if array.dtype == object and all(
+            isinstance(value, text) for value in array.flat):
+        return array.astype(text)
+    return array
+
+
+def save_arrays(dirname, arrays, fingerprint):
+    """
+    Writes each array in the dictionary `arrays` to `<dirname>/<name>.npy`.
+    The directory is replaced as a whole once every array is written.
+    """
+    tmpname = dirname + '.tmp'
+    shutil.rmtree(tmpname, ignore_errors=True)
+    os.makedirs(tmpname)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmpname, name + '.npy'), fixed_width(array))
+    with open(os.path.join(tmpname, FINGERPRINT_FILE), 'w',
+              encoding='utf-8') as fingerprint_file:
+        fingerprint_file.write(fingerprint)
+
+    shutil.rmtree(dirname, ignore_errors=True)
+    os.rename(tmpname, dirname)
+
+
+def open_arrays(dirname, fingerprint):
+    """
+    Returns a dictionary of the arrays in `dirname`, memory-mapped, or `None`
+    if there is no store converted from a file with `fingerprint`. Arrays of
+    Python objects cannot be mapped and are read into memory instead.
+    """
+    try:
+        with open(os.path.join(dirname, FINGERPRINT_FILE),
+                  encoding='utf-8') as fingerprint_file:
+            if fingerprint_file.read().strip() != fingerprint:
+                return None
+    except IOError:
+        return None
+
+    arrays = dict()
+    for filename in os.listdir(dirname):
+        if filename.endswith('.npy'):
+            path = os.path.join(dirname, filename)
+            try:
+                arrays[filename[:-4]] = np.load(path, mmap_mode='r')
+            except ValueError:
+                arrays[filename[:-4]] = np.load(path, allow_pickle=True)
+    return arrays
+
+
+def convert_corpus(corpus_file, fingerprint):
+    """ Writes the store for the corpus in `corpus_file`. """
+    from vsm.corpus import Corpus
+
+    c = Corpus.load(corpus_file, load_corpus=False)
+    arrays = {'words': c.words,
+              'context_types': np.array(c.context_types),
+              'stopped_words': np.array(sorted(c.stopped_words),
+                                        dtype=object)}
+    for ctx_type, ctx_data in zip(c.context_types, c.context_data):
+        arrays['context_data_' + ctx_type] = ctx_data
+
+    dirname = store_dirname(corpus_file)
+    save_arrays(dirname, arrays, fingerprint)
+    return dirname
+
+
+def load_corpus(corpus_file, fingerprint):
+    """
+    Returns a `Corpus` without its token array, backed by the store of
+    `corpus_file`, or `None` if the store is missing or out of date.
+    """
+    from vsm.corpus import Corpus
+
+    arrays = open_arrays(store_dirname(corpus_file), fingerprint)
+    if arrays is None:
+        return None
+
+    c = Corpus([], remove_empty=False)
+    c.corpus = None
+    c.words = arrays['words']
+    c.context_types = arrays['context_types'].tolist()
+    c.context_data = [arrays['context_data_' + ctx_type]
+                      for ctx_type in c.context_types]
+    c.stopped_words = set(arrays['stopped_words'].tolist())
+    c.original_length = None
+    c._set_words_int()
+    return c
+
+
+def convert_model(model_file, fingerprint):
+    """
+    Writes the store for the model in `model_file`. The training state (the
+    token array and topic assignments) is left out, as the server does not
+    use it.
+    """
+    from vsm.model.lda import LDA
+
+    m = LDA.load(model_file)
+    arrays = {'context_type': np.array(m.context_type),
+              'K': np.array(m.K),
+              'V': np.array(m.V),
+              'alpha': m.alpha,
+              'beta': m.beta,
+              'indices': m.indices,
+              'iteration': np.array(m.iteration),
+              'word_top': m.word_top,
+              'top_doc': m.top_doc,
+              'inv_top_sums': m.inv_top_sums,
+              'phi': m.word_top / m.word_top.sum(0),
+              'theta': m.top_doc / m.top_doc.sum(0)}
+
+    dirname = store_dirname(model_file)
+    save_arrays(dirname, arrays, fingerprint)
+    return dirname
+
+
+def load_viewer(corpus, model_file, fingerprint):
+    """
+    Returns an `LdaCgsViewer` for the model in `model_file` whose matrices are
+    backed by its store, or `None` if the store is missing or out of date.
+    """
+    from vsm.model.ldacgsseq import LdaCgsSeq
+    from vsm.viewer.ldacgsviewer import LdaCgsViewer
+
+    arrays = open_arrays(store_dirname(model_file), fingerprint)
+    if arrays is None:
+        return None
+
+    # an empty model, so that no matrices are allocated
+    m = LdaCgsSeq(context_type=str(arrays['context_type']),
+                  K=int(arrays['K']), V=0)
+    m.V = int(arrays['V'])
+    m.iteration = int(arrays['iteration'])
+    for name in ['alpha', 'beta', 'indices', 'word_top', 'top_doc',
+                 'inv_top_sums']:
+        setattr(m, name, arrays[name])
+
+    viewer = LdaCgsViewer(corpus, m)
+    viewer._phi = arrays['phi']
+    viewer._theta = arrays['theta']
+    return viewer
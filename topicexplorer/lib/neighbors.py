@@ -0,0 +1,295 @@
+"""
+topicexplorer.lib.neighbors contains an approximate nearest-neighbor index for
+document-to-document similarity.
+
+The index is a forest of random-projection trees built over the
+Hellinger-transformed document-topic distributions (the element-wise square
+root of each column of theta). Queries walk every tree at once using a
+priority queue ordered by distance to the splitting hyperplanes, collect a
+fixed number of candidate documents and re-rank them with the exact
+Jensen-Shannon distance used by `LdaCgsViewer.dist_doc_doc`. The cost of a
+query therefore depends on the candidate budget, not on the corpus size.
+
+The module can be run as a script to benchmark recall and latency against the
+exact scan::
+
+    python -m topicexplorer.lib.neighbors ap.ini -k 20 40 60
+"""
+from __future__ import division
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+from builtins import range
+
+import heapq
+import os.path
+
+import numpy as np
+from vsm.spatial import JS_dist
+
+
+class NeighborIndex(object):
+    """
+    Random-projection forest over the columns of a topic-document matrix.
+
+    `theta` is a K x D matrix whose columns are distributions over topics,
+    i.e. `LdaCgsViewer.theta`. The trees are stored as flat arrays so that
+    the whole forest can be saved to and loaded from a single `.npz` file.
+    """
+
+    def __init__(self, theta, n_trees=10, leaf_size=32, seed=None,
+                 fingerprint=''):
+        self.theta = theta
+        self.fingerprint = fingerprint
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+
+        if theta is not None:
+            self._build(np.random.RandomState(seed))
+
+    @property
+    def points(self):
+        """ Hellinger transform of the documents, one row per document. """
+        if getattr(self, '_points', None) is None:
+            self._points = np.sqrt(self.theta.T).astype(np.float32)
+        return self._points
+
+    def _build(self, rng):
+        X = self.points
+        D, K = X.shape
+
+        normals, offsets, children = [], [], []
+        leaves, leaf_items = [], []
+        roots = []
+
+        def add_leaf(items):
+            leaves.append((len(leaf_items), len(leaf_items) + len(items)))
+            leaf_items.extend(items)
+            return -len(leaves)
+
+        for _ in range(self.n_trees):
+            # iterative construction: (item indices, parent node, side)
+            stack = [(np.arange(D), None, None)]
+            while stack:
+                items, parent, side = stack.pop()
+                if len(items) <= self.leaf_size:
+                    node = add_leaf(items)
+                else:
+                    a, b = rng.choice(items, 2, replace=False)
+                    normal = X[a] - X[b]
+                    if not normal.any():
+                        normal = rng.normal(size=K).astype(np.float32)
+                    proj = X[items].dot(normal)
+                    offset = np.median(proj)
+                    right = proj > offset
+                    if right.all() or not right.any():
+                        # degenerate split (identical points), halve instead
+                        right = np.zeros(len(items), dtype=bool)
+                        right[len(items) // 2:] = True
+
+                    node = len(normals)
+                    normals.append(normal)
+                    offsets.append(offset)
+                    children.append([0, 0])
+                    stack.append((items[~right], node, 0))
+                    stack.append((items[right], node, 1))
+
+                if parent is None:
+                    roots.append(node)
+                else:
+                    children[parent][side] = node
+
+        self.normals = np.array(normals, dtype=np.float32).reshape(-1, K)
+        self.offsets = np.array(offsets, dtype=np.float32)
+        self.children = np.array(children, dtype=np.int32).reshape(-1, 2)
+        self.leaves = np.array(leaves, dtype=np.int64).reshape(-1, 2)
+        self.leaf_items = np.array(leaf_items, dtype=np.int32)
+        self.roots = np.array(roots, dtype=np.int32)
+
+    def candidates(self, x, search_k):
+        """
+        Returns the indices of at least `search_k` documents near the
+        Hellinger-transformed point `x`, or the whole corpus if it is smaller.
+        """
+        queue = [(-np.inf, int(root)) for root in self.roots]
+        found = set()
+        while queue and len(found) < search_k:
+            priority, node = heapq.heappop(queue)
+            if node < 0:
+                start, end = self.leaves[-node - 1]
+                found.update(self.leaf_items[start:end].tolist())
+            else:
+                margin = float(self.normals[node].dot(x) - self.offsets[node])
+                left, right = self.children[node]
+                heapq.heappush(queue, (max(priority, -margin), int(right)))
+                heapq.heappush(queue, (max(priority, margin), int(left)))
+
+        return np.fromiter(found, dtype=np.int64, count=len(found))
+
+    def query(self, doc, n=40, search_k=None):
+        """
+        Returns the indices and Jensen-Shannon distances of the (approximate)
+        `n` nearest documents to the document at column `doc` of theta,
+        sorted by increasing distance. The query document itself is included,
+        as it is in `LdaCgsViewer.dist_doc_doc`.
+        """
+        return self.nearest(self.theta[:, doc], n, search_k)
+
+    def nearest(self, p, n=40, search_k=None):
+        """
+        Returns the indices and Jensen-Shannon distances of the (approximate)
+        `n` nearest documents to the distribution over topics `p`, such as
+        that of a new document, sorted by increasing distance.
+        """
+        if search_k is None:
+            search_k = max(100 * n, 4096)
+
+        cands = self.candidates(np.sqrt(p).astype(np.float32), search_k)
+        dists = np.atleast_1d(JS_dist(p, self.theta[:, cands]))
+
+        if len(cands) > n:
+            top = np.argpartition(dists, n - 1)[:n]
+            cands, dists = cands[top], dists[top]
+        order = np.argsort(dists, kind='mergesort')
+        return cands[order], dists[order]
+
+    def save(self, filename):
+        np.savez(filename, normals=self.normals, offsets=self.offsets,
+                 children=self.children, leaves=self.leaves,
+                 leaf_items=self.leaf_items, roots=self.roots,
+                 n_trees=self.n_trees, leaf_size=self.leaf_size,
+                 fingerprint=np.array(self.fingerprint))
+
+    @staticmethod
+    def load(filename, theta):
+        arrays = np.load(filename)
+        index = NeighborIndex(None, n_trees=int(arrays['n_trees']),
+                              leaf_size=int(arrays['leaf_size']),
+                              fingerprint=str(arrays['fingerprint']))
+        index.theta = theta
+        for name in ['normals', 'offsets', 'children', 'leaves',
+                     'leaf_items', 'roots']:
+            setattr(index, name, arrays[name])
+        return index
+
+
+def index_filename(model_file):
+    """ Returns the sidecar filename for the index of `model_file`. """
+    return model_file.replace('.npz', '') + '-neighbors.npz'
+
+
+def load_or_build(model_file, theta, fingerprint, **kwargs):
+    """
+    Loads the sidecar index for `model_file` if it was built from a model with
+    the same `fingerprint`. Otherwise builds a new index and tries to save it
+    next to the model.
+    """
+    filename = index_filename(model_file)
+    if os.path.exists(filename):
+        try:
+            index = NeighborIndex.load(filename, theta)
+            if index.fingerprint == fingerprint:
+                return index
+        except (IOError, KeyError, ValueError):
+            pass
+
+    print("Building neighbor index for", model_file)
+    index = NeighborIndex(theta, fingerprint=fingerprint, **kwargs)
+    try:
+        index.save(filename)
+    except (IOError, OSError):
+        print("Could not save neighbor index to", filename)
+    return index
+
+
+def exact(theta, doc, n=40):
+    """
+    Returns the indices and Jensen-Shannon distances of the `n` nearest
+    documents to column `doc` of `theta` by exhaustive scan.
+    """
+    return nearest(theta, theta[:, doc], n)
+
+
+def nearest(theta, p, n=40):
+    """
+    Returns the indices and Jensen-Shannon distances of the `n` nearest
+    documents to the distribution over topics `p` by exhaustive scan.
+    """
+    dists = JS_dist(p, theta)
+    order = np.argsort(dists, kind='mergesort')[:n]
+    return order, dists[order]
+
+
+def benchmark(theta, index, n=40, n_queries=100, seed=None):
+    """
+    Compares `index` to the exact scan on `n_queries` random documents.
+    Returns a tuple of (mean recall@n, mean exact seconds, mean index seconds).
+    """
+    from timeit import default_timer as timer
+
+    rng = np.random.RandomState(seed)
+    docs = rng.choice(theta.shape[1], min(n_queries, theta.shape[1]),
+                      replace=False)
+
+    recall, exact_time, index_time = [], 0., 0.
+    for doc in docs:
+        start = timer()
+        true, _ = exact(theta, doc, n)
+        exact_time += timer() - start
+
+        start = timer()
+        found, _ = index.query(doc, n)
+        index_time += timer() - start
+
+        recall.append(len(set(true) & set(found)) / len(true))
+
+    return np.mean(recall), exact_time / len(docs), index_time / len(docs)
+
+
+def main(args):
+    import ast
+    from timeit import default_timer as timer
+    import topicexplorer.config
+    from vsm.model.lda import LDA
+
+    config = topicexplorer.config.read(args.config_file)
+    model_pattern = config.get('main', 'model_pattern')
+    krange = args.k or ast.literal_eval(config.get('main', 'topics'))
+
+    print("k\tbuild (s)\trecall@{0}\texact (ms)\tindex (ms)".format(args.n))
+    for k in krange:
+        m = LDA.load(model_pattern.format(k))
+        theta = m.top_doc / m.top_doc.sum(0)
+
+        start = timer()
+        index = NeighborIndex(theta, n_trees=args.trees, seed=args.seed)
+        build_time = timer() - start
+
+        recall, exact_time, index_time = benchmark(
+            theta, index, n=args.n, n_queries=args.queries, seed=args.seed)
+        print("{0}\t{1:.2f}\t{2:.3f}\t{3:.2f}\t{4:.2f}".format(
+            k, build_time, recall, exact_time * 1000, index_time * 1000))
+
+
+def populate_parser(parser):
+    from topicexplorer.lib.util import is_valid_configfile
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+    parser.add_argument('-k', nargs='+', type=int,
+                        help="K values to benchmark [Default: all]")
+    parser.add_argument('-n', type=int, default=40,
+                        help="Number of neighbors [Default: 40]")
+    parser.add_argument('--trees', type=int, default=10,
+                        help="Number of trees [Default: 10]")
+    parser.add_argument('--queries', type=int, default=100,
+                        help="Number of random query documents [Default: 100]")
+    parser.add_argument('--seed', type=int, default=None)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    populate_parser(parser)
+    args = parser.parse_args()
+
+    main(args)
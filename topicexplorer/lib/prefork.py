@@ -0,0 +1,249 @@
+"""
+topicexplorer.lib.prefork contains a pre-fork process manager for serving one
+WSGI application from several processes.
+
+The parent process binds the listening socket, then forks the workers after
+the application is loaded. Each worker runs its own waitress server on the
+inherited socket, and the kernel hands each new connection to one of them.
+Arrays loaded before the fork are shared copy-on-write, and memory-mapped
+arrays are shared through the page cache, so workers cost little memory
+beyond the requests they serve. Each worker has its own interpreter lock, so
+requests that spend their time in numpy run in parallel.
+
+The parent restarts workers that die. Signals sent to the parent:
+
+``SIGHUP``
+    Calls `on_hup`, then restarts the workers one at a time, starting each
+    replacement before stopping the worker it replaces.
+``SIGTERM``, ``SIGINT``
+    Stops the workers and exits.
+
+A worker that is asked to stop closes its copy of the listening socket,
+finishes the requests it has already read and exits, or is killed after
+`graceful_timeout` seconds. Requires `os.fork`, so it is unavailable on
+Windows.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import os
+import signal
+import socket
+import sys
+import time
+
+# respawn delay for workers that die right after starting
+MIN_WORKER_LIFETIME = 1.
+
+
+def bind(host, port, backlog=1024):
+    """ Returns a listening TCP socket for `host` and `port`. """
+    family, socktype, proto, _, address = socket.getaddrinfo(
+        host, port, socket.AF_UNSPEC, socket.SOCK_STREAM)[0]
+    sock = socket.socket(family, socktype, proto)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    sock.listen(backlog)
+    return sock
+
+
+def _idle(channel):
+    """ True if a waitress channel has no request in progress. """
+    return not (getattr(channel, 'requests', None) or
+                getattr(channel, 'total_outbufs_len', 0))
+
+
+def run_worker(handler, sock, graceful_timeout=30., **options):
+    """
+    Serves `handler` on the listening socket `sock` with waitress until the
+    process receives `SIGTERM`. `options` are passed to waitress.
+    """
+    from waitress.server import create_server
+    from waitress import wasyncore
+
+    # the parent handles interrupts from the terminal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server = create_server(handler, sockets=[sock], **options)
+    deadline = []
+
+    def stop(signum, frame):
+        if not deadline:
+            deadline.append(time.time() + graceful_timeout)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        accepting = True
+        while True:
+            wasyncore.loop(timeout=server.adj.asyncore_loop_timeout,
+                           map=server._map, use_poll=server.adj.asyncore_use_poll,
+                           count=1)
+            if not deadline:
+                continue
+            # the socket is closed outside of the handler, while not polled
+            if accepting:
+                accepting = server.accepting = False
+                server.del_channel()
+                sock.close()
+            if time.time() > deadline[0] or all(
+                    _idle(channel) for channel in list(server._map.values())):
+                break
+    finally:
+        server.close()
+
+
+class Prefork(object):
+    """
+    Runs `workers` processes serving `handler` on `host` and `port`. `options`
+    are passed to waitress in each worker.
+
+    `on_start()` is called in the parent once the workers are forked, so
+    that threads it starts are not running during the first fork.
+    `on_hup()` is called in the main thread of the parent on ``SIGHUP``;
+    the workers are restarted unless it returns False. Errors raised by
+    `on_hup` are printed and the workers are restarted.
+    """
+
+    def __init__(self, handler, host, port, workers=2, graceful_timeout=30.,
+                 on_start=None, on_hup=None, **options):
+        if not hasattr(os, 'fork'):
+            raise OSError("Multiple workers require os.fork, "
+                          "which is not available on this platform.")
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.on_start = on_start
+        self.on_hup = on_hup
+        self.options = options
+
+        self.sock = None
+        self.pids = dict()  # pid -> start time
+        self.retiring = set()
+        self._signals = []
+
+    def spawn(self):
+        """ Forks a worker and returns its pid. """
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 0
+            try:
+                run_worker(self.handler, self.sock,
+                           graceful_timeout=self.graceful_timeout,
+                           **self.options)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                status = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(status)
+
+        self.pids[pid] = time.time()
+        return pid
+
+    def retire(self, pid):
+        """ Asks the worker `pid` to finish its requests and exit. """
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+    def restart(self):
+        """ Replaces every worker, one at a time. """
+        for pid in list(self.pids):
+            if pid not in self.retiring:
+                self.spawn()
+                self.retire(pid)
+
+    def reap(self):
+        """
+        Collects the workers that have exited and returns the start times of
+        those that were not asked to exit.
+        """
+        died = []
+        while self.pids:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except OSError:  # no children left
+                break
+            if pid == 0:
+                break
+            started = self.pids.pop(pid, None)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif started is not None:
+                print("Worker {0} exited unexpectedly".format(pid))
+                died.append(started)
+        return died
+
+    def stop(self):
+        """ Stops every worker, killing those that outlive the timeout. """
+        for pid in list(self.pids):
+            self.retire(pid)
+        deadline = time.time() + self.graceful_timeout
+        while self.pids and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        while self.pids:
+            self.reap()
+            time.sleep(0.1)
+
+    def _hup(self):
+        if self.on_hup is None:
+            return True
+        try:
+            return self.on_hup()
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            return True
+
+    def _on_signal(self, signum, frame):
+        self._signals.append(signum)
+
+    def run(self):
+        """ Starts the workers and supervises them until stopped. """
+        self.sock = bind(self.host, self.port)
+        for _ in range(self.workers):
+            self.spawn()
+        print("Serving on http://{0}:{1} with {2} workers (pid {3})".format(
+            self.host, self.port, self.workers, os.getpid()))
+
+        previous = dict((signum, signal.signal(signum, self._on_signal))
+                        for signum in [signal.SIGHUP, signal.SIGTERM,
+                                       signal.SIGINT])
+        try:
+            if self.on_start is not None:
+                self.on_start()
+            while True:
+                while self._signals:
+                    signum = self._signals.pop(0)
+                    if signum == signal.SIGHUP:
+                        if self._hup() is not False:
+                            print("Restarting workers")
+                            self.restart()
+                    else:
+                        return
+
+                for started in self.reap():
+                    if time.time() - started < MIN_WORKER_LIFETIME:
+                        time.sleep(MIN_WORKER_LIFETIME)
+                    self.spawn()
+                time.sleep(0.2)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            self.stop()
+            self.sock.close()
@@ -0,0 +1,129 @@
+"""
+topicexplorer.lib.reload contains the pieces of a reload of the models of a
+running server, after ``topicexplorer train`` has written new model files.
+
+`Models` holds everything the server derives from one version of its
+models: the viewers, the topic colors and fingerprints, and the indexes and
+caches built from them. A reload loads a new `Models` next to the one being
+served and replaces it with a single assignment. Each request reads the
+`Models` it started with, so requests in flight finish against the old
+version, which is freed once they are done.
+
+`Watcher` checks files for changes in a background thread and calls a
+function once they have stopped changing, so that files still being written
+are not read.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from collections import OrderedDict
+import os
+import threading
+import traceback
+
+
+class Models(object):
+    """
+    The models matching `model_pattern` for each number of topics in
+    `topic_range`, and the state derived from them. `version` counts the
+    reloads of a server.
+    """
+
+    def __init__(self, model_pattern, topic_range, cluster_path=None,
+                 version=1):
+        self.model_pattern = model_pattern
+        self.topic_range = topic_range
+        self.cluster_path = cluster_path
+        self.version = version
+
+        self.v = dict()
+        self.model_load_time = dict()
+        self.colors = dict()
+        self.fingerprints = dict()
+        self.neighbors = dict()
+        self.topic_indexes = dict()
+        self.top_words = dict()
+        self.topics_json = OrderedDict()
+        self.word_topics_json = OrderedDict()
+        self.word_search = None
+
+
+def signature(paths):
+    """
+    Returns the modification time and size of each file in `paths`, or
+    `None` for files that do not exist.
+    """
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats.append((path, stat.st_mtime, stat.st_size))
+        except OSError:
+            stats.append((path, None, None))
+    return stats
+
+
+class Watcher(object):
+    """
+    Calls `on_change()` when the files listed by `paths()` change, once their
+    modification times and sizes have stayed the same for `interval`
+    seconds. Errors raised by `on_change` are printed, and the files are not
+    read again until they change again.
+    """
+
+    def __init__(self, paths, on_change, interval=5.):
+        self.paths = paths
+        self.on_change = on_change
+        self.interval = interval
+        self.changes = 0
+
+        self._seen = signature(paths())
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """
+        Checks the files once. Returns True if `on_change` was called.
+        """
+        current = signature(self.paths())
+        if current == self._seen:
+            self._pending = None
+            return False
+        if current != self._pending:
+            # changed since the last check; wait for the writes to finish
+            self._pending = current
+            return False
+
+        self._seen, self._pending = current, None
+        self.changes += 1
+        try:
+            self.on_change()
+        except Exception:
+            traceback.print_exc()
+            print("Could not reload after changes to",
+                  ', '.join(path for path, _, _ in current))
+
+        # the change may name other files, such as new model files
+        paths = self.paths()
+        if paths != [path for path, _, _ in current]:
+            self._seen = signature(paths)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        """ Starts checking the files in a background thread. """
+        self._thread = threading.Thread(target=self._run, name='watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stops checking the files, waiting for a check in progress. """
+        self._stop.set()
+        if (self._thread is not None and
+                self._thread is not threading.current_thread()):
+            self._thread.join()
@@ -0,0 +1,120 @@
+"""
+topicexplorer.lib.topicindex contains a precomputed ranking of documents for
+every topic of a model, used to answer top-N and bottom-N topic queries.
+
+`LdaCgsViewer.dist_top_doc` ranks documents by the Jensen-Shannon distance
+between a pseudo-document that puts all of its mass on one topic and each
+document's distribution over topics. That distance depends only on the
+document's proportion of the topic, so the ranking of topic `t` is simply the
+documents sorted by decreasing `theta[t]`, and any distance can be recovered
+from `theta` in constant time.
+
+The rankings are stored in a single `.npy` file of shape (K, D) next to the
+model file, which is opened with `mmap_mode='r'` so that a slice only reads the
+pages it needs. The file name includes the model fingerprint, so retraining a
+model invalidates its index automatically.
+"""
+from __future__ import division
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from glob import glob
+import os
+import os.path
+
+import numpy as np
+
+
+def topic_dist(p):
+    """
+    Returns the Jensen-Shannon distance between a topic and documents with
+    proportion(s) `p` of that topic. Identical to
+    `vsm.spatial.JS_dist(e_t, theta)[d]` where `e_t` is the indicator of the
+    topic and `p = theta[t, d]`.
+    """
+    p = np.asarray(p, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plogp = np.where(p > 0, p * np.log2(2 * p / (1 + p)), 0.)
+    js = .5 * (-np.log2((1 + p) / 2) + (1 - p) + plogp)
+    return np.sqrt(np.maximum(js, 0.))
+
+
+def index_filename(model_file, fingerprint):
+    """ Returns the sidecar filename for the topic index of `model_file`. """
+    return '{0}-topicdocs-{1}.npy'.format(model_file.replace('.npz', ''),
+                                          fingerprint[:16])
+
+
+class TopicIndex(object):
+    """
+    Ranked documents for each topic of a model. `ranks[t]` holds the indices
+    of all documents, sorted by increasing distance to topic `t`.
+    """
+
+    def __init__(self, ranks, theta):
+        self.ranks = ranks
+        self.theta = theta
+
+    @staticmethod
+    def build(theta, filename=None):
+        """
+        Ranks the documents of each topic in `theta`. If `filename` is given,
+        the ranking is written to disk and returned as a read-only memory map.
+        """
+        K, D = theta.shape
+        if filename is None:
+            ranks = np.empty((K, D), dtype=np.int32)
+        else:
+            ranks = np.lib.format.open_memmap(filename + '.tmp', mode='w+',
+                                              dtype=np.int32, shape=(K, D))
+
+        for t in range(K):
+            ranks[t] = np.argsort(-theta[t], kind='mergesort')
+
+        if filename is not None:
+            ranks.flush()
+            del ranks
+            os.replace(filename + '.tmp', filename)
+            ranks = np.load(filename, mmap_mode='r')
+
+        return TopicIndex(ranks, theta)
+
+    def top_docs(self, topic, N=40):
+        """
+        Returns the indices and distances of the `N` documents closest to
+        `topic`, or of the `-N` farthest documents, farthest first, if `N` is
+        negative.
+        """
+        if N > 0:
+            idxs = np.array(self.ranks[topic, :N])
+        else:
+            idxs = np.array(self.ranks[topic, N:][::-1])
+        return idxs, topic_dist(self.theta[topic, idxs])
+
+
+def load_or_build(model_file, theta, fingerprint):
+    """
+    Opens the topic index for the model with `fingerprint`, building it if it
+    does not exist. Indexes left behind by earlier versions of the model are
+    removed.
+    """
+    filename = index_filename(model_file, fingerprint)
+    if os.path.exists(filename):
+        ranks = np.load(filename, mmap_mode='r')
+        if ranks.shape == theta.shape:
+            return TopicIndex(ranks, theta)
+        del ranks
+
+    for stale in glob(index_filename(model_file, '*')):
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+    print("Building topic index for", model_file)
+    try:
+        return TopicIndex.build(theta, filename)
+    except (IOError, OSError):
+        print("Could not save topic index to", filename)
+        return TopicIndex.build(theta)
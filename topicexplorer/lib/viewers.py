@@ -0,0 +1,147 @@
+"""
+topicexplorer.lib.viewers contains a lazily populated, memory-bounded mapping
+from numbers of topics to model viewers.
+
+Each model is loaded on first access. When the estimated size of the loaded
+models exceeds the memory budget, the least recently used models are evicted
+until the budget is met again; an evicted model is loaded again on its next
+access. Concurrent first requests for the same model wait for a single load.
+"""
+from __future__ import division
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from collections import OrderedDict
+import threading
+from timeit import default_timer as timer
+
+import numpy as np
+
+
+def viewer_nbytes(viewer):
+    """
+    Estimates the memory used by a viewer: the arrays of its model, plus the
+    normalized copies of `word_top` and `top_doc` the viewer keeps once its
+    `phi` and `theta` properties are used. Memory-mapped arrays are shared
+    with the page cache and not counted.
+    """
+    model = viewer.model
+    nbytes = sum(value.nbytes for value in vars(model).values()
+                 if isinstance(value, np.ndarray)
+                 and not isinstance(value, np.memmap))
+    for name, cached in [('word_top', '_phi'), ('top_doc', '_theta')]:
+        if not isinstance(getattr(viewer, cached, None), np.memmap):
+            nbytes += getattr(model, name).size * np.dtype(np.float64).itemsize
+    return nbytes
+
+
+class ViewerCache(object):
+    """
+    Dictionary-like cache of the viewers for the models in `keys`.
+
+    `load(k)` must return the viewer for `k`. `on_evict(k)`, if given, is
+    called after the viewer for `k` is dropped, to release anything derived
+    from it. `budget` is the memory budget in bytes; if it is `None` models
+    are never evicted.
+    """
+
+    def __init__(self, keys, load, budget=None, on_evict=None):
+        self._keys = list(keys)
+        self._load = load
+        self.budget = budget
+        self.on_evict = on_evict
+
+        self._viewers = OrderedDict()
+        self._nbytes = dict()
+        self._lock = threading.Lock()
+        self._load_locks = dict((k, threading.Lock()) for k in self._keys)
+
+        self.loads = 0
+        self.evictions = 0
+        self.load_time = 0.
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __contains__(self, k):
+        return k in self._load_locks
+
+    def keys(self):
+        return list(self._keys)
+
+    def items(self):
+        return [(k, self[k]) for k in self._keys]
+
+    def loaded(self):
+        """ Returns the keys of the models in memory, least recent first. """
+        with self._lock:
+            return list(self._viewers)
+
+    def loaded_viewers(self):
+        """
+        Returns the viewers of the models in memory, by key, without loading
+        or touching any model.
+        """
+        with self._lock:
+            return dict(self._viewers)
+
+    @property
+    def nbytes(self):
+        """ Estimated memory used by the models in memory. """
+        with self._lock:
+            return sum(self._nbytes.values())
+
+    def __getitem__(self, k):
+        with self._lock:
+            if k in self._viewers:
+                self._viewers[k] = self._viewers.pop(k)
+                return self._viewers[k]
+
+        # one load per model; other threads asking for k wait here
+        with self._load_locks[k]:
+            with self._lock:
+                if k in self._viewers:
+                    self._viewers[k] = self._viewers.pop(k)
+                    return self._viewers[k]
+
+            start = timer()
+            viewer = self._load(k)
+            elapsed = timer() - start
+            nbytes = viewer_nbytes(viewer)
+
+            with self._lock:
+                self._viewers[k] = viewer
+                self._nbytes[k] = nbytes
+                self.loads += 1
+                self.load_time += elapsed
+            print("Loaded model k={0} in {1:.2f}s ({2:.1f} MB, {3} loads)".format(
+                k, elapsed, nbytes / 2**20, self.loads))
+
+            self._evict(keep=k)
+            return viewer
+
+    def _evict(self, keep):
+        """ Drops the least recently used models until within the budget. """
+        if self.budget is None:
+            return
+
+        while True:
+            with self._lock:
+                total = sum(self._nbytes.values())
+                older = [key for key in self._viewers if key != keep]
+                if total <= self.budget or not older:
+                    return
+                k = older[0]
+                del self._viewers[k]
+                nbytes = self._nbytes.pop(k)
+                self.evictions += 1
+
+            start = timer()
+            if self.on_evict is not None:
+                self.on_evict(k)
+            print("Evicted model k={0} in {1:.2f}s ({2:.1f} MB, {3} evictions)".format(
+                k, timer() - start, nbytes / 2**20, self.evictions))
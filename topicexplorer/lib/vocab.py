@@ -0,0 +1,52 @@
+"""
+topicexplorer.lib.vocab contains a lookup table from the words of a corpus to
+their integer ids, shared by all routes that take search terms.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+from builtins import str as text
+
+
+def _as_text(word):
+    if isinstance(word, bytes):
+        return word.decode('utf-8', 'replace')
+    return text(word)
+
+
+class Vocabulary(object):
+    """
+    Maps words to their index in `Corpus.words`. Words are stored as text, so
+    lookups behave the same whether the corpus vocabulary is a unicode or a
+    byte string array. Words removed from the corpus by stoplisting are kept
+    separately, so that queries can report them.
+    """
+
+    def __init__(self, words, stopped_words=()):
+        self.words_int = dict((_as_text(w), i) for i, w in enumerate(words))
+        self.stopped_words = set(_as_text(w) for w in stopped_words)
+
+    def __len__(self):
+        return len(self.words_int)
+
+    def __contains__(self, word):
+        return _as_text(word) in self.words_int
+
+    def __getitem__(self, word):
+        return self.words_int[_as_text(word)]
+
+    def resolve(self, words):
+        """
+        Splits `words` into a tuple of (indices of words in the corpus,
+        stoplisted words, unknown words), preserving the query order.
+        """
+        ids, stopped, unknown = [], [], []
+        for word in words:
+            word = _as_text(word)
+            if word in self.words_int:
+                ids.append(self.words_int[word])
+            elif word in self.stopped_words:
+                stopped.append(word)
+            else:
+                unknown.append(word)
+        return ids, stopped, unknown
@@ -0,0 +1,110 @@
+"""
+topicexplorer.lib.warmup contains the warm-up of a server: representative
+requests made in process before the server accepts connections, so that the
+first visitors do not pay for the work done on first use, such as page
+faults on the model matrices, index builds, rendering and caching.
+
+`WarmUp` sends each of its requests to a WSGI application with `wsgi_get`
+and records its progress, which the server reports at ``/readyz``. A
+response of ``202 Accepted``, as sent while a background job runs, is
+requested again after its ``Retry-After`` delay until it is complete.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+from collections import OrderedDict
+import time
+from timeit import default_timer as timer
+from urllib.parse import unquote_to_bytes
+from wsgiref.util import setup_testing_defaults
+
+# request headers of the warm-up requests, as sent by browsers
+HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+
+# longest wait for a response of 202 Accepted to complete, in seconds
+MAX_WAIT = 600
+
+
+def wsgi_get(app, path, headers=None):
+    """
+    Calls the WSGI application `app` with a GET request for `path`, which
+    may have a query string. Returns the status code, the response headers
+    and the body.
+    """
+    path, _, query = path.partition('?')
+    environ = {'REQUEST_METHOD': 'GET',
+               'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+               'QUERY_STRING': query}
+    for name, value in (headers or dict()).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    setup_testing_defaults(environ)
+
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+        return lambda data: None
+
+    result = app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    status, headers = started
+    return int(status.split()[0]), dict(headers), body
+
+
+class WarmUp(object):
+    """ Warm-up requests for the paths in `paths`, and their progress. """
+
+    def __init__(self, paths, headers=HEADERS):
+        self.paths = list(paths)
+        self.headers = headers
+        self.done = 0
+        self.errors = []
+        self.started = None
+        self.finished = None
+
+    @property
+    def complete(self):
+        return self.finished is not None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.
+        return (self.finished or timer()) - self.started
+
+    def run(self, app):
+        """
+        Requests every path from `app`. Failed requests are recorded in
+        `errors` rather than raised.
+        """
+        self.started = timer()
+        for path in self.paths:
+            try:
+                status, headers, _ = wsgi_get(app, path, self.headers)
+                deadline = timer() + MAX_WAIT
+                while status == 202 and timer() < deadline:
+                    time.sleep(float(headers.get('Retry-After', 1)))
+                    status, headers, _ = wsgi_get(app, path, self.headers)
+                if status >= 400 or status == 202:
+                    self.errors.append(u'{0}: {1}'.format(path, status))
+            except Exception as e:
+                self.errors.append(u'{0}: {1}: {2}'.format(
+                    path, type(e).__name__, e))
+            self.done += 1
+        self.finished = timer()
+
+        print("Warmed up with {0} requests in {1:.2f}s ({2} errors)".format(
+            self.done, self.elapsed, len(self.errors)))
+        for error in self.errors:
+            print("Warm-up request failed:", error)
+
+    def to_dict(self):
+        return OrderedDict([('done', self.done),
+                            ('total', len(self.paths)),
+                            ('elapsed', round(self.elapsed, 3)),
+                            ('errors', self.errors)])
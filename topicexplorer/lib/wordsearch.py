@@ -0,0 +1,107 @@
+"""
+topicexplorer.lib.wordsearch contains a search engine that ranks the topics of
+every model by their distance to a set of query words.
+
+`LdaCgsViewer.dist_word_top` builds a pseudo-topic that puts a mass of one on
+each query word, renormalizes `word_top` and computes the Jensen-Shannon
+distance to every topic. For a topic with word probabilities `q`, that distance
+reduces to a sum over the query words only::
+
+    JS(S, q) = .5 * (1 + sum(f(q[w]) for w in S))
+    f(x) = -log2((1 + x) / 2) - x + x * log2(2x / (1 + x))
+
+so the whole search is a gather of the query rows from a matrix holding the
+normalized topics of every model side by side, followed by a single sum.
+"""
+from __future__ import division
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import numpy as np
+
+
+def word_dist(phi):
+    """
+    Returns the Jensen-Shannon distances between the pseudo-topic of a set of
+    words and topics, given the rows `phi` of those words in the normalized
+    word-topic matrix. Identical to `vsm.spatial.JS_dist(top, phi)` where
+    `top` is the indicator of the words.
+    """
+    q = np.asarray(phi, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        qlogq = np.where(q > 0, q * np.log2(2 * q / (1 + q)), 0.)
+    terms = -np.log2((1 + q) / 2) - q + qlogq
+    js = .5 * (1 + terms.sum(axis=0))
+    return np.sqrt(np.maximum(js, 0.))
+
+
+class WordSearch(object):
+    """
+    The normalized topics of several models, stacked column-wise into a single
+    V x sum(K) matrix so that the rows of the query words are contiguous.
+    Probabilities are stored in single precision to halve the memory of the
+    copy; distances are computed in double precision.
+
+    If `stack` is false, no copy is made and the rows of the query words are
+    gathered from the `phi` of each model on every search instead. Meant for
+    memory-mapped models, whose pages are shared between processes.
+    """
+
+    def __init__(self, viewers, stack=True):
+        ks = sorted(viewers)
+        V = viewers[ks[0]].phi.shape[0] if ks else 0
+
+        self.k = np.repeat(ks, ks).astype(np.int64)
+        self.topics = np.concatenate(
+            [np.arange(k) for k in ks] or [[]]).astype(np.int64)
+
+        if stack:
+            self.phi = np.empty((V, sum(ks)), dtype=np.float32)
+            self.phis = None
+        else:
+            self.phi = None
+            self.phis = dict((k, viewers[k].phi) for k in ks)
+
+        # first column of each model
+        self.start = dict()
+        start = 0
+        for k in ks:
+            self.start[k] = start
+            if stack:
+                self.phi[:, start:start + k] = viewers[k].phi
+            start += k
+
+    def rows(self, words, k=None):
+        """
+        Returns the rows of the words at indices `words` for every topic, or
+        for the topics of model `k` only.
+        """
+        if self.phi is not None:
+            if k is None:
+                return self.phi[words]
+            start = self.start[k]
+            return self.phi[words, start:start + k]
+
+        ks = sorted(self.phis) if k is None else [k]
+        return np.hstack([self.phis[key][words].astype(np.float32)
+                          for key in ks] or [np.empty((len(words), 0))])
+
+    def distances(self, words, k=None):
+        """
+        Returns the distance from the words at indices `words` to every
+        topic, in the order of `self.k` and `self.topics`, or to the topics
+        of model `k` only.
+        """
+        return word_dist(self.rows(np.unique(words), k=k))
+
+    def rank(self, words):
+        """
+        Returns arrays of the number of topics, topic index and distance of
+        every topic, sorted by increasing distance to the words at indices
+        `words`. Topics with undefined distances are left out.
+        """
+        dists = self.distances(words)
+        order = np.argsort(dists, kind='mergesort')
+        order = order[~np.isnan(dists[order])]
+        return self.k[order], self.topics[order], dists[order]
@@ -0,0 +1,45 @@
+"""
+Compresses the static files of the server ahead of time into the
+``static_cache`` directory of a config file, which `topicexplorer launch`
+serves them from when ``compress = True`` is set in the ``[www]`` section.
+See :mod:`topicexplorer.lib.compression`.
+"""
+from __future__ import print_function
+from future import standard_library
+standard_library.install_aliases()
+
+import os.path
+
+import topicexplorer.config
+from topicexplorer.lib import compression
+from topicexplorer.lib.util import get_static_resource_path, is_valid_configfile
+
+
+def main(args):
+    config = topicexplorer.config.read(args.config_file)
+    corpus_file = config.get('main', 'corpus_file')
+    static_cache = config.get('www', 'static_cache') or \
+        os.path.splitext(corpus_file)[0] + '.static'
+
+    root = get_static_resource_path('www/')
+    print("Compressing the static files of", root, "into", static_cache)
+    written = compression.precompress(root, static_cache)
+    print("Wrote {0} compressed files".format(written))
+
+    if not config.getboolean('www', 'compress'):
+        print("Set `compress = True` in the [www] section of {0} to serve "
+              "the compressed files.".format(args.config_file))
+
+
+def populate_parser(parser):
+    parser.add_argument('config_file', help="Path to Config",
+                        type=lambda x: is_valid_configfile(parser, x))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    populate_parser(parser)
+    args = parser.parse_args()
+
+    main(args)
@@ -115,12 +115,158 @@ By default, ``topicexplorer launch`` will open the server instance in the
 default browser. With ``--no-browser``, only the server daemon will run.
 
 
+Warm-up (``--warm-up``)
+-------------------------
+Runs the warm-up before the server starts, as with ``warm_up`` in the config
+file.
+
+
 Quiet Mode (``-q``)
 ---------------------
 Suppresses all user input requests. Uses default values unless otherwise
 specified by other argument flags. Very useful for scripting automated
 pipelines.
 
+
+Configuration Options
+=======================
+The following options may be set in the ``[www]`` section of the config file.
+
+Neighbor Index (``neighbor_index``)
+-------------------------------------
+Builds an approximate nearest-neighbor index over the document-topic
+distributions of each model, which answers hypershelf requests without
+comparing the focal document to every document in the corpus. The index is
+saved next to each model file and rebuilt when the model changes. Without the
+index, every request uses the exact scan.
+
+**Default:** ``False``
+
+Lazy Models (``lazy_models``)
+-------------------------------
+Loads each model on the first request for it, rather than loading every
+model at launch. Shortens startup with many models on a large corpus. Word
+searches across models (``/topics.json?q=``) rank the topics of the models in
+memory only.
+
+**Default:** ``False``
+
+Model Memory (``model_memory``)
+---------------------------------
+With ``lazy_models``, the memory budget for loaded models, in megabytes. When
+the estimated size of the loaded models exceeds the budget, the least recently
+used models are unloaded until it is met again; an unloaded model is loaded
+again on its next request. ``0`` means no limit.
+
+**Default:** ``0``
+
+Memory-Mapped Models (``mmap``)
+---------------------------------
+Opens the corpus metadata and model matrices from the uncompressed stores
+written by ``topicexplorer convert`` instead of reading them into memory.
+Every server process serving the same files then shares a single copy, and
+the estimated size of a memory-mapped model does not count towards
+``model_memory``. Files without an up-to-date store are loaded as usual.
+
+**Default:** ``False``
+
+Compression (``compress``)
+-----------------------------
+Compresses responses with gzip, or with brotli when the ``brotli`` package is
+installed, for clients that accept them. Static files are served from the
+copies in ``static_cache``, when there are any, and compressed responses with
+an ETag are kept in memory, so repeated requests are not compressed again.
+
+**Default:** ``True``
+
+Static Cache (``static_cache``)
+---------------------------------
+The directory of the compressed copies of the static files, written by
+``topicexplorer precompress CONFIG``. The server only reads it; static files
+without an up-to-date copy are sent uncompressed.
+
+**Default:** the corpus file name, with the extension ``.static``
+
+Response Cache (``response_cache``)
+-------------------------------------
+Where the serialized responses of the hypershelf and topic routes are cached,
+so that identical requests are computed once: ``memory`` for a cache in each
+server process, ``sqlite`` for a cache in a SQLite database shared by every
+process, or ``none``. Entries are keyed by the model fingerprint and the
+document label table, so changed models and labels are never served from the
+cache. Hits, misses and evictions are reported at ``/cache.json``.
+
+**Default:** ``memory``
+
+Response Cache Size (``response_cache_size``)
+-----------------------------------------------
+The size of the response cache, in megabytes. The least recently used
+responses are evicted to stay within it.
+
+**Default:** ``64``
+
+Response Cache File (``response_cache_file``)
+-----------------------------------------------
+The database of the ``sqlite`` response cache.
+
+**Default:** the corpus file name, with the extension ``.responses.sqlite``
+
+Metrics (``metrics``)
+-----------------------
+Records the number of requests by route and status, the latency of each
+route, the requests in flight, the response cache counters and the model
+load times, and serves them at ``/metrics`` in the Prometheus text format.
+With ``--workers``, each scrape is answered by one worker with its own
+counts.
+
+**Default:** ``True``
+
+Warm-up (``warm_up``)
+-----------------------
+Before the server accepts connections, requests a sample of every route: for
+each model, the topics, the documents of a random topic, the hypershelf and
+similar documents of a random document and the documents of one of its top
+words, then a word search, a document search, the pages and the cluster data,
+waiting for the clusters to be computed if they are missing. The first
+visitors then find the models paged in and the indexes and caches built. The
+warm-up requests are not counted in ``/metrics``.
+
+``/healthz`` answers as soon as the server accepts connections, and
+``/readyz`` reports the loaded models and the progress of the warm-up.
+``topicexplorer launch`` only binds its port once the warm-up is complete,
+so that ``--workers`` are forked with the models already paged in; until
+then, connections are refused rather than answered with ``503``. The
+``503`` answers of ``/readyz`` are seen under ``app.wsgi``, whose corpora
+in ``TOPICEXPLORER_PRELOAD`` load in the background.
+
+**Default:** ``False``
+
+Model Reload (``reload_interval``)
+------------------------------------
+Checks the config file and the model files every ``reload_interval`` seconds
+and, once a change has settled, such as the new ``model_pattern`` written by
+``topicexplorer train --continue``, loads the new models while the old ones
+keep serving. The new models then replace the old ones at once: requests in
+progress finish with the models they started with, ETags change with the
+model fingerprints, and the indexes and caches of the old models are freed.
+Memory holds both versions during the reload. With ``--workers``, the
+checks start once the workers are forked, and a change sends ``SIGHUP`` to
+the parent process, which reloads the models in its main thread and
+restarts the workers one at a time from the reloaded process. Sending
+``SIGHUP`` by hand reloads the same way.
+``/readyz`` reports the version of the models, counting the reloads. ``0``
+disables reloading.
+
+**Default:** ``0``
+
+Template Reload (``template_reload``)
+---------------------------------------
+Checks the HTML templates for changes on every page view and re-renders the
+page when they are edited. Useful while developing templates. Otherwise each
+template is read once and every page is rendered once.
+
+**Default:** ``False``
+
 """
 
 from __future__ import print_function
@@ -131,9 +277,12 @@ from builtins import str as text
 
 import ast
 from codecs import open
+from collections import OrderedDict
 from configparser import RawConfigParser as ConfigParser, NoOptionError
+from contextlib import contextmanager
 import csv
 from datetime import datetime, timedelta
+from email.utils import formatdate
 from functools import partial
 import hashlib
 from importlib import import_module
@@ -141,19 +290,43 @@ from io import BytesIO,StringIO
 import json
 import itertools
 import math
+import mimetypes
 import os.path
 from pkg_resources import resource_filename
-import re
+import signal
 import socket
 import sys
 import threading
-from urllib.parse import unquote
+from timeit import default_timer as timer
+from urllib.parse import quote, unquote
+import weakref
 import webbrowser
 
 from bottle import (abort, redirect, request, response, route, run, 
-                    static_file, Bottle, ServerAdapter)
+                    static_file, parse_date, parse_range_header, Bottle,
+                    HTTPError, HTTPResponse, ServerAdapter)
 import topicexplorer.config
-from topicexplorer.lib.color import get_topic_colors, rgb2hex
+from topicexplorer.lib import cache
+from topicexplorer.lib.color import rgb2hex, topic_colors
+from topicexplorer.lib import compression
+from topicexplorer.lib.dispatch import SharedObjects
+from topicexplorer.lib.fingerprint import file_digest
+from topicexplorer.lib.fulltext import Manifest, RangeFile
+from topicexplorer.lib import formats
+from topicexplorer.lib import infer as infer_lib
+from topicexplorer.lib import jobs
+from topicexplorer.lib import mmapstore
+from topicexplorer.lib.labels import (LabelIndex, LabelSearch, build_labels,
+                                      load_or_build_labels, table_key,
+                                      table_name)
+from topicexplorer.lib import metrics as metrics_lib
+import topicexplorer.lib.neighbors
+from topicexplorer.lib.reload import Models, Watcher
+import topicexplorer.lib.topicindex
+from topicexplorer.lib.viewers import ViewerCache
+from topicexplorer.lib.warmup import WarmUp
+from topicexplorer.lib.vocab import Vocabulary
+from topicexplorer.lib.wordsearch import WordSearch
 from topicexplorer.lib.util import (int_prompt, bool_prompt, is_valid_filepath,
     is_valid_configfile, get_static_resource_path)
 
@@ -169,6 +342,24 @@ __all__ = ['populate_parser', 'main', '_set_acao_headers', 'Application']
 
 token = ['default']
 
+# number of words per topic kept by the top-words table
+TOP_WORDS = 100
+# number of serialized /<k>/topics.json responses kept in memory
+TOPICS_JSON_CACHE_SIZE = 32
+# number of serialized /topics.json?q= responses kept in memory
+WORD_TOPICS_CACHE_SIZE = 256
+# bytes of compressed responses kept in memory
+COMPRESSED_CACHE_BYTES = 32 * 2**20
+# seconds that clients may reuse a fulltext file before revalidating it
+FULLTEXT_MAX_AGE = 24 * 60 * 60
+# most texts folded in by one /<k>/infer request
+INFER_MAX_TEXTS = 1000
+# most similar documents returned for each text by /<k>/infer
+INFER_MAX_SIMILAR = 100
+
+# corpora and their tables, shared by the applications of a process
+shared_objects = SharedObjects()
+
 def _set_acao_headers(f):
     """
     Decorator to set Access-Control-Allow-Origin headers to enable cross-InPhO
@@ -191,18 +382,140 @@ def _set_acao_headers(f):
         return f(*args, **kwargs)
     return set_header
 
-def _generate_etag(v):
-    ''' Takes a model view and generates an etag using the v.phi and v.theta attributes '''
-    # TODO: write a function using a hashlib digest
-    x = hashlib.sha1(usedforsecurity=False)
-    x.update(repr(v.phi).encode('utf-8'))
-    x.update(repr(v.theta).encode('utf-8'))
-    return x.hexdigest()
+def _compress_response(f):
+    """
+    Decorator to compress a response with the encoding negotiated from the
+    `Accept-Encoding` header, if the application has compression enabled.
+    """
+    def compress_response(*args, **kwargs):
+        return request.app.compress_response(f(*args, **kwargs))
+    return compress_response
 
-def _docs_etag(c):
-    x = hashlib.sha1(usedforsecurity=False)
-    x.update(repr(c).encode('utf-8'))
-    return x.hexdigest()
+def _static_file(filename, root, cache_dir=None, **kwargs):
+    """
+    Helper function to return a static file, or its precompressed copy in
+    `cache_dir` in the encoding negotiated from the `Accept-Encoding` header.
+    """
+    path = os.path.join(root, filename.strip('/\\'))
+    encoding = None
+    if cache_dir and path.endswith(compression.COMPRESSIBLE_EXTENSIONS):
+        encoding = compression.negotiate(
+            request.get_header('Accept-Encoding'))
+    if encoding and compression.compressed_path(path, encoding, root,
+                                                cache_dir):
+        mimetype = mimetypes.guess_type(path)[0] or 'auto'
+        resp = static_file(filename + compression.ENCODINGS[encoding],
+                           root=cache_dir, mimetype=mimetype, **kwargs)
+        resp.set_header('Content-Encoding', encoding)
+    else:
+        resp = static_file(filename, root=root, **kwargs)
+    if cache_dir and path.endswith(compression.COMPRESSIBLE_EXTENSIONS):
+        resp.add_header('Vary', 'Accept-Encoding')
+    return resp
+
+def _send_file(path, max_age=FULLTEXT_MAX_AGE):
+    """
+    Helper function to return the file at `path`, with an ETag and cache
+    headers from its modification time and size. Answers conditional and
+    Range requests, and hands the open file to the server's
+    `wsgi.file_wrapper` rather than reading it.
+    """
+    stats = os.stat(path)
+    etag = '{0:x}-{1:x}'.format(int(stats.st_mtime * 1000), stats.st_size)
+    last_modified = formatdate(stats.st_mtime, usegmt=True)
+    mimetype, encoding = mimetypes.guess_type(path)
+    mimetype = mimetype or 'application/octet-stream'
+    if mimetype.startswith('text/'):
+        mimetype += '; charset=UTF-8'
+    headers = {'Content-Type': mimetype,
+               'ETag': etag,
+               'Last-Modified': last_modified,
+               'Cache-Control': 'public, max-age={0}'.format(max_age),
+               'Accept-Ranges': 'bytes'}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    # Check for an "If-None-Match" tag, or else an "If-Modified-Since" date
+    if request.get_header('If-None-Match'):
+        if request.get_header('If-None-Match') == etag:
+            return HTTPResponse(status=304, **headers)
+    else:
+        modified_since = parse_date(
+            request.get_header('If-Modified-Since', '').split(';')[0].strip())
+        if modified_since and modified_since >= int(stats.st_mtime):
+            return HTTPResponse(status=304, **headers)
+
+    # a Range applies only if the file is the one named by "If-Range"
+    start, end, status = 0, stats.st_size, 200
+    if_range = request.get_header('If-Range')
+    if request.get_header('Range') and if_range in (None, etag, last_modified):
+        ranges = list(parse_range_header(request.get_header('Range'),
+                                         stats.st_size))
+        if not ranges:
+            error = HTTPError(416, "Requested Range Not Satisfiable")
+            error.set_header('Content-Range', 'bytes */{0}'.format(stats.st_size))
+            return error
+        start, end = ranges[0]
+        status = 206
+        headers['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+            start, end - 1, stats.st_size)
+    headers['Content-Length'] = str(end - start)
+
+    body = ''
+    if request.method != 'HEAD':
+        body = RangeFile(open(path, 'rb'), start, end)
+    return HTTPResponse(body, status=status, **headers)
+
+def _response_format(default='json'):
+    """
+    Helper function to return the format of a data response, requested with
+    the `format` parameter or the `Accept` header, or `default`, the text
+    format of the route. Raises a `ValueError` if the format cannot be
+    produced.
+    """
+    response.add_header('Vary', 'Accept')
+    if request.params.format.lower() == default:
+        return default
+    return formats.negotiate(request.params.format,
+                             request.get_header('Accept'), default)
+
+def _format_etag(etag, fmt, default='json'):
+    """
+    Helper function to return the ETag of a response in format `fmt`, for a
+    route whose text format is `default`.
+    """
+    return etag if fmt == default else '{0}-{1}'.format(etag, fmt)
+
+def _table_response(fmt, table):
+    """
+    Helper function to return a table encoded in the binary format `fmt`.
+    """
+    response.content_type = formats.MEDIA_TYPES[fmt]
+    return formats.encode(fmt, table)
+
+def get_tokenizer(name):
+    """ Returns the tokenizer function of the `tokenizer` option `name`. """
+    if name == 'default':
+        from vsm.extensions.corpusbuilders.util import word_tokenize
+        return word_tokenize
+    elif name == 'simple':
+        from topicexplorer.tokenizer import simple_tokenizer
+        return simple_tokenizer
+    elif name == 'zh':
+        from topicexplorer.lib.chinese import modern_chinese_tokenizer
+        return modern_chinese_tokenizer
+    elif name == 'ltc' or name == 'och':
+        from topicexplorer.lib.chinese import ancient_chinese_tokenizer
+        return ancient_chinese_tokenizer
+    elif name == 'inpho':
+        from topicexplorer.extensions.inpho import inpho_tokenizer
+        return inpho_tokenizer
+    elif name == 'brain':
+        from hyperbrain.parse import brain_tokenizer
+        return brain_tokenizer
+    else:
+        raise NotImplementedError(
+            "Tokenizer '{}' is not included in topicexplorer".format(name))
 
 def _cache_date(days=0, seconds=120):
     """
@@ -212,6 +525,20 @@ def _cache_date(days=0, seconds=120):
     return time.strftime("%a, %d %b %Y %I:%M:%S GMT")
 
 
+def _models_attribute(name):
+    """
+    Returns a property for the attribute `name` of the models of the current
+    request, which is kept when the models are reloaded during the request.
+    """
+    def get(self):
+        return getattr(self.models, name)
+
+    def set(self, value):
+        setattr(self.models, name, value)
+
+    return property(get, set)
+
+
 class Application(Bottle):
     """
     This is the primary Bottle application for the Topic Explorer.
@@ -219,32 +546,94 @@ class Application(Bottle):
     have multiple LDA model objects.
     """
 
+    # the state of the models, replaced as a whole by `reload`
+    v = _models_attribute('v')
+    model_pattern = _models_attribute('model_pattern')
+    topic_range = _models_attribute('topic_range')
+    cluster_path = _models_attribute('cluster_path')
+    model_load_time = _models_attribute('model_load_time')
+    colors = _models_attribute('colors')
+    fingerprints = _models_attribute('fingerprints')
+    neighbors = _models_attribute('neighbors')
+    topic_indexes = _models_attribute('topic_indexes')
+    top_words = _models_attribute('top_words')
+    _topics_json = _models_attribute('topics_json')
+    _word_topics_json = _models_attribute('word_topics_json')
+    _word_search = _models_attribute('word_search')
+
     def __init__(self, corpus_file='', model_pattern='', topic_range=None,
                  context_type='', label_module=None, config_file='',
                  fulltext=False, corpus_path='', tokenizer='default',
-                 label_file=None, **kwargs):
+                 label_file=None, neighbor_index=False, template_reload=False,
+                 lazy_models=False, model_memory=None, mmap=False,
+                 compress=True, static_cache=None, response_cache='memory',
+                 response_cache_size=64 * 2**20, response_cache_file=None,
+                 metrics=True, label_processes=1, **kwargs):
         super(Application, self).__init__()
 
+        self.launched = timer()
+        self.warmup = None
         self.config_file = config_file
+        self.jobs = jobs.JobRunner()
+
+        # models of the requests in progress in each thread
+        self._models = Models(model_pattern, topic_range,
+                              cluster_path=kwargs.get('cluster_path'))
+        self._pinned = threading.local()
+        self._reload_lock = threading.Lock()
+        self.install(self._pin_models)
+        self.watcher = None
+
+        # compressed static files and responses
+        self.compress = compress
+        self._compressed = OrderedDict()
+        self._compressed_bytes = 0
+        self._compressed_lock = threading.Lock()
+        self.static_cache = None
+        if compress:
+            self.static_cache = static_cache or \
+                os.path.splitext(corpus_file)[0] + '.static'
 
         # setup routes
         self.renderer = pystache.Renderer(escape=lambda u: u,
             string_encoding='utf8')
         self.icons = kwargs.get('icons', 'link')
+        self.template_reload = template_reload
+        self.templates = dict()
+        self.pages = dict()
         if fulltext:
             self._serve_fulltext(corpus_path)
         self._setup_routes(**kwargs)
 
+        # request metrics, exported at /metrics
+        self.metrics = None
+        if metrics:
+            self.metrics = metrics_lib.Metrics()
+            self.metrics.add_collector(self._collect_metrics)
+            self.install(metrics_lib.MetricsPlugin(self.metrics))
+
         # load corpus
         self.context_type = context_type
         self.label_name = self.context_type + '_label'
         self._load_label_module(label_module, config_file)
+        self.mmap = mmap
         self._load_corpus(corpus_file)
+        self._load_label_table(corpus_file, label_processes)
+
+        # cache of serialized responses, or a cache object given directly
+        if response_cache is None or isinstance(response_cache, (str, text)):
+            response_cache = cache.open_cache(
+                response_cache, response_cache_size, response_cache_file or
+                os.path.splitext(corpus_file)[0] + '.responses.sqlite')
+        self.response_cache = response_cache
 
         # load viewers
-        self.v = dict()
-        self.topic_range = topic_range
-        self.colors = dict()
+        self.neighbor_index = neighbor_index
+        self._topic_index_lock = threading.Lock()
+        self._top_words_lock = threading.Lock()
+        self._word_search_lock = threading.Lock()
+        self.lazy_models = lazy_models
+        self.model_memory = model_memory
         self._load_viewers(model_pattern)
         
         self.label_file = label_file
@@ -260,10 +649,12 @@ class Application(Bottle):
             pass
 
         try:
-            self.label = label_module.label
+            self.label_fn = label_module.label
+            self.label_module = label_module
             print("imported label function")
         except (AttributeError, UnboundLocalError):
-            self.label = lambda x: x
+            self.label_fn = lambda x: x
+            self.label_module = None
             print("using default label function")
 
         try:
@@ -274,26 +665,285 @@ class Application(Bottle):
             print("using default id function")
 
     def _load_corpus(self, corpus_file):
-        self.c = Corpus.load(corpus_file, load_corpus=False)
+        self.corpus_fingerprint = file_digest(corpus_file)
+
+        # applications in one process, as in app.wsgi, share identical
+        # corpora and the tables derived from them
+        fingerprint = self.corpus_fingerprint
+        self.c = None
+        if self.mmap:
+            self.c = shared_objects.get(
+                ('corpus', fingerprint, 'mmap'),
+                partial(mmapstore.load_corpus, corpus_file, fingerprint), self)
+            if self.c is None:
+                print("No memory-mapped store for {0}, run `topicexplorer "
+                      "convert {1}`".format(corpus_file, self.config_file))
+        if self.c is None:
+            self.c = shared_objects.get(
+                ('corpus', fingerprint),
+                partial(Corpus.load, corpus_file, load_corpus=False), self)
         self.labels = self.c.view_metadata(self.context_type)[self.label_name]
+        self.label_index = shared_objects.get(
+            ('label_index', fingerprint, self.label_name),
+            partial(LabelIndex, self.labels), self)
+        self.vocab = shared_objects.get(
+            ('vocab', fingerprint),
+            partial(Vocabulary, self.c.words, self.c.stopped_words), self)
+        self._label_search = None
+        self._label_search_lock = threading.Lock()
+
+    def _load_label_table(self, corpus_file, processes=1):
+        """
+        Computes the display label of every document once, in metadata
+        order, with `label(doc)` in `processes` worker processes. Label
+        modules may provide a batch `labels(docs)` function, and list in
+        `label_files` the files their labels are read from. The table of a
+        label module is saved next to the corpus file by
+        ``topicexplorer convert``, or by the first launch.
+        """
+        if self.label_module is None:
+            self.label_table = self.labels
+            self.label_table_key = ''
+            return
+
+        name = table_name(self.label_module, self.context_type)
+        key = table_key(self.corpus_fingerprint, name,
+                        getattr(self.label_module, 'label_files', []))
+        self.label_table_key = key
+
+        build = partial(build_labels, self.labels, self.label_fn,
+                        getattr(self.label_module, 'labels', None), processes)
+        self.label_table = shared_objects.get(
+            ('label_table', key),
+            partial(load_or_build_labels, corpus_file, name, key,
+                    len(self.labels), build), self)
+
+    def label(self, doc):
+        """ Returns the display label of the document `doc`. """
+        try:
+            return self.label_table[self.label_index[doc]]
+        except KeyError:
+            return self.label_fn(doc)
 
     def _load_viewers(self, model_pattern):
         self.id_fn = lambda md: md[self.label_name]
         for k in self.topic_range:
-            m = LDA.load(model_pattern.format(k))
-            self.v[k] = LDAViewer(self.c, m)
-            self.colors[k] = dict(get_topic_colors(self.v[k]))
-            self.v[k].dist_doc_doc = partial(
-                self.v[k].dist_doc_doc, label_fn=self.id_fn)
-            self.v[k].dist_top_doc = partial(
-                self.v[k].dist_top_doc, label_fn=self.id_fn)
+            if k not in self.fingerprints:
+                self.fingerprints[k] = file_digest(model_pattern.format(k))
+            self.colors[k] = dict(topic_colors(k))
+
+        if self.lazy_models:
+            # models are loaded and unloaded with the models they belong to
+            models = self.models
+            self.v = ViewerCache(self.topic_range,
+                                 partial(self._with_models, models,
+                                         self._load_viewer),
+                                 budget=self.model_memory,
+                                 on_evict=partial(self._with_models, models,
+                                                  self._unload_viewer))
+        else:
+            for k in self.topic_range:
+                self.v[k] = self._load_viewer(k)
+            self._word_search = WordSearch(self.v, stack=not self.mmap)
+
+    def _load_viewer(self, k):
+        """ Loads the model with `k` topics and returns its viewer. """
+        model_file = self.model_pattern.format(k)
+        start = timer()
+        viewer = None
+        if self.mmap:
+            viewer = mmapstore.load_viewer(self.c, model_file,
+                                           self.fingerprints[k])
+            if viewer is None:
+                print("No memory-mapped store for {0}, run `topicexplorer "
+                      "convert {1}`".format(model_file, self.config_file))
+        if viewer is None:
+            viewer = LDAViewer(self.c, LDA.load(model_file))
+        viewer.dist_doc_doc = partial(viewer.dist_doc_doc, label_fn=self.id_fn)
+        viewer.dist_top_doc = partial(viewer.dist_top_doc, label_fn=self.id_fn)
+        if self.neighbor_index:
+            self.neighbors[k] = topicexplorer.lib.neighbors.load_or_build(
+                model_file, viewer.theta,
+                self.fingerprints[k])
+        self.model_load_time[k] = timer() - start
+        return viewer
+
+    def _unload_viewer(self, k):
+        """ Releases the indexes that hold on to the matrices of model `k`. """
+        # no locks: eviction can run while a lock is held for a lazy load
+        self.neighbors.pop(k, None)
+        self.topic_indexes.pop(k, None)
+
+    @property
+    def models(self):
+        """
+        The models of the request in progress in this thread, or else the
+        models being served.
+        """
+        return getattr(self._pinned, 'models', None) or self._models
+
+    @contextmanager
+    def pinned(self, models=None):
+        """
+        Context in which this thread uses `models`, by default the models
+        being served, even if they are reloaded.
+        """
+        previous = getattr(self._pinned, 'models', None)
+        self._pinned.models = models or self.models
+        try:
+            yield self._pinned.models
+        finally:
+            self._pinned.models = previous
+
+    def _with_models(self, models, f, *args):
+        with self.pinned(models):
+            return f(*args)
+
+    def _pin_models(self, callback):
+        """
+        Plugin serving each request with the models it started with, so that
+        a reload does not change them in the middle of a request.
+        """
+        def pinned_callback(*args, **kwargs):
+            with self.pinned():
+                return callback(*args, **kwargs)
+        return pinned_callback
+
+    def reload(self, model_pattern=None, topic_range=None, cluster_path=None):
+        """
+        Loads the models matching `model_pattern` for the numbers of topics
+        in `topic_range`, by default the current ones, and swaps them for the
+        models being served if they changed. The new models are loaded before
+        the swap, while the old ones keep serving; requests in flight finish
+        with the models they started with. Returns whether the models were
+        swapped.
+        """
+        with self._reload_lock:
+            current = self._models
+            model_pattern = model_pattern or current.model_pattern
+            topic_range = list(topic_range or current.topic_range)
+            fingerprints = dict((k, file_digest(model_pattern.format(k)))
+                                for k in topic_range)
+            if (model_pattern == current.model_pattern and
+                    topic_range == list(current.topic_range) and
+                    fingerprints == current.fingerprints):
+                return False
+
+            start = timer()
+            models = Models(model_pattern, topic_range,
+                            cluster_path=cluster_path,
+                            version=current.version + 1)
+            models.fingerprints.update(fingerprints)
+            with self.pinned(models):
+                self._load_viewers(model_pattern)
+
+            self._models = models
+            # clusters are computed from the models
+            job = self.jobs.get('cluster')
+            if job is not None:
+                self.jobs.remove(job)
+            print("Reloaded models {0} for k = {1} in {2:.2f}s "
+                  "(version {3})".format(model_pattern, topic_range,
+                                         timer() - start, models.version))
+        return True
+
+    def reload_changed(self):
+        """
+        Reloads the models named in the config file, or the current models
+        without one. Returns whether the models were swapped.
+        """
+        if self.config_file:
+            return self.reload_config()
+        return self.reload()
+
+    def reload_config(self):
+        """ Reloads the models named in the config file. """
+        config = topicexplorer.config.read(self.config_file)
+        topic_range = None
+        if config.get('main', 'topics'):
+            topic_range = ast.literal_eval(config.get('main', 'topics'))
+        return self.reload(config.get('main', 'model_pattern'), topic_range,
+                           config.get('main', 'cluster'))
+
+    def watch(self, interval, on_change=None):
+        """
+        Reloads the models when the config file or the model files change,
+        checking them every `interval` seconds. `on_change()` is called
+        instead of reloading if given.
+        """
+        # the watcher does not keep the application alive, as unmounted
+        # applications of app.wsgi must be freed
+        ref = weakref.ref(self)
+
+        def paths():
+            app = ref()
+            if app is None:
+                return []
+            files = [app._models.model_pattern.format(k)
+                     for k in app._models.topic_range]
+            return [app.config_file] + files if app.config_file else files
+
+        def reload():
+            app = ref()
+            if app is not None:
+                app.reload_changed()
+
+        watcher = Watcher(paths, on_change or reload, interval)
+        watcher.owner = weakref.ref(self, lambda _: watcher.stop())
+        watcher.start()
+        self.watcher = watcher
+
+    @property
+    def word_search(self):
+        """
+        Search index over the topics of every model, built at launch. When
+        models are loaded lazily, a search over the models in memory that
+        reads their `phi` in place, so that it neither loads models nor holds
+        memory outside of the budget.
+        """
+        if self.lazy_models:
+            return WordSearch(self.v.loaded_viewers(), stack=False)
+
+        with self._word_search_lock:
+            if self._word_search is None:
+                self._word_search = WordSearch(self.v, stack=not self.mmap)
+        return self._word_search
+
+    def _load_template(self, page):
+        """
+        Returns the parsed mustache template for `www/<page>`. Templates are
+        read and parsed on first use. If `template_reload` is set, a template
+        is parsed again whenever its file changes.
+        """
+        cached = self.templates.get(page)
+        if cached is not None and not self.template_reload:
+            return cached[2]
+
+        filename = get_static_resource_path('www/' + page)
+        mtime = os.path.getmtime(filename)
+        if cached is None or cached[:2] != (filename, mtime):
+            with open(filename, encoding='utf-8') as tmpl_file:
+                cached = (filename, mtime, pystache.parse(tmpl_file.read()))
+            self.templates[page] = cached
+        return cached[2]
 
     def _setup_routes(self, **kwargs):
         @self.route('/<k:int>/doc_topics/<doc_id>')
         @_set_acao_headers
+        @_compress_response
         def doc_topic_csv(k, doc_id):
 
-            etag = _generate_etag(self.v[k])
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            try:
+                fmt = _response_format(default='csv')
+            except ValueError as e:
+                response.status = 406
+                return text(e)
+
+            etag = _format_etag(self.fingerprints[k], fmt, default='csv')
             
             # Check for an "If-None-Match" tag in the header
             if request.get_header('If-None-Match', '') == etag:
@@ -303,16 +953,21 @@ class Application(Bottle):
             response.set_header("Etag", etag)
             #response.set_header('Cache-Control', 'max-age=120')
             
-            if k not in self.topic_range:
-                response.status = 400  # Not Found
-                return "No model for k = {}".format(k)
-
             response.content_type = 'text/csv; charset=UTF8'
 
             try:
-                data = self.v[k].doc_topics(doc_id)
-            except KeyErrror:
-                data = self.v[k].doc_topics(doc_id.decode('utf-8'))
+                data = self.v[k].doc_topics(self.label_index[doc_id])
+            except KeyError:
+                response.status = 404
+                return "Document not found: {}".format(doc_id)
+
+            if fmt == 'json':
+                response.content_type = 'application/json; charset=UTF8'
+                return json.dumps(dict((text(t), float(p)) for t, p in data))
+            elif fmt != 'csv':
+                return _table_response(fmt, OrderedDict(
+                    [('topic', [t for t, _ in data]),
+                     ('prob', [p for _, p in data])]))
 
             if sys.version_info[0] == 3:
                 output = StringIO()
@@ -327,24 +982,26 @@ class Application(Bottle):
 
         @self.route('/<k:int>/docs/<doc_id>')
         @_set_acao_headers
+        @_compress_response
         def doc_csv(k, doc_id, threshold=0.2):
-            etag = _generate_etag(self.v[k])
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            etag = self.fingerprints[k]
 
             if request.get_header('If-None-Match', '') == etag:
                 response.status = 304
                 return "Not Modified"
 
-            if k not in self.topic_range:
-                response.status = 400  # Not Found
-                return "No model for k = {}".format(k)
-
             response.set_header('Etag', etag)
             response.content_type = 'text/csv; charset=UTF8'
 
             try:
-                data = self.v[k].dist_doc_doc(doc_id)
+                data = self.v[k].dist_doc_doc(self.label_index[doc_id])
             except KeyError:
-                data = self.v[k].dist_doc_doc(doc_id.decode('utf-8'))
+                response.status = 404
+                return "Document not found: {}".format(doc_id)
 
             if sys.version_info[0] == 3:
                 output = StringIO()
@@ -359,19 +1016,26 @@ class Application(Bottle):
 
         @self.route('/<k:int>/topics/<topic_no:int>.json')
         @_set_acao_headers
+        @_compress_response
         def topic_json(k, topic_no, N=40):
             
-            etag = _generate_etag(self.v[k])
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            try:
+                fmt = _response_format()
+            except ValueError as e:
+                response.status = 406
+                return text(e)
+
+            etag = _format_etag(self.fingerprints[k], fmt)
             
             #Check for an "If-None-Match" in the request
             if request.get_header('If-None-Match', '') == etag:
                 response.status = 304
                 return "Not Modified"
 
-            if k not in self.topic_range:
-                response.status = 400  # Not Found
-                return "No model for k = {}".format(k)
-
             #response.set_header('Cache-Control', 'max-age=120')
             response.set_header('Etag', etag)
 
@@ -381,40 +1045,37 @@ class Application(Bottle):
             except:
                 pass
 
-            if N > 0:
-                data = self.v[k].dist_top_doc([topic_no])[:N]
-            else:
-                data = self.v[k].dist_top_doc([topic_no])[N:]
-                data = reversed(data)
+            def compute():
+                data = self.topic_docs(k, topic_no, N)
+                if fmt != 'json':
+                    return _table_response(fmt, self.doc_topics_table(k, data))
 
-            docs = [doc for doc, prob in data]
-            doc_topics_mat = self.v[k].doc_topics(docs)
-            docs = self.get_docs(docs, id_as_key=True)
+                return json.dumps(self.docs_with_topics(k, data))
 
-            js = []
-            for doc_prob, topics in zip(data, doc_topics_mat):
-                doc, prob = doc_prob
-                struct = docs[doc]
-                struct.update({'prob': float(1 - prob),
-                               'topics': dict([(text(t), float(p)) for t, p in topics])})
-                js.append(struct)
-
-            return json.dumps(js)
+            return self.cached_response('topic_docs', k, fmt,
+                                        {'topic': topic_no, 'n': N}, compute)
 
         @self.route('/<k:int>/docs_topics/<doc_id:path>.json')
         @_set_acao_headers
+        @_compress_response
         def doc_topics(k, doc_id, N=40):
             
-            etag = _generate_etag(self.v[k])
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            try:
+                fmt = _response_format()
+            except ValueError as e:
+                response.status = 406
+                return text(e)
+
+            etag = _format_etag(self.fingerprints[k], fmt)
 
             if request.get_header('If-None-Match', '') == etag:
                 response.status = 304
                 return "Not Modified"
 
-            if k not in self.topic_range:
-                response.status = 400  # Not Found
-                return "No model for k = {}".format(k)
-
             try:
                 N = int(request.query.n)
             except:
@@ -423,191 +1084,230 @@ class Application(Bottle):
             response.set_header('Etag', etag)
             response.content_type = 'application/json; charset=UTF8'
 
+            def compute():
+                try:
+                    data = self.doc_neighbors(k, doc_id, N)
+                except KeyError:
+                    response.status = 404
+                    return "Document not found: {}".format(doc_id)
+                if fmt != 'json':
+                    return _table_response(fmt, self.doc_topics_table(k, data))
+
+                return json.dumps(self.docs_with_topics(k, data))
+
+            return self.cached_response('doc_neighbors', k, fmt,
+                                        {'doc': doc_id, 'n': N}, compute)
+
+        @self.route('/<k:int>/infer', method='POST')
+        @_set_acao_headers
+        @_compress_response
+        def infer(k):
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            # a plain text body, or a JSON object with a text or texts list
             try:
-                if N > 0:
-                    data = self.v[k].dist_doc_doc(doc_id)[:N]
-                else:
-                    data = self.v[k].dist_doc_doc(doc_id)[N:]
-                    data = reversed(data)
-            except KeyError:
-                doc_id = doc_id.decode('utf-8')
-                if N > 0:
-                    data = self.v[k].dist_doc_doc(doc_id)[:N]
-                else:
-                    data = self.v[k].dist_doc_doc(doc_id)[N:]
-                    data = reversed(data)
+                params = request.json
+                if params is None:
+                    params = {'text': request.body.read().decode('utf-8')}
+                if not isinstance(params, dict):
+                    raise ValueError(params)
+                texts = params.get('texts', [params.get('text')])
+                if (not isinstance(texts, list) or not texts or
+                        not all(isinstance(t, text) for t in texts)):
+                    raise ValueError(texts)
+            except (ValueError, UnicodeDecodeError):
+                response.status = 400
+                return "Invalid request: expected a text, or a JSON object " \
+                       "with a text or a texts list"
+            if len(texts) > INFER_MAX_TEXTS:
+                response.status = 413  # Request Entity Too Large
+                return "At most {} texts per request".format(INFER_MAX_TEXTS)
+
+            # number of similar documents of each text
+            N = 10
+            try:
+                N = int(request.query.n)
+            except:
+                pass
+            if not 0 <= N <= INFER_MAX_SIMILAR:
+                response.status = 400
+                return "Invalid number of similar documents: {} " \
+                       "(at most {})".format(N, INFER_MAX_SIMILAR)
 
-            docs = [doc for doc, prob in data]
-            doc_topics_mat = self.v[k].doc_topics(docs)
-            docs = self.get_docs(docs, id_as_key=True)
+            theta, lengths = self.infer(k, texts)
 
             js = []
-            for doc_prob, topics in zip(data, doc_topics_mat):
-                doc, prob = doc_prob
-                struct = docs[doc]
-                struct.update({'prob': float(1 - prob),
-                               'topics': dict([(text(t), float(p)) for t, p in topics])})
+            for topics, length in zip(theta, lengths):
+                struct = {'topics': dict((text(t), float(p))
+                                         for t, p in enumerate(topics)),
+                          'tokens': length}
+                if N > 0:
+                    struct['similar'] = self.docs_with_topics(
+                        k, self.nearest_docs(k, topics, N))
                 js.append(struct)
 
+            response.content_type = 'application/json; charset=UTF8'
+            response.set_header('Cache-Control', 'no-cache')
             return json.dumps(js)
 
         @self.route('/<k:int>/word_docs.json')
         @_set_acao_headers
+        @_compress_response
         def word_docs(k, N=40):
             import numpy as np
 
-            etag = _generate_etag(self.v[k])
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            try:
+                fmt = _response_format()
+            except ValueError as e:
+                response.status = 406
+                return text(e)
+
+            etag = _format_etag(self.fingerprints[k], fmt)
             
             # Check for an 'If-None-Match' tag  
             if request.get_header('If-None-Match', '') == etag:
                 response.status = 304
                 return "Not Modified"
 
-            if k not in self.topic_range:
-                response.status = 400  # Not Found
-                return "No model for k = {}".format(k)
-
             try:
                 N = int(request.query.n)
             except:
                 pass
 
             try:
-                query = request.query.q.lower()
-                if self.c.words.dtype.type == np.string_:
-                    query = query.encode('ascii', 'ignore')
-                
-                query = query.split('|')
+                query = request.query.q.lower().split('|')
             except:
                 raise Exception('Must specify a query')
 
             response.set_header('Etag', etag)
             response.content_type = 'application/json; charset=UTF8'
 
-            query = [word for word in query if word in self.c.words]
+            query, stopped_words, unknown_words = self.vocab.resolve(query)
 
             # abort if there are no terms in the query
             if not query:
                 response.status = 400  # Bad Request
-                return "Search terms not in model"
+                return "Search terms not in model: " + \
+                    ' '.join(stopped_words + unknown_words)
 
-            topics = self.v[k].dist_word_top(query, show_topics=False)
-            data = self.v[k].dist_top_doc(topics['i'],
-                                          weights=(topics['value'].max() - topics['value']))
-
-            if N > 0:
-                data = data[:N]
-            else:
-                data = data[N:]
-                data = reversed(data)
+            def compute():
+                # weight each topic by its similarity to the query
+                dists = self.word_distances(k, query)
+                topics = np.flatnonzero(~np.isnan(dists))
+                weights = np.nanmax(dists) - dists[topics]
+                data = self.v[k].dist_top_doc(topics, weights=weights)
 
-            docs = [doc for doc, prob in data]
-            doc_topics_mat = self.v[k].doc_topics(docs)
-            docs = self.get_docs(docs, id_as_key=True)
+                if N > 0:
+                    data = data[:N]
+                else:
+                    data = list(reversed(data[N:]))
+                if fmt != 'json':
+                    return _table_response(fmt, self.doc_topics_table(k, data))
+
+                return json.dumps(self.docs_with_topics(k, data))
+
+            # the distances only depend on the set of query words
+            words = sorted(set(int(word) for word in query))
+            return self.cached_response('word_docs', k, fmt,
+                                        {'q': words, 'n': N}, compute)
+
+        def get_wordmax():
+            """
+            Returns the number of words per topic requested with `?n=`, or
+            the default for the corpus language.
+            """
+            wordmax = 10  # for alphabetic languages
+            if kwargs.get('lang', None) == 'cn':
+                wordmax = 25  # for ideographic languages
 
-            js = []
-            for doc_prob, topics in zip(data, doc_topics_mat):
-                doc, prob = doc_prob
-                struct = docs[doc]
-                struct.update({'prob': float(1 - prob),
-                               'topics': dict([(text(t), float(p)) for t, p in topics])})
-                js.append(struct)
+            try:
+                wordmax = int(request.query.n)
+            except:
+                pass
 
-            return json.dumps(js)
+            return wordmax
 
         @self.route('/<k:int>/topics.json')
         @_set_acao_headers
+        @_compress_response
         def topics(k):
-            from topicexplorer.lib.color import rgb2hex
-            import numpy as np
+            if k not in self.topic_range:
+                response.status = 400  # Not Found
+                return "No model for k = {}".format(k)
+
+            try:
+                fmt = _response_format()
+            except ValueError as e:
+                response.status = 406
+                return text(e)
 
-            etag = _generate_etag(self.v[k])
+            etag = _format_etag(self.topics_etag(k), fmt)
             # Check if there is a "If-None-Match" ETag in the request
             if request.get_header('If-None-Match', '') == etag:
                 response.status = 304
                 return "Not Modified"
 
-            if k not in self.topic_range:
-                response.status = 400  # Not Found
-                return "No model for k = {}".format(k)
-
             response.content_type = 'application/json; charset=UTF8'
             response.set_header('Expires', _cache_date())
             response.set_header('Cache-Control', 'max-age=120')
             response.set_header('ETag', etag)
 
             # set a parameter for number of words to return
-            wordmax = 10  # for alphabetic languages
-            if kwargs.get('lang', None) == 'cn':
-                wordmax = 25  # for ideographic languages
+            wordmax = get_wordmax()
+            if not 1 <= wordmax <= TOP_WORDS:
+                response.status = 400
+                return "Invalid number of words: {} (at most {})".format(
+                    wordmax, TOP_WORDS)
 
-            # populate word values
-            phi = self.v[k].phi.T
-            idxs = phi.argsort(axis=1)[:,::-1][:,:wordmax]
-            # https://github.com/numpy/numpy/issues/4724
-            idx_hack = np.arange(np.shape(phi)[0])[:,np.newaxis]
-
-            dt = [('Word',self.c.words.dtype),('Prob',phi.dtype)]
-            data = np.zeros(shape=(phi.shape[0], wordmax), dtype=dt)
-            data['Word'] = self.c.words[idxs]
-            data['Prob'] = phi[idx_hack, idxs]
-
-            labels = []
-            if self.label_file:
-                with open(self.label_file) as labels_in:
-                    for label in labels_in:
-                        label = label.strip()
-                        labels.append(label)
-            else:
-                for i, _ in enumerate(data):
-                    labels.append('Topic {}'.format(i))
-
-            js = {}
-            for i, topic in enumerate(data):
-                js[text(i)] = {
-                    "color": rgb2hex(self.colors[k][i]),
-                    'words': dict([(text(w), float(p))
-                                       for w, p in topic[:wordmax]]),
-                    'label' : labels[i]
-                    }
+            if fmt != 'json':
+                return _table_response(fmt, self.topics_table(k, wordmax))
+            return self.topics_json(k, wordmax, lang=kwargs.get('lang', None))
 
-            return json.dumps(js)
+        @self.route('/topics_all.json')
+        @_set_acao_headers
+        @_compress_response
+        def topics_all():
+            etag = self.topics_all_etag()
+            if request.get_header('If-None-Match', '') == etag:
+                response.status = 304
+                return "Not Modified"
+
+            response.content_type = 'application/json; charset=UTF8'
+            response.set_header('Expires', _cache_date())
+            response.set_header('Cache-Control', 'max-age=120')
+            response.set_header('ETag', etag)
+
+            wordmax = get_wordmax()
+            if not 1 <= wordmax <= TOP_WORDS:
+                response.status = 400
+                return "Invalid number of words: {} (at most {})".format(
+                    wordmax, TOP_WORDS)
+
+            return self.topics_all_json(wordmax, lang=kwargs.get('lang', None))
 
         @self.route('/topics.json')
         @_set_acao_headers
+        @_compress_response
         def word_topic_distance():
-            import numpy as np
             response.content_type = 'application/json; charset=UTF8'
 
-            tokenizer = token[0]
-            # parse query
-            if tokenizer == 'default':
-                from vsm.extensions.corpusbuilders.util import word_tokenize
-                tokenizer = word_tokenize
-            elif tokenizer == 'simple':
-                from topicexplorer.tokenizer import simple_tokenizer
-                tokenizer = simple_tokenizer
-            elif tokenizer == 'zh':
-                from topicexplorer.lib.chinese import modern_chinese_tokenizer
-                tokenizer = modern_chinese_tokenizer
-            elif tokenizer == 'ltc' or tokenizer == 'och':
-                from topicexplorer.lib.chinese import ancient_chinese_tokenizer
-                tokenizer = ancient_chinese_tokenizer
-            elif tokenizer == 'inpho':
-                from topicexplorer.extensions.inpho import inpho_tokenizer
-                tokenizer = inpho_tokenizer
-            elif tokenizer == 'brain':
-                from hyperbrain.parse import brain_tokenizer
-                tokenizer = brain_tokenizer
-            else:
-                raise NotImplementedError(
-                    "Tokenizer '{}' is not included in topicexplorer".format(tokenizer))
+            try:
+                fmt = _response_format()
+            except ValueError as e:
+                response.status = 406
+                return text(e)
 
-            query = list(itertools.chain(*[tokenizer(q) for q in request.query.q.split('|')]))
 
-            stopped_words = [word for word in query 
-                                 if word in self.c.stopped_words]
-            query = [word for word in query if word in self.c.words]
+            # parse query
+            tokenizer = get_tokenizer(token[0])
+            query = list(itertools.chain(*[tokenizer(q) for q in request.query.q.split('|')]))
+            query, stopped_words, unknown_words = self.vocab.resolve(query)
 
             # abort if there are no terms in the query
             if not query and stopped_words:
@@ -615,58 +1315,39 @@ class Application(Bottle):
                 return "Search terms removed using stoplist: " + ' '.join(stopped_words)
             elif not query:
                 response.status = 404  # Not Found
-                return "Search terms not in corpus"
+                return "Search terms not in corpus: " + ' '.join(unknown_words)
 
 
-            # calculate distances
-            distances = dict()
-            for k, viewer in self.v.items():
-                d = viewer.dist_word_top(query, show_topics=False)
-                distances[k] = np.fromiter(
-                    ((k, row['i'], row['value']) for row in d),
-                    dtype=[('k', '<i8'), ('i', '<i8'), ('value', '<f8')])
-
-            # merge and sort all topics across all models
-            merged_similarity = np.hstack(list(distances.values()))
-            sorted_topics = merged_similarity[np.argsort(merged_similarity['value'])]
-
-            # return data
-            data = [{'k' : int(t['k']),
-                     't' : int(t['i']),
-                     'distance' : float(t['value']) } for t in sorted_topics]
-            return json.dumps(data)
+            # calculate distances for all topics across all models
+            if fmt != 'json':
+                ks, topics, dists = self.word_search.rank(query)
+                return _table_response(fmt, OrderedDict(
+                    [('k', ks), ('t', topics), ('distance', dists)]))
+            return self.word_topics_json(query)
 
 
         @self.route('/topics')
         @_set_acao_headers
+        @_compress_response
         def view_clusters():
-            with open(get_static_resource_path('www/master.mustache.html'),
-                      encoding='utf-8') as tmpl_file:
-                template = tmpl_file.read()
-
-            tmpl_params = {'body' : _render_template('cluster.mustache.html'),
-                           'topic_range': self.topic_range}
-            return self.renderer.render(template, tmpl_params)
+            return _render_page('cluster.mustache.html')
 
         @self.route('/topics.local.html')
         @_set_acao_headers
+        @_compress_response
         def view_clusters_local():
-            with open(get_static_resource_path('www/master.local.mustache.html'),
-                      encoding='utf-8') as tmpl_file:
-                template = tmpl_file.read()
-
-            tmpl_params = {'body' : _render_template('cluster.local.mustache.html'),
-                           'topic_range': self.topic_range}
-            return self.renderer.render(template, tmpl_params)
+            return _render_page('cluster.local.mustache.html',
+                                master='master.local.mustache.html')
 
 
         @self.route('/docs.json')
         @_set_acao_headers
+        @_compress_response
         def docs(docs=None, q=None, n=None):
             response.content_type = 'application/json; charset=UTF8'
             response.set_header('Expires', _cache_date())
 
-            etag = _docs_etag(self.c)
+            etag = self.corpus_fingerprint
             #Check for an "If-None-Match" tag in the header
             if request.get_header('If-None-Match', '') == etag:
               response.status=304
@@ -696,23 +1377,148 @@ class Application(Bottle):
             except:
                 pass
 
-            js = self.get_docs(docs, query=q, n=n)
+            try:
+                js = self.get_docs(docs, query=q, n=n)
+            except KeyError:
+                response.status = 404
+                return "Document not found: {}".format(request.query.id)
 
             return json.dumps(js)
 
+        @self.route('/doc_topics.json', method=['GET', 'POST'])
+        @_set_acao_headers
+        @_compress_response
+        def docs_topics_batch():
+            # ids and ks come from repeated query or form parameters, or from
+            # the lists in a JSON request body
+            try:
+                params = request.json if request.method == 'POST' else None
+                if params is not None and not isinstance(params, dict):
+                    raise ValueError(params)
+            except ValueError:
+                response.status = 400
+                return "Invalid JSON: expected an object with id and k lists"
+            if params is None:
+                ids = request.params.getall('id')
+                ks = request.params.getall('k')
+            else:
+                ids = params.get('id', [])
+                ks = params.get('k', [])
+            ids = ids if isinstance(ids, list) else [ids]
+            ks = ks if isinstance(ks, list) else [ks]
+
+            if not ks or 'all' in ks:
+                ks = list(self.topic_range)
+            else:
+                try:
+                    ks = [int(k) for k in ks]
+                except (TypeError, ValueError):
+                    response.status = 400
+                    return "Invalid k: {}".format(ks)
+                missing = [k for k in ks if k not in self.topic_range]
+                if missing:
+                    response.status = 400
+                    return "No model for k = {}".format(
+                        ', '.join(map(text, missing)))
+
+            try:
+                fmt = _response_format()
+            except ValueError as e:
+                response.status = 406
+                return text(e)
+
+            etag = _format_etag(self.doc_topics_etag(ks), fmt)
+            if request.get_header('If-None-Match', '') == etag:
+                response.status = 304
+                return "Not Modified"
+
+            try:
+                matrix = self.doc_topics_matrix(ids, ks)
+            except KeyError as e:
+                response.status = 404
+                return "Document not found: {}".format(e.args[0])
+
+            response.set_header('Etag', etag)
+            if fmt == 'npy':
+                # a plain matrix rather than a table, for numpy clients
+                import numpy as np
+                response.content_type = formats.MEDIA_TYPES[fmt]
+                response.set_header('X-Topic-Range', ','.join(map(text, ks)))
+                output = BytesIO()
+                np.save(output, matrix)
+                return output.getvalue()
+            elif fmt != 'json':
+                response.set_header('X-Topic-Range', ','.join(map(text, ks)))
+                return _table_response(fmt, OrderedDict(
+                    [('id', ids), ('topics', matrix)]))
+
+            response.content_type = 'application/json; charset=UTF8'
+            offsets, start = dict(), 0
+            for k in ks:
+                offsets[text(k)] = start
+                start += k
+            return json.dumps({'ids': ids, 'k': ks, 'offsets': offsets,
+                               'topics': matrix.tolist()})
+
+        @self.route('/cache.json')
+        @_set_acao_headers
+        def cache_stats():
+            response.content_type = 'application/json; charset=UTF8'
+            response.set_header('Cache-Control', 'no-cache')
+            if self.response_cache is None:
+                return json.dumps(None)
+            return json.dumps(self.response_cache.stats())
+
+        @self.route('/metrics')
+        def metrics():
+            if self.metrics is None:
+                response.status = 404
+                return "Metrics are disabled"
+            response.content_type = metrics_lib.CONTENT_TYPE
+            response.set_header('Cache-Control', 'no-cache')
+            return self.metrics.export()
+
+        @self.route('/healthz')
+        def healthz():
+            response.content_type = 'application/json; charset=UTF8'
+            response.set_header('Cache-Control', 'no-cache')
+            return json.dumps(OrderedDict([
+                ('status', 'ok'),
+                ('uptime', round(timer() - self.launched, 3))]))
+
+        @self.route('/readyz')
+        def readyz():
+            readiness = self.readiness()
+            if not readiness['ready']:
+                response.status = 503  # Service Unavailable
+            response.content_type = 'application/json; charset=UTF8'
+            response.set_header('Cache-Control', 'no-cache')
+            return json.dumps(readiness)
+
         @self.route('/icons.js')
+        @_compress_response
         def icons():
             with open(get_static_resource_path('www/icons.js')) as icons:
                 text = '{0}\n var icons = {1};'\
                     .format(icons.read(), json.dumps(self.icons))
             return text
 
-        def _render_template(page):
+        def _render_page(page, master='master.mustache.html'):
+            """
+            Returns the HTML page with the body template `page` inside the
+            `master` template. Pages only depend on settings fixed at launch
+            and on the models, so each one is rendered once and kept until
+            its templates change or the models are reloaded.
+            """
             response.set_header('Expires', _cache_date())
 
-            with open(get_static_resource_path('www/' + page),
-                      encoding='utf-8') as tmpl_file:
-                template = tmpl_file.read()
+            master_tmpl = self._load_template(master)
+            body_tmpl = self._load_template(page)
+            version = self.models.version
+            cached = self.pages.get((master, page))
+            if (cached and cached[0] is master_tmpl and
+                    cached[1] is body_tmpl and cached[2] == version):
+                return cached[3]
 
             tmpl_params = {'corpus_name': kwargs.get('corpus_name', ''),
                            'corpus_link': kwargs.get('corpus_link', ''),
@@ -721,37 +1527,82 @@ class Application(Bottle):
                            'doc_title_format': kwargs.get('doc_title_format', '{0}'),
                            'doc_url_format': kwargs.get('doc_url_format', ''),
                            'home_link': kwargs.get('home_link', '/')}
-            return self.renderer.render(template, tmpl_params)
+            body = self.renderer.render(body_tmpl, tmpl_params)
+
+            tmpl_params = {'body' : body,
+                           'topic_range': self.topic_range}
+            html = self.renderer.render(master_tmpl, tmpl_params)
+            self.pages[(master, page)] = (master_tmpl, body_tmpl, version,
+                                          html)
+            return html
 
         @self.route('/<k:int>')
         def index_redirect(k):
             redirect('/{}/'.format(k))
 
         @self.route('/<k:int>/')
+        @_compress_response
         def index(k):
             if k not in self.topic_range:
                 abort(400, "No model for k = {}".format(k))
 
-            with open(get_static_resource_path('www/master.mustache.html'),
-                      encoding='utf-8') as tmpl_file:
-                template = tmpl_file.read()
+            return _render_page('bars.mustache.html')
 
-            tmpl_params = {'body' : _render_template('bars.mustache.html'),
-                           'topic_range': self.topic_range}
-            return self.renderer.render(template, tmpl_params)
+        def compute_clusters():
+            """
+            Clusters the topics of the loaded models, records the cluster
+            file in the config and returns its path.
+            """
+            import topicexplorer.train
+            viewers = OrderedDict((k, self.v[k]) for k in self.topic_range)
+            filename = topicexplorer.train.cluster(10, self.config_file,
+                                                   viewers=viewers)
+            self.cluster_path = filename
+            return filename
 
         @self.route('/cluster.csv')
         @_set_acao_headers
         def cluster_csv(second=False):
-            filename = kwargs.get('cluster_path')
+            filename = self.cluster_path
             print("Retrieving cluster.csv:", filename)
             if not filename or not os.path.exists(filename):
-                import topicexplorer.train
-                filename = topicexplorer.train.cluster(10, self.config_file)
-                kwargs['cluster_path'] = filename
+                job = self.jobs.get('cluster')
+                if job is not None and job.status == jobs.FAILED:
+                    # report the failure once; the next request tries again
+                    self.jobs.remove(job)
+                    response.status = 500
+                    return "Clustering failed: {}".format(job.error)
+
+                # every request waits on the same job, which clusters the
+                # models of the request that started it
+                job = self.jobs.submit('cluster', partial(
+                    self._with_models, self.models, compute_clusters))
+                if job.status != jobs.DONE:
+                    response.status = 202  # Accepted
+                    response.content_type = 'application/json; charset=UTF8'
+                    response.set_header('Location', 'jobs/cluster.json')
+                    response.set_header('Retry-After', '2')
+                    response.set_header('Cache-Control', 'no-cache')
+                    return json.dumps(dict(job.to_dict(),
+                                           url='jobs/cluster.json'))
+                filename = job.result
 
             root, filename = os.path.split(filename)
-            return static_file(filename, root=root)
+            return _static_file(filename, root=root)
+
+        @self.route('/jobs/<name>.json')
+        @_set_acao_headers
+        def job_status(name):
+            job = self.jobs.get(name)
+            if job is None:
+                response.status = 404
+                return "No job: {}".format(name)
+
+            response.content_type = 'application/json; charset=UTF8'
+            response.set_header('Cache-Control', 'no-cache')
+            if job.status == jobs.RUNNING:
+                response.set_header('Retry-After', '2')
+            return json.dumps(job.to_dict())
         
         @self.route('/description.md')
         @_set_acao_headers
@@ -762,25 +1613,24 @@ class Application(Bottle):
                 return "File not found"
             filename = get_static_resource_path(filename)
             root, filename = os.path.split(filename)
-            return static_file(filename, root=root)
+            return _static_file(filename, root=root)
         
         @self.route('/')
         @_set_acao_headers
+        @_compress_response
         def cluster():
-            with open(get_static_resource_path('www/master.mustache.html'),
-                      encoding='utf-8') as tmpl_file:
-                template = tmpl_file.read()
-
-            tmpl_params = {'body' : _render_template('splash.mustache.html'),
-                           'topic_range': self.topic_range}
-            return self.renderer.render(template, tmpl_params)
+            return _render_page('splash.mustache.html')
 
         @self.route('/<filename:path>')
         @_set_acao_headers
         def send_static(filename):
-            return static_file(filename, root=get_static_resource_path('www/'))
+            return _static_file(filename, root=get_static_resource_path('www/'),
+                                cache_dir=self.static_cache)
 
     def _serve_fulltext(self, corpus_path):
+        # files of the raw corpus, listed on the first request
+        self.fulltext_manifest = Manifest(corpus_path)
+
         @self.route('/fulltext/<doc_id:path>')
         @_set_acao_headers
         def get_doc(doc_id):
@@ -788,28 +1638,497 @@ class Application(Bottle):
                 doc_id = doc_id.decode('utf-8')
             except:
                 pass
-            pdf_path = os.path.join(corpus_path, re.sub('txt$', 'pdf', doc_id))
-            if os.path.exists(pdf_path.encode('utf-8')):
-                doc_id = re.sub('txt$', 'pdf', doc_id)
-            txt_path = os.path.join(corpus_path, doc_id + '.txt')
-            if os.path.exists(txt_path.encode('utf-8')):
-                doc_id = doc_id + '.txt'
-            # here we deal with case where corpus_path and doc_id overlap
-            (fdirs, lastdir) = os.path.split(corpus_path)
-            if re.match('^' + lastdir, doc_id):
-                return static_file(doc_id, root=fdirs)
-            else:
-                return static_file(doc_id, root=corpus_path)
+            path = self.fulltext_manifest.resolve(doc_id)
+            if path is None:
+                response.status = 404
+                return "File not found: {}".format(doc_id)
+            return _send_file(path)
+
+    def doc_neighbors(self, k, doc, N=40):
+        """
+        Returns a list of (document id, distance) pairs for the `N` documents
+        nearest to `doc` in model `k`, or the `-N` farthest documents, farthest
+        first, if `N` is negative. Nearest-neighbor queries use the neighbor
+        index for `k` when one is loaded and fall back to the exact scan.
+        """
+        doc = self.label_index[doc]
+        viewer = self.v[k]  # (re)loads the model and its index if lazy
+        if N > 0 and k in self.neighbors:
+            idxs, dists = self.neighbors[k].query(doc, N)
+            return list(zip(self.labels[idxs], dists))
+        elif N > 0:
+            return list(viewer.dist_doc_doc(doc)[:N])
+        else:
+            return list(reversed(viewer.dist_doc_doc(doc)[N:]))
+
+    def docs_with_topics(self, k, data):
+        """
+        Returns the metadata, similarity and topic mixture in model `k` of
+        each document in `data`, a list of (document id, distance) pairs, as
+        the hypershelf displays them.
+        """
+        docs = [doc for doc, prob in data]
+        # columns of theta, rather than LdaCgsViewer.doc_topics, which sorts
+        # the topics of every document of the corpus
+        doc_topics_mat = self.v[k].theta[:, self.label_index.resolve(docs)].T
+        docs = self.get_docs(docs, id_as_key=True)
+
+        js = []
+        for doc_prob, topics in zip(data, doc_topics_mat):
+            doc, prob = doc_prob
+            struct = docs[doc]
+            struct.update({'prob': float(1 - prob),
+                           'topics': dict([(text(t), float(p)) for t, p in enumerate(topics)])})
+            js.append(struct)
+        return js
+
+    def infer(self, k, texts):
+        """
+        Returns the topic mixtures in model `k` of the new documents `texts`,
+        as a ``len(texts) x k`` matrix, and the number of tokens of each text
+        that are in the corpus vocabulary. Texts are tokenized with the
+        `tokenizer` of the server and folded in with the topics of the model
+        fixed, so the mixtures can be compared to those of the corpus.
+        """
+        theta, lengths = infer_lib.infer(self.v[k], self.vocab,
+                                         get_tokenizer(token[0]), texts)
+        return theta.T, lengths
+
+    def nearest_docs(self, k, topics, N=40):
+        """
+        Returns a list of (document id, distance) pairs for the `N` documents
+        of the corpus nearest to the distribution over topics `topics` in
+        model `k`, such as a mixture returned by `infer`. Queries use the
+        neighbor index for `k` when one is loaded.
+        """
+        viewer = self.v[k]  # (re)loads the model and its index if lazy
+        if k in self.neighbors:
+            idxs, dists = self.neighbors[k].nearest(topics, N)
+        else:
+            idxs, dists = topicexplorer.lib.neighbors.nearest(
+                viewer.theta, topics, N)
+        return list(zip(self.labels[idxs], dists))
+
+    def word_distances(self, k, words):
+        """
+        Returns the distances from the words at indices `words` to every
+        topic of model `k`.
+        """
+        if self.lazy_models:
+            return WordSearch({k: self.v[k]}, stack=False).distances(words)
+        return self.word_search.distances(words, k=k)
+
+    def topic_docs(self, k, topic, N=40):
+        """
+        Returns a list of (document id, distance) pairs for the `N` documents
+        closest to `topic` in model `k`, or the `-N` farthest documents,
+        farthest first, if `N` is negative. The topic index for `k` is opened,
+        or built, on first use.
+        """
+        # read once: an eviction may drop the index at any time
+        index = self.topic_indexes.get(k)
+        if index is None:
+            with self._topic_index_lock:
+                index = self.topic_indexes.get(k)
+                if index is None:
+                    index = topicexplorer.lib.topicindex.load_or_build(
+                        self.model_pattern.format(k), self.v[k].theta,
+                        self.fingerprints[k])
+                    self.topic_indexes[k] = index
+
+        idxs, dists = index.top_docs(topic, N)
+        return list(zip(self.labels[idxs], dists))
+
+    def topic_words(self, k, n=10):
+        """
+        Returns arrays with the indices and probabilities of the `n` most
+        probable words of each topic in model `k`, most probable first, for
+        `n` up to `TOP_WORDS`. The words are selected once per model with a
+        partial sort.
+        """
+        import numpy as np
+
+        if n > TOP_WORDS:
+            raise ValueError("At most {} words per topic".format(TOP_WORDS))
+
+        with self._top_words_lock:
+            if k not in self.top_words:
+                phi = self.v[k].phi.T
+                width = min(TOP_WORDS, phi.shape[1])
+                idxs = np.argpartition(-phi, width - 1, axis=1)[:, :width]
+                rows = np.arange(phi.shape[0])[:, np.newaxis]
+                order = np.argsort(-phi[rows, idxs], axis=1, kind='mergesort')
+                idxs = idxs[rows, order]
+                self.top_words[k] = (idxs, phi[rows, idxs])
+            idxs, probs = self.top_words[k]
+
+        return idxs[:, :n], probs[:, :n]
+
+    def _collect_metrics(self):
+        """
+        Returns the model and response cache metrics, in the form of
+        `metrics_lib.format_family`, for `/metrics`.
+        """
+        prefix = metrics_lib.PREFIX
+        families = [
+            (prefix + 'model_load_seconds', 'gauge',
+             'Time of the last load of each model.',
+             [('', {'k': k}, seconds)
+              for k, seconds in sorted(self.model_load_time.items())]),
+            (prefix + 'model_version', 'gauge',
+             'Version of the models served, incremented by each reload.',
+             [('', {}, self.models.version)])]
+        if self.lazy_models:
+            families += [
+                (prefix + 'model_loads_total', 'counter',
+                 'Models loaded on request.', [('', {}, self.v.loads)]),
+                (prefix + 'model_evictions_total', 'counter',
+                 'Models unloaded to stay within the memory budget.',
+                 [('', {}, self.v.evictions)]),
+                (prefix + 'models_loaded', 'gauge', 'Models in memory.',
+                 [('', {}, len(self.v.loaded()))]),
+                (prefix + 'model_bytes', 'gauge',
+                 'Estimated memory used by the models in memory.',
+                 [('', {}, self.v.nbytes)])]
+        if self.response_cache is not None:
+            stats = self.response_cache.stats()
+            labels = {'backend': stats['backend']}
+            for name in ['hits', 'misses', 'evictions']:
+                families.append((
+                    prefix + 'response_cache_{0}_total'.format(name), 'counter',
+                    'Response cache {0}.'.format(name),
+                    [('', labels, stats[name])]))
+            families += [
+                (prefix + 'response_cache_entries', 'gauge',
+                 'Responses in the response cache.',
+                 [('', labels, stats['entries'])]),
+                (prefix + 'response_cache_bytes', 'gauge',
+                 'Size of the responses in the response cache.',
+                 [('', labels, stats['bytes'])])]
+        return families
+
+    def warm_up(self, seed=0):
+        """
+        Requests a sample of every route, with documents and topics drawn
+        from a random generator seeded with `seed`. Progress is kept in
+        `self.warmup` and reported at `/readyz`. The requests are left out of
+        the request metrics.
+        """
+        rng = random.Random(seed)
+
+        def random_doc():
+            return text(self.labels[rng.randrange(len(self.labels))])
+
+        paths, words = [], []
+        for k in self.topic_range:
+            topic = rng.randrange(k)
+            word = text(self.c.words[self.topic_words(k, 1)[0][topic, 0]])
+            words.append(quote(word, safe=''))
+            doc = quote(random_doc(), safe='')
+            paths += ['/{0}/'.format(k),
+                      '/{0}/topics.json'.format(k),
+                      '/{0}/topics/{1}.json'.format(k, topic),
+                      '/{0}/docs_topics/{1}.json'.format(k, doc),
+                      '/{0}/docs/{1}'.format(k, doc),
+                      '/{0}/word_docs.json?q={1}'.format(k, words[-1])]
+        doc = random_doc()
+        paths += ['/',
+                  '/topics_all.json',
+                  '/topics.json?q={0}'.format(words[0]),
+                  '/docs.json?q={0}'.format(quote(doc[:3], safe='')),
+                  '/doc_topics.json?id={0}&k=all'.format(quote(doc, safe='')),
+                  '/icons.js',
+                  '/cluster.csv']
+
+        self.warmup = WarmUp(paths)
+        self.warmup.run(self)
+        if self.metrics is not None:
+            self.metrics.reset()
+
+    def readiness(self):
+        """
+        Returns whether the application is ready to serve, with the number
+        of models in memory and the progress of the warm-up, for `/readyz`.
+        """
+        loaded = self.v.loaded() if self.lazy_models else list(self.v)
+        ready = self.warmup is None or self.warmup.complete
+        return OrderedDict([
+            ('ready', ready),
+            ('models', OrderedDict([('loaded', len(loaded)),
+                                    ('total', len(self.topic_range)),
+                                    ('version', self.models.version)])),
+            ('warm_up', self.warmup.to_dict() if self.warmup else None)])
+
+    def cached_response(self, route, k, fmt, params, compute):
+        """
+        Returns the serialized response of `route` for the model with `k`
+        topics in the format `fmt`, with the normalized parameters in the
+        dictionary `params`. It comes from the response cache, or else from
+        calling `compute()`; only successful responses are cached.
+        """
+        if self.response_cache is None:
+            return compute()
+
+        # responses embed the document labels of the label table
+        fingerprint = u'{0}-{1}-{2}'.format(self.corpus_fingerprint,
+                                            self.fingerprints[k],
+                                            self.label_table_key)
+        key = cache.make_key(route, k, dict(params, format=fmt), fingerprint)
+        body = self.response_cache.get(key)
+        if body is not None:
+            if fmt != 'json':
+                response.content_type = formats.MEDIA_TYPES[fmt]
+            return body
+
+        body = compute()
+        if response.status_code == 200:
+            if isinstance(body, text):
+                body = body.encode('utf-8')
+            self.response_cache.set(key, body)
+        return body
+
+    def compress_response(self, body):
+        """
+        Returns the response body `body` compressed with the encoding
+        negotiated from the `Accept-Encoding` header, or `body` itself if it
+        is small or not compressible. The compressed bodies of GET responses
+        with an ETag are cached by URL, ETag and encoding.
+        """
+        if (not self.compress or not isinstance(body, (bytes, text)) or
+                not compression.compressible(response.content_type)):
+            return body
+        response.add_header('Vary', 'Accept-Encoding')
+        encoding = compression.negotiate(request.get_header('Accept-Encoding'))
+        if encoding is None or response.status_code != 200:
+            return body
+        data = body.encode('utf-8') if isinstance(body, text) else body
+        if len(data) < compression.MIN_SIZE:
+            return body
+
+        key = None
+        etag = response.get_header('ETag')
+        if (etag and request.method == 'GET' and
+                'no-store' not in response.get_header('Cache-Control', '')):
+            key = (request.path, request.query_string, etag, encoding)
+            with self._compressed_lock:
+                if key in self._compressed:
+                    compressed = self._compressed.pop(key)
+                    self._compressed[key] = compressed
+                    response.set_header('Content-Encoding', encoding)
+                    return compressed
+
+        compressed = compression.compress(data, encoding)
+        if key is not None and len(compressed) <= COMPRESSED_CACHE_BYTES:
+            with self._compressed_lock:
+                if key not in self._compressed:
+                    self._compressed[key] = compressed
+                    self._compressed_bytes += len(compressed)
+                while self._compressed_bytes > COMPRESSED_CACHE_BYTES:
+                    _, evicted = self._compressed.popitem(last=False)
+                    self._compressed_bytes -= len(evicted)
+
+        response.set_header('Content-Encoding', encoding)
+        return compressed
+
+    def topics_etag(self, k):
+        """
+        Returns the ETag of the `/<k>/topics.json` response, which changes
+        with the model and with the topic label file.
+        """
+        etag = self.fingerprints[k]
+        if self.label_file:
+            # topic labels can be edited without retraining
+            etag += '-{:x}'.format(
+                int(os.path.getmtime(self.label_file) * 1000))
+        return etag
+
+    def doc_topics_etag(self, ks):
+        """ Returns the ETag of the document topics of the models `ks`. """
+        etags = u' '.join([self.corpus_fingerprint] +
+                          [self.fingerprints[k] for k in ks])
+        return hashlib.sha1(etags.encode('utf-8')).hexdigest()
+
+    def doc_topics_table(self, k, data):
+        """
+        Returns a table of the (document id, distance) pairs in `data`, with
+        the similarity and the topic mixture in model `k` of each document,
+        for binary responses. Mixtures are in topic order.
+        """
+        import numpy as np
+        docs = [doc for doc, dist in data]
+        dists = np.array([dist for doc, dist in data], dtype=np.float64)
+        rows = self.label_index.resolve(docs)
+        return OrderedDict([('doc', docs),
+                            ('prob', 1 - dists),
+                            ('topics', self.v[k].theta[:, rows].T)])
+
+    def doc_topics_matrix(self, ids, ks):
+        """
+        Returns the topic mixtures of the documents `ids` in the models `ks`
+        as a `len(ids) x sum(ks)` matrix, with the topics of each model in
+        consecutive columns in the order of `ks`. Raises a `KeyError` naming
+        the first document that is not in the corpus.
+        """
+        import numpy as np
+        docs = self.label_index.resolve(ids)
+        matrix = np.empty((len(docs), sum(ks)))
+        start = 0
+        for k in ks:
+            matrix[:, start:start + k] = self.v[k].theta[:, docs].T
+            start += k
+        return matrix
+
+    def topics_all_etag(self):
+        """ Returns the ETag of the `/topics_all.json` response. """
+        etags = u' '.join(self.topics_etag(k) for k in self.topic_range)
+        return hashlib.sha1(etags.encode('utf-8')).hexdigest()
+
+    def topics_all_json(self, n=10, lang=None):
+        """
+        Returns the serialized `/topics_all.json` response, an object mapping
+        each number of topics to its `/<k>/topics.json` response. It is
+        assembled from the per-model cache without decoding it.
+        """
+        key = ('all', self.topics_all_etag(), lang, n)
+        with self._top_words_lock:
+            if key in self._topics_json:
+                self._topics_json[key] = self._topics_json.pop(key)
+                return self._topics_json[key]
+
+        js = u'{' + u', '.join(
+            u'"{}": {}'.format(k, self.topics_json(k, n, lang=lang))
+            for k in self.topic_range) + u'}'
+
+        with self._top_words_lock:
+            self._topics_json[key] = js
+            while len(self._topics_json) > TOPICS_JSON_CACHE_SIZE:
+                self._topics_json.popitem(last=False)
+
+        return js
+
+    def topic_labels(self, k):
+        """
+        Returns the label of each topic of model `k`, read from the topic
+        label file if there is one.
+        """
+        labels = []
+        if self.label_file:
+            with open(self.label_file) as labels_in:
+                for label in labels_in:
+                    label = label.strip()
+                    labels.append(label)
+        else:
+            for i in range(k):
+                labels.append('Topic {}'.format(i))
+        return labels
+
+    def topics_table(self, k, n=10):
+        """
+        Returns the topics of model `k` as a table for the binary formats of
+        `/<k>/topics.json`, with a row per topic and its `n` top words and
+        their probabilities, most probable first.
+        """
+        import numpy as np
+
+        idxs, probs = self.topic_words(k, n)
+        return OrderedDict([
+            ('topic', np.arange(k)),
+            ('label', self.topic_labels(k)[:k]),
+            ('color', [rgb2hex(self.colors[k][i]) for i in range(k)]),
+            ('words', self.c.words[idxs]),
+            ('probs', probs)])
+
+    def topics_json(self, k, n=10, lang=None):
+        """
+        Returns the serialized `/<k>/topics.json` response with the top `n`
+        words of each topic. Responses are cached until the model or the
+        topic label file changes.
+        """
+        label_mtime = None
+        if self.label_file:
+            label_mtime = os.path.getmtime(self.label_file)
+        key = (k, self.fingerprints[k], label_mtime, lang, n)
+
+        with self._top_words_lock:
+            if key in self._topics_json:
+                self._topics_json[key] = self._topics_json.pop(key)
+                return self._topics_json[key]
+
+        idxs, probs = self.topic_words(k, n)
+        words = self.c.words[idxs]
+        labels = self.topic_labels(k)
+
+        js = {}
+        for i in range(len(idxs)):
+            js[text(i)] = {
+                "color": rgb2hex(self.colors[k][i]),
+                'words': dict([(text(w), float(p))
+                                   for w, p in zip(words[i], probs[i])]),
+                'label' : labels[i]
+                }
+        js = json.dumps(js)
+
+        with self._top_words_lock:
+            self._topics_json[key] = js
+            while len(self._topics_json) > TOPICS_JSON_CACHE_SIZE:
+                self._topics_json.popitem(last=False)
+
+        return js
+
+    def word_topics_json(self, words):
+        """
+        Returns the serialized `/topics.json?q=` response, ranking the topics
+        of every model by distance to the words with indices `words`.
+        Responses are cached by the set of query words.
+        """
+        search = self.word_search
+        # lazily loaded models are ranked only while they are in memory
+        key = (tuple(sorted(set(words))), tuple(sorted(search.start)))
+        with self._top_words_lock:
+            if key in self._word_topics_json:
+                self._word_topics_json[key] = self._word_topics_json.pop(key)
+                return self._word_topics_json[key]
+
+        ks, topics, dists = search.rank(key[0])
+        data = [{'k' : int(k),
+                 't' : int(t),
+                 'distance' : float(d) } for k, t, d in zip(ks, topics, dists)]
+        js = json.dumps(data)
+
+        with self._top_words_lock:
+            self._word_topics_json[key] = js
+            while len(self._word_topics_json) > WORD_TOPICS_CACHE_SIZE:
+                self._word_topics_json.popitem(last=False)
+
+        return js
+
+    @property
+    def label_search(self):
+        """
+        Search index over the display labels, built on the first query so
+        that expensive label functions do not delay startup.
+        """
+        with self._label_search_lock:
+            if self._label_search is None:
+                self._label_search = LabelSearch(self.label_table)
+        return self._label_search
 
     def get_docs(self, docs=None, id_as_key=False, query=None, n=None):
         ctx_md = self.c.view_metadata(self.context_type)
 
         if docs:
             # filter to metadata for selected docs
-            ids = [self.c.meta_int(self.context_type, {self.label_name: doc}) for doc in docs]
+            ids = self.label_index.resolve(docs)
+            ctx_md = ctx_md[ids]
+        elif query is not None:
+            # ranked matches from the label search index
+            ids = self.label_search.search(query, n)
             ctx_md = ctx_md[ids]
+            docs = self.labels[ids]
+            query = None
         else:
             # get metadata for all documents
+            ids = range(len(self.labels))
             docs = self.labels
 
         js = dict() if id_as_key else list()
@@ -820,11 +2139,12 @@ class Application(Bottle):
             except:
                 return ''
 
-        for doc, md in zip(docs, ctx_md):
-            if query is None or query.lower() in self.label(doc).lower():
+        for doc, row, md in zip(docs, ids, ctx_md):
+            label = self.label_table[row]
+            if query is None or query.lower() in label.lower():
                 struct = {
                     'id': doc,
-                    'label': self.label(doc),
+                    'label': label,
                     # TODO: Figure out why metadata field might have issue.
                     'metadata': dict(zip(md.dtype.names, (safe_text(m) for m in md)))
                 }
@@ -911,6 +2231,15 @@ class WaitressLoggingServer(ServerAdapter):
             handler = TransLogger(handler)
         serve(handler, host=self.host, port=self.port, **self.options)
 
+class PreforkLoggingServer(ServerAdapter):
+    """ Serves the application from `workers` forked waitress processes. """
+    def run(self, handler): # pragma: no cover
+        from topicexplorer.lib.prefork import Prefork
+        if not self.quiet:
+            from paste.translogger import TransLogger
+            handler = TransLogger(handler)
+        Prefork(handler, self.host, self.port, **self.options).run()
+
 def main(args, app=None):
     if app is None:
         app = create_app(args)
@@ -931,7 +2260,23 @@ def main(args, app=None):
         print("TIP: Browser launch can be disabled with the '--no-browser' argument:")
         print("topicexplorer serve --no-browser", args.config, "\n")
 
-    app.run(server=WaitressLoggingServer, host=host, port=port)
+    if args.workers > 1:
+        # workers are forked from this process, which reloads the models in
+        # its main thread on SIGHUP; the watcher starts after the first fork
+        # and only sends the signal
+        config = topicexplorer.config.read(args.config)
+        reload_interval = config.getfloat('www', 'reload_interval')
+
+        def on_start():
+            if reload_interval > 0:
+                app.watch(reload_interval, lambda: os.kill(os.getpid(),
+                                                           signal.SIGHUP))
+
+        app.run(server=PreforkLoggingServer, host=host, port=port,
+                workers=args.workers, on_start=on_start,
+                on_hup=app.reload_changed)
+    else:
+        app.run(server=WaitressLoggingServer, host=host, port=port)
 
 
 def create_app(args):
@@ -973,6 +2318,19 @@ def create_app(args):
     fulltext = args.fulltext or config.getboolean('www', 'fulltext')
     tokenizer = config.get('www', 'tokenizer')
     label_file = config.get('main', 'label_file')
+    neighbor_index = config.getboolean('www', 'neighbor_index')
+    template_reload = config.getboolean('www', 'template_reload')
+    lazy_models = config.getboolean('www', 'lazy_models')
+    model_memory = config.getint('www', 'model_memory') * 2**20 or None
+    mmap = config.getboolean('www', 'mmap')
+    compress = config.getboolean('www', 'compress')
+    static_cache = config.get('www', 'static_cache')
+    response_cache = config.get('www', 'response_cache')
+    response_cache_size = config.getint('www', 'response_cache_size') * 2**20
+    response_cache_file = config.get('www', 'response_cache_file')
+    metrics = config.getboolean('www', 'metrics')
+    warm_up = args.warm_up or config.getboolean('www', 'warm_up')
+    reload_interval = config.getfloat('www', 'reload_interval')
 
     app = Application(corpus_file=corpus_file,
                       model_pattern=model_pattern,
@@ -992,7 +2350,26 @@ def create_app(args):
                       corpus_desc=corpus_desc,
                       home_link=home_link,
                       tokenizer=tokenizer,
-                      label_file=label_file)
+                      label_file=label_file,
+                      neighbor_index=neighbor_index,
+                      template_reload=template_reload,
+                      lazy_models=lazy_models,
+                      model_memory=model_memory,
+                      mmap=mmap,
+                      compress=compress,
+                      static_cache=static_cache,
+                      response_cache=response_cache,
+                      response_cache_size=response_cache_size,
+                      response_cache_file=response_cache_file,
+                      metrics=metrics)
+
+    # warm the models and caches before the server accepts connections
+    if warm_up:
+        app.warm_up()
+
+    # with --workers, main starts the watcher once the workers are forked
+    if reload_interval > 0 and getattr(args, 'workers', 1) <= 1:
+        app.watch(reload_interval)
 
     """
     host, port = get_host_port(args) 
@@ -1010,7 +2387,12 @@ def populate_parser(parser):
     parser.add_argument('--no-browser', dest='browser', action='store_false')
     parser.add_argument('--fulltext', action='store_true',
                         help='Serve raw corpus files.')
+    parser.add_argument('--warm-up', dest='warm_up', action='store_true',
+                        help="Request a sample of every route before "
+                             "serving.")
     parser.add_argument("-q", "--quiet", action="store_true")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of server processes [Default: 1]")
 
 if __name__ == '__main__':
     from argparse import ArgumentParser
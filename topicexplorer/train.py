@@ -183,9 +183,25 @@ def continue_training(model_pattern, krange, total_iterations=200, n_proc=1,
 
     return basefilename
 
-def cluster(n_clusters, config_file):
+def build_topic_indexes(model_pattern, krange):
+    from vsm.model.lda import LDA
+    from topicexplorer.lib.fingerprint import file_digest
+    import topicexplorer.lib.topicindex
+    for k in krange:
+        model_file = model_pattern.format(k)
+        m = LDA.load(model_file)
+        theta = m.top_doc / m.top_doc.sum(0)
+        topicexplorer.lib.topicindex.load_or_build(
+            model_file, theta, file_digest(model_file))
+
+def cluster(n_clusters, config_file, viewers=None):
+    """
+    Writes the clusters of the topics of every model and records the file in
+    the config. `viewers` may give the viewers of the models, by number of
+    topics, to use instead of loading the models again.
+    """
     from .cluster import dimensionReduce
-    dimension_reduce_model = dimensionReduce(config_file)
+    dimension_reduce_model = dimensionReduce(config_file, model_v=viewers)
 
     dimension_reduce_model.fit_isomap()  
     dimension_reduce_model.fit_kmeans(int(n_clusters))
@@ -359,6 +375,8 @@ Do you want to continue training your existing models? """, default=True))):
         with open(args.config_file, "w") as configfh:
             config.write(configfh)
 
+        build_topic_indexes(model_pattern, args.k)
+
 
 def populate_parser(parser):
     import argparse
@@ -18,6 +18,26 @@ inpho.util.url = function(api_call) {
     return inpho.util.base_url + api_call;
 }
 
+/* inpho.util.csv
+ * Loads a CSV file with d3, retrying while the server answers 202 Accepted
+ * because the file is still being computed, e.g. cluster.csv.
+ *
+ * > inpho.util.csv('cluster.csv', function(error, data) { ... })
+ * */
+inpho.util.csv = function(url, callback) {
+  d3.xhr(url)
+    .response(function(request) { return request; })
+    .get(function(error, request) {
+      if (error) return callback(error);
+      if (request.status == 202) {
+        var wait = parseInt(request.getResponseHeader('Retry-After')) || 2;
+        return setTimeout(function() { inpho.util.csv(url, callback); },
+                          wait * 1000);
+      }
+      callback(null, d3.csv.parse(request.responseText));
+    });
+}
+
 inpho.util.getCookieValueForName = function(cookieName) {
 	console.log("Getting list of cookies...");
 	var cookies = document.cookie.split(";");
@@ -113,7 +113,7 @@ $(document).ready(function () {
 
 var ext_data;
 
-d3.csv(base_url + "cluster.csv", function (error, data) {
+inpho.util.csv(base_url + "cluster.csv", function (error, data) {
   var topics = {}; var colors = {}; var node;
   var ks = data.map(function (d) { return parseInt(d.k); }).filter(function (item, i, ar) { return ar.indexOf(item) === i; });;
   // sidebar items
@@ -195,9 +195,10 @@ d3.csv(base_url + "cluster.csv", function (error, data) {
 
 
 
-  var k_urls = ks.map(function (k) { return base_url + k + "/topics.json" });
-  console.log(ks, k_urls);
-  Promise.all(k_urls.map($.getJSON)).then(function (data) {
+  // one request for the topics of every model
+  Promise.resolve($.getJSON(base_url + "topics_all.json")).then(function (all) {
+    return ks.map(function (k) { return all[k] });
+  }).then(function (data) {
     data.forEach(function (d, i) {
       colors[ks[i]] = {};
       $.each(d, function (key, val) { colors[ks[i]][key] = val.color });
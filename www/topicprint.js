@@ -121,10 +121,17 @@ var fingerprint = {
 
     }
 
-    var url = "/docs_topics/" + $('#fingerprintModal #hidden_id').val() + '.json?n=1'
     var host = fingerprint.host + k;
 
-    d3.json(host + url, function (error, data) {
+    // the mixtures of every model come from one shared request
+    fingerprint.docTopics(docid).then(function (batch) {
+      var topics = {};
+      for (var t = 0; t < k; t++)
+        topics[t] = batch.topics[0][batch.offsets[k] + t];
+      draw(null, [{ 'prob': 1.0, 'topics': topics }]);
+    }, function () { draw(true); });
+
+    function draw(error, data) {
       $('#fingerprintModal #status .bar', '#bar' + k).css('width', '50%').text('Loading topics...');
       if (error) {
         var isError = $('.bar.bar-danger ');
@@ -206,7 +213,15 @@ var fingerprint = {
         }, 250);
 
       });
-    });
+    }
+  },
+  'docTopics': function (docid) {
+    if (this._docid !== docid) {
+      this._docid = docid;
+      this._docTopics = Promise.resolve($.getJSON(this.host + 'doc_topics.json',
+        { 'id': docid, 'k': 'all' }));
+    }
+    return this._docTopics;
   }
 };
 
@@ -260,19 +275,19 @@ $('#words').on('input', function () {
   }, 500);
 });
 
-var k_urls = ks.map(function (k) { return '../' + k + "/topics.json" });
-var topics = Promise.all(k_urls.map($.getJSON)).then(function (data) {
+// one request for the topics of every model
+var topics = Promise.resolve($.getJSON('../topics_all.json')).then(function (data) {
   var t = {};
-  data.forEach(function (d, i) {
-    t[ks[i]] = {};
-    $.each(d, function (key, val) { t[ks[i]][key] = combineWords(val.words) });
+  ks.forEach(function (k) {
+    t[k] = {};
+    $.each(data[k], function (key, val) { t[k][key] = combineWords(val.words) });
   });
   return t;
 });
 
 var colors = {};
 var color = d3.scale.category20();
-d3.csv('../cluster.csv', function (error, data) {
+inpho.util.csv('../cluster.csv', function (error, data) {
   var prev = data[0].k;
   var currentTop = 0;
   data.forEach(function (d) {